@@ -1,6 +1,17 @@
 # app/factories/gemini_creator.py
+from datetime import datetime
 from app.factories.ia_creator import IAAnalyzerCreator
+from app.factories.logger_factory import LoggerFactory
 from app.services.gemini_analyzer import GeminiAnalyzer
+from app.services.admission import gemini_admission
+from app.services.analysis_cache import (
+    analysis_cache,
+    analysis_cache_key,
+    anonimizar,
+    personalizar,
+)
+
+logger = LoggerFactory.create_logger("gemini_creator")
 
 class GeminiAnalyzerCreator(IAAnalyzerCreator):
     """
@@ -8,3 +19,28 @@ class GeminiAnalyzerCreator(IAAnalyzerCreator):
     """
     def factory_method(self):
         return GeminiAnalyzer()
+
+    def analyze(self, domain: str, scan_result: dict) -> dict:
+        """
+        Consulta la caché de análisis por huella del escaneo antes de llamar
+        a Gemini; las llamadas reales esperan turno en el control de
+        admisión. Ni los escaneos ni los informes con error se cachean.
+        """
+        if "error" in scan_result:
+            with gemini_admission.slot(domain.lower()):
+                return super().analyze(domain, scan_result)
+
+        key = analysis_cache_key(scan_result)
+        cached = analysis_cache.get(key)
+        if cached is not None:
+            logger.info(f"Análisis en caché para {domain}")
+            report = personalizar(cached, domain, scan_result)
+            report["domain"] = domain
+            report["timestamp"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+            return report
+
+        with gemini_admission.slot(domain.lower()):
+            report = super().analyze(domain, scan_result)
+        if "analysis_error" not in report:
+            analysis_cache.set(key, anonimizar(report, domain, scan_result))
+        return report
@@ -1,6 +1,212 @@
 from logging import Logger, getLogger, StreamHandler, Formatter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import atexit
+import copy
+import json
 import logging.handlers
 import os
+import queue
+import random
+import threading
+
+# "queue": los handlers de fichero y consola corren en un hilo aparte y el
+# código que loguea sólo encola el registro. "sync": escritura en línea.
+LOG_MODE = os.getenv("LOG_MODE", "queue")
+# "text" (formato clásico) o "json" (un objeto por línea)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL")
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Los mensajes más largos se recortan (respuestas de Gemini, escaneos...)
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", 4000))
+# Fracción de registros DEBUG que se conservan
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0))
+
+# Identificadores de correlación del contexto actual
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+job_id_var: ContextVar[str | None] = ContextVar("job_id", default=None)
+
+
+@contextmanager
+def log_context(request_id: str | None = None, job_id: str | None = None):
+    """
+    Asocia request_id / job_id a todos los registros emitidos dentro del
+    bloque (en este hilo o tarea).
+    """
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if job_id is not None:
+        tokens.append((job_id_var, job_id_var.set(job_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _ContextoFilter(logging.Filter):
+    """
+    Añade los ids de correlación al registro, aplica el muestreo de DEBUG
+    y recorta los mensajes largos. Corre en el hilo que loguea, que es
+    donde viven las ContextVar.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1.0:
+            if random.random() >= LOG_DEBUG_SAMPLE_RATE:
+                return False
+        record.request_id = request_id_var.get()
+        record.job_id = job_id_var.get()
+
+        mensaje = record.getMessage()
+        if len(mensaje) > LOG_MAX_MESSAGE_CHARS:
+            sobrante = len(mensaje) - LOG_MAX_MESSAGE_CHARS
+            record.msg = f"{mensaje[:LOG_MAX_MESSAGE_CHARS]}... [+{sobrante} chars]"
+            record.args = None
+        return True
+
+
+class JsonFormatter(Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for campo in ("request_id", "job_id"):
+            valor = getattr(record, campo, None)
+            if valor:
+                datos[campo] = valor
+        # Los registros que pasan por la cola llegan con la traza ya en exc_text
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            datos["exc"] = record.exc_text
+        if record.stack_info:
+            datos["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        linea = super().format(record)
+        ids = " ".join(
+            f"{campo}={valor}"
+            for campo in ("request_id", "job_id")
+            if (valor := getattr(record, campo, None))
+        )
+        return f"{linea} [{ids}]" if ids else linea
+
+
+def _formatter() -> Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return _TextFormatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+def _file_handler(logger_name: str) -> logging.Handler:
+    os.makedirs(LOG_DIR, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        f"{LOG_DIR}/{logger_name}.log",
+        maxBytes=10485760,  # 10MB
+        backupCount=5
+    )
+    handler.setFormatter(_formatter())
+    return handler
+
+
+class _DespachadorArchivos(logging.Handler):
+    """
+    Handler del hilo de logging: escribe cada registro en el fichero de su
+    logger (logs/<nombre>.log), abriéndolo la primera vez.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._handlers: dict[str, logging.Handler] = {}
+
+    def emit(self, record: logging.LogRecord):
+        handler = self._handlers.get(record.name)
+        if handler is None:
+            handler = self._handlers[record.name] = _file_handler(record.name)
+        handler.handle(record)
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no bloquea nunca: si la cola está llena el registro se
+    descarta y se cuenta.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        El prepare de QueueHandler mete la traza en el mensaje ya formateado
+        y borra exc_info, con lo que el formato JSON pierde el campo exc. Aquí
+        sólo se resuelven los argumentos del mensaje y la traza se guarda
+        como texto en exc_text: cada formatter del listener la coloca a su
+        manera y el recorte de mensajes no la alcanza.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = Formatter().formatException(record.exc_info)
+            # La traza retiene los frames; no se pasa al hilo de logging
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+
+_cola: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_listener: logging.handlers.QueueListener | None = None
+_listener_lock = threading.Lock()
+
+
+def _arrancar_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            console_handler = StreamHandler()
+            console_handler.setFormatter(_formatter())
+            _listener = logging.handlers.QueueListener(
+                _cola, _DespachadorArchivos(), console_handler, respect_handler_level=False
+            )
+            _listener.start()
+            atexit.register(stop_logging)
+
+
+def dropped_records() -> int:
+    """
+    Registros descartados desde el arranque por tener la cola llena.
+    """
+    return _BoundedQueueHandler.dropped
+
+
+def stop_logging():
+    """
+    Vacía la cola de registros pendientes y detiene el hilo de logging.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
 
 class LoggerFactory:
     @staticmethod
@@ -8,35 +214,26 @@ class LoggerFactory:
         """Crea y configura un logger según el tipo especificado"""
         # Crear el logger
         logger = getLogger(logger_name)
-        logger.setLevel(getattr(logging, log_level))
+        logger.setLevel(getattr(logging, LOG_LEVEL or log_level))
 
         # Evitar duplicación de handlers
         if logger.handlers:
             return logger
 
-        # Crear el directorio de logs si no existe
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
+        # Ids de correlación y muestreo, en el hilo que loguea
+        logger.addFilter(_ContextoFilter())
 
-        # Configurar el formato
-        formatter = Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        if LOG_MODE == "queue":
+            _arrancar_listener()
+            logger.addHandler(_BoundedQueueHandler(_cola))
+            return logger
 
         # Handler para archivo
-        file_handler = logging.handlers.RotatingFileHandler(
-            f"{log_dir}/{logger_name}.log",
-            maxBytes=10485760,  # 10MB
-            backupCount=5
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(_file_handler(logger_name))
 
         # Handler para consola
         console_handler = StreamHandler()
-        console_handler.setFormatter(formatter)
+        console_handler.setFormatter(_formatter())
         logger.addHandler(console_handler)
 
         return logger
-        
\ No newline at end of file
@@ -1,10 +1,116 @@
 # app/factories/nmap_creator.py
+import os
 from app.factories.scanner_creator import ScannerCreator
+from app.factories.logger_factory import LoggerFactory
 from app.services.nmap_scanner import NmapScanner
+from app.services.nmap_stream_scanner import NmapStreamScanner
+from app.services.scan_cache import scan_cache, scan_cache_key
+from app.services.admission import nmap_admission
+from app.services.port_history import port_history, port_history_key, solo_hosts
+from app.models.scan_profile import get_profile
+from app.services.exceptions import ScanError, OverloadedError
+
+logger = LoggerFactory.create_logger("nmap_creator")
+
+# "python-nmap" (por defecto) o "stream" (parseo incremental del XML)
+NMAP_BACKEND = os.getenv("NMAP_BACKEND", "python-nmap")
+# Máximo de objetivos por invocación de nmap en escaneos por lotes
+NMAP_BATCH_TARGETS = int(os.getenv("NMAP_BATCH_TARGETS", 16))
+# Reescaneos incrementales a partir del último mapa de puertos del dominio
+NMAP_INCREMENTAL = os.getenv("NMAP_INCREMENTAL", "true").lower() == "true"
+# Margen sobre el presupuesto del perfil antes de matar el proceso nmap
+NMAP_TIMEOUT_GRACE_SECONDS = int(os.getenv("NMAP_TIMEOUT_GRACE_SECONDS", 30))
+
+def _cacheable(result: dict) -> bool:
+    """
+    Sólo se guardan escaneos sin error y con algún host: un resultado
+    vacío suele ser un fallo transitorio (DNS, red, host caído o saltado
+    por --host-timeout) y no debe servirse desde la caché.
+    """
+    return "error" not in result and any(h != "changes" for h in result)
+
 
 class NmapScannerCreator(ScannerCreator):
     """
-    Concrete Creator para Nmap. Crea NmapScanner.
+    Concrete Creator para Nmap. Crea NmapScanner o NmapStreamScanner
+    según NMAP_BACKEND, configurado con los puertos, argumentos y
+    presupuesto de tiempo del perfil de escaneo.
     """
+    def __init__(self, profile: str | None = None):
+        self.profile = get_profile(profile)
+
     def factory_method(self):
-        return NmapScanner()
+        kwargs = {
+            "ports": self.profile.ports,
+            "arguments": self.profile.nmap_arguments(),
+            "timeout": self.profile.budget_seconds + NMAP_TIMEOUT_GRACE_SECONDS,
+        }
+        if NMAP_BACKEND == "stream":
+            return NmapStreamScanner(**kwargs)
+        return NmapScanner(**kwargs)
+
+    def scan(self, domain: str, on_port=None):
+        """
+        Consulta la caché de resultados de nmap antes de lanzar un escaneo
+        nuevo, que espera turno en el control de admisión. Si hay un mapa de
+        puertos anterior del dominio el escaneo es incremental. Sólo se
+        cachean escaneos sin error y con algún host.
+        """
+        scanner = self.factory_method()
+        key = scan_cache_key(domain, scanner.ports, scanner.arguments)
+        cached = scan_cache.get(key)
+        if cached is not None:
+            logger.info(f"Resultado de nmap en caché para {domain}")
+            if on_port:
+                for host, puertos in cached.items():
+                    for puerto in puertos if isinstance(puertos, list) else []:
+                        on_port(host, puerto)
+            return cached
+
+        historial_key = port_history_key(domain, scanner.ports)
+        anterior = port_history.get(historial_key) if NMAP_INCREMENTAL else None
+        with nmap_admission.slot(domain.lower()):
+            if anterior is not None:
+                result = scanner.rescan_domain(domain, anterior, on_port=on_port)
+            else:
+                result = scanner.scan_domain(domain, on_port=on_port)
+        if _cacheable(result):
+            scan_cache.set(key, result)
+            port_history.set(historial_key, solo_hosts(result))
+        return result
+
+    def scan_many(self, domains: list[str]) -> dict[str, dict]:
+        """
+        Escanea varios dominios agrupando los que no están en caché en
+        invocaciones compartidas de nmap de hasta NMAP_BATCH_TARGETS objetivos.
+        Si un grupo falla, sus dominios reciben {"error": ...} y el resto
+        del lote sigue.
+        """
+        scanner = self.factory_method()
+        results: dict[str, dict] = {}
+        pendientes: list[str] = []
+        for domain in dict.fromkeys(domains):
+            cached = scan_cache.get(scan_cache_key(domain, scanner.ports, scanner.arguments))
+            if cached is not None:
+                results[domain] = cached
+            else:
+                pendientes.append(domain)
+        if results:
+            logger.info(f"{len(results)} resultados de nmap en caché para el lote")
+
+        for i in range(0, len(pendientes), NMAP_BATCH_TARGETS):
+            grupo = pendientes[i:i + NMAP_BATCH_TARGETS]
+            try:
+                # Una invocación compartida ocupa un único proceso de nmap
+                with nmap_admission.slot():
+                    resultados = scanner.scan_domains(grupo)
+            except (ScanError, OverloadedError) as e:
+                # El fallo de un grupo no interrumpe el resto del lote
+                logger.error(f"Escaneo por lotes fallido para {', '.join(grupo)}: {e}")
+                resultados = {domain: {"error": str(e)} for domain in grupo}
+            for domain, result in resultados.items():
+                if _cacheable(result):
+                    scan_cache.set(scan_cache_key(domain, scanner.ports, scanner.arguments), result)
+                    port_history.set(port_history_key(domain, scanner.ports), solo_hosts(result))
+                results[domain] = result
+        return results
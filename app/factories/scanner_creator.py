@@ -7,6 +7,6 @@ class ScannerCreator(ABC):
         """Devuelve una instancia de un scanner concreto."""
         pass
 
-    def scan(self, domain: str):
+    def scan(self, domain: str, on_port=None):
         scanner = self.factory_method()
-        return scanner.scan_domain(domain)
+        return scanner.scan_domain(domain, on_port=on_port)
@@ -1,11 +1,50 @@
 # app/main.py
-from fastapi import FastAPI
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from app.routers.scan import router as scan_router
-from app.factories.logger_factory import LoggerFactory
+from app.factories.logger_factory import LoggerFactory, log_context
+from app.services import pdf_renderer, mailer, aws_clients, metadata_store
+from app.services.metrics import render_metrics
 
-app = FastAPI()
 logger = LoggerFactory.create_logger("api")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque: lanza la sonda de AWS en segundo plano, precompila
+    plantillas y resuelve wkhtmltopdf.
+    Parada: vacía la cola de emails pendientes y escribe los metadatos
+    que quedan en el buffer.
+    """
+    aws_clients.start_health_probe()
+    try:
+        pdf_renderer.warm_up()
+    except Exception as e:
+        logger.warning(f"No se pudo precalentar el renderizador de PDF: {e}")
+    yield
+    metadata_store.shutdown()
+    aws_clients.stop_health_probe()
+    mailer.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """
+    Asigna un request_id (o respeta X-Request-ID) que aparece en todos los
+    logs de la petición y de los trabajos que encola.
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    with log_context(request_id=request_id):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 # Registrar routers
 app.include_router(scan_router, prefix="/scan", tags=["scan"])
 
@@ -16,3 +55,13 @@ async def read_root():
     """
     logger.info("Acceso a la ruta raíz")
     return {"message": "Bienvenido a la API de Escaneo de Dominios"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Métricas en formato Prometheus: duración por etapa, aciertos de caché,
+    errores por tipo y trabajos en curso.
+    """
+    cuerpo, content_type = render_metrics()
+    return Response(content=cuerpo, media_type=content_type)
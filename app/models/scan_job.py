@@ -0,0 +1,22 @@
+# app/models/scan_job.py
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel
+from app.models.scan_profile import ScanProfileName, DEFAULT_PROFILE
+
+JobStatus = Literal["queued", "running", "completed", "failed"]
+JobKind   = Literal["scan", "batch"]
+
+class ScanJob(BaseModel):
+    job_id: str
+    kind: JobKind = "scan"
+    domain: str | None = None
+    email: str | None = None
+    profile: ScanProfileName = DEFAULT_PROFILE
+    status: JobStatus = "queued"
+    stage: str | None = None
+    result: dict | None = None
+    error: str | None = None
+    timings: dict[str, float] = {}
+    created_at: datetime
+    updated_at: datetime
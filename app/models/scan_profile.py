@@ -0,0 +1,63 @@
+# app/models/scan_profile.py
+import os
+from typing import Literal
+from pydantic import BaseModel
+
+ScanProfileName = Literal["quick", "standard", "deep"]
+
+# Orden de profundidad: un reporte puede reutilizarse para peticiones de
+# un perfil igual o menos profundo que el suyo
+PROFILE_DEPTH = {"quick": 0, "standard": 1, "deep": 2}
+
+
+class ScanProfile(BaseModel):
+    """
+    Perfil de escaneo: qué puertos, con qué argumentos y con qué
+    presupuesto de tiempo. El presupuesto se aplica a nmap con
+    --host-timeout y además como límite de reloj del proceso.
+    """
+    name: ScanProfileName
+    ports: str | None
+    arguments: str
+    budget_seconds: int
+    max_rtt_timeout_ms: int
+
+    def nmap_arguments(self) -> str:
+        return (
+            f"{self.arguments} --host-timeout {self.budget_seconds}s "
+            f"--max-rtt-timeout {self.max_rtt_timeout_ms}ms"
+        )
+
+
+SCAN_PROFILES: dict[str, ScanProfile] = {
+    # Top 100 puertos, timing agresivo y detección de versiones ligera
+    "quick": ScanProfile(
+        name="quick",
+        ports=None,
+        arguments="-sV --version-light -T4 --top-ports 100",
+        budget_seconds=int(os.getenv("SCAN_BUDGET_QUICK_SECONDS", 120)),
+        max_rtt_timeout_ms=int(os.getenv("SCAN_MAX_RTT_QUICK_MS", 300)),
+    ),
+    # Comportamiento histórico: 1-1024 con -sV
+    "standard": ScanProfile(
+        name="standard",
+        ports="1-1024",
+        arguments="-sV",
+        budget_seconds=int(os.getenv("SCAN_BUDGET_STANDARD_SECONDS", 900)),
+        max_rtt_timeout_ms=int(os.getenv("SCAN_MAX_RTT_STANDARD_MS", 1000)),
+    ),
+    # Rango completo; se beneficia de NMAP_SHARDS
+    "deep": ScanProfile(
+        name="deep",
+        ports="1-65535",
+        arguments="-sV -T4",
+        budget_seconds=int(os.getenv("SCAN_BUDGET_DEEP_SECONDS", 3600)),
+        max_rtt_timeout_ms=int(os.getenv("SCAN_MAX_RTT_DEEP_MS", 1000)),
+    ),
+}
+
+DEFAULT_PROFILE: ScanProfileName = "standard"
+
+
+def get_profile(name: str | None) -> ScanProfile:
+    return SCAN_PROFILES[name or DEFAULT_PROFILE]
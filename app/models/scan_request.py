@@ -1,7 +1,26 @@
 # app/models/scan_request.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from app.models.scan_profile import ScanProfileName, DEFAULT_PROFILE
+
+# Máximo de elementos aceptados en POST /scan/batch
+BATCH_MAX_ITEMS = 500
 
 class ScanRequest(BaseModel):
     domain: str
     email: EmailStr
+    # quick (top 100 puertos), standard (1-1024) o deep (1-65535)
+    profile: ScanProfileName = DEFAULT_PROFILE
+
+class ScanBatchItem(BaseModel):
+    # El perfil va en el lote: un "profile" por elemento se rechaza en vez
+    # de ignorarse en silencio
+    model_config = ConfigDict(extra="forbid")
+
+    domain: str
+    email: EmailStr
+
+class ScanBatchRequest(BaseModel):
+    items: list[ScanBatchItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    # Perfil común a todo el lote
+    profile: ScanProfileName = DEFAULT_PROFILE
     
\ No newline at end of file
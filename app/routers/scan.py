@@ -1,29 +1,60 @@
 # app/routers/scan.py
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+import json
+import os
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import ValidationError
-from app.models.scan_request import ScanRequest
+from app.models.scan_request import ScanRequest, ScanBatchRequest
 from app.services.scan_service import perform_scan
+from app.services.job_service import submit_scan_job, submit_batch_job, get_job, get_job_events
+from app.services.exceptions import OverloadedError
 from app.factories.logger_factory import LoggerFactory
 
 router = APIRouter()
 logger = LoggerFactory.create_logger("scan_router")
 
+# Stream SSE: cada cuánto se revisan eventos nuevos y cada cuánto se manda
+# un comentario de keep-alive para que el balanceador no corte la conexión
+SSE_POLL_SECONDS      = float(os.getenv("SSE_POLL_SECONDS", 0.5))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+
+
+def _respuesta_sobrecarga(e: OverloadedError) -> JSONResponse:
+    logger.warning(f"Petición rechazada por sobrecarga: {e}")
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(e)},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
 @router.post(
     "/",
-    summary="Ejecuta un escaneo de dominio y entrega resultados",
+    summary="Encola un escaneo de dominio (o lo ejecuta si wait=true)",
     response_model=dict,
-    status_code=status.HTTP_200_OK
+    status_code=status.HTTP_202_ACCEPTED
 )
-async def scan_endpoint(request: ScanRequest):
+async def scan_endpoint(request: ScanRequest, wait: bool = False):
     """
-    Recibe dominio y email, orquesta el escaneo completo y devuelve:
+    Recibe dominio, email y perfil de escaneo (quick, standard o deep)
+    y encola el escaneo completo.
+    Devuelve el trabajo creado; el estado se consulta en GET /scan/{job_id}.
+
+    Con wait=true espera al resultado y devuelve:
       - resultados de Nmap
       - informe de seguridad
-      - URL firmada del PDF (si aplica)
     """
     try:
-        result = await perform_scan(request.domain, request.email)
-        return result
+        if wait:
+            result = await perform_scan(request.domain, request.email, request.profile)
+            return JSONResponse(status_code=status.HTTP_200_OK, content=result)
+
+        job = submit_scan_job(request.domain, request.email, request.profile)
+        return job.model_dump(mode="json")
+
+    except OverloadedError as oe:
+        return _respuesta_sobrecarga(oe)
 
     except ValidationError as ve:
         logger.error(f"Error de validación en request: {ve}")
@@ -42,3 +73,96 @@ async def scan_endpoint(request: ScanRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno al procesar el escaneo"
         )
+
+
+@router.post(
+    "/batch",
+    summary="Encola un lote de escaneos con invocaciones de nmap compartidas",
+    response_model=dict,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def scan_batch_endpoint(request: ScanBatchRequest):
+    """
+    Recibe una lista de pares dominio/email y los encola como un único
+    trabajo. El resultado (GET /scan/{job_id}) incluye el estado de cada
+    elemento.
+    """
+    try:
+        job = submit_batch_job(
+            [(item.domain, item.email) for item in request.items],
+            request.profile,
+        )
+        return job.model_dump(mode="json")
+
+    except OverloadedError as oe:
+        return _respuesta_sobrecarga(oe)
+
+    except Exception:
+        logger.exception("Fallo inesperado en scan_batch_endpoint")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno al procesar el lote"
+        )
+
+
+@router.get(
+    "/{job_id}",
+    summary="Consulta el estado de un escaneo encolado",
+    response_model=dict
+)
+async def scan_status_endpoint(job_id: str):
+    """
+    Devuelve estado, etapa actual y resultado (si terminó) de un trabajo.
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    return job.model_dump(mode="json")
+
+
+async def _stream_eventos(job_id: str, desde: int):
+    ultimo_envio = asyncio.get_running_loop().time()
+    while True:
+        estado = get_job_events(job_id, desde)
+        if estado is None:
+            return
+        eventos, terminado = estado
+        for ev in eventos:
+            yield f"id: {ev['id']}\nevent: {ev['event']}\ndata: {json.dumps(ev['data'], default=str)}\n\n"
+            desde = ev["id"] + 1
+        if terminado and not eventos:
+            return
+
+        ahora = asyncio.get_running_loop().time()
+        if eventos:
+            ultimo_envio = ahora
+        elif ahora - ultimo_envio >= SSE_HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            ultimo_envio = ahora
+        await asyncio.sleep(SSE_POLL_SECONDS)
+
+
+@router.get(
+    "/{job_id}/events",
+    summary="Stream SSE con el progreso de un escaneo encolado"
+)
+async def scan_events_endpoint(job_id: str, last_event_id: int | None = Header(default=None)):
+    """
+    Emite eventos `stage` (transiciones de etapa con su duración), `port`
+    (puertos descubiertos por nmap) y un evento final `result` o `error`.
+    Admite Last-Event-ID para reanudar tras una reconexión.
+    """
+    if get_job(job_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    desde = last_event_id + 1 if last_event_id is not None else 0
+    return StreamingResponse(
+        _stream_eventos(job_id, desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,16 @@
 # app/services/__init__.py
 from abc import ABC, abstractmethod
+from typing import Callable
+
+# Callback invocado por cada puerto descubierto: on_port(host, puerto)
+PortCallback = Callable[[str, dict], None]
 
 class Scanner(ABC):
     @abstractmethod
-    def scan_domain(self, domain: str) -> dict:
+    def scan_domain(self, domain: str, on_port: PortCallback | None = None) -> dict:
         """
-        Escanea un dominio y devuelve los resultados.
+        Escanea un dominio y devuelve los resultados. Si se indica on_port,
+        se invoca con cada puerto según se va conociendo.
         """
         pass
 
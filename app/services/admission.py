@@ -0,0 +1,152 @@
+# app/services/admission.py
+
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from app.services.exceptions import OverloadedError
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("admission")
+
+# Procesos de nmap a la vez: en total, por dominio y en espera
+NMAP_MAX_CONCURRENT  = int(os.getenv("NMAP_MAX_CONCURRENT", 4))
+NMAP_MAX_PER_DOMAIN  = int(os.getenv("NMAP_MAX_PER_DOMAIN", 1))
+NMAP_MAX_QUEUE       = int(os.getenv("NMAP_MAX_QUEUE", 32))
+# Llamadas a Gemini a la vez: en total, por dominio y en espera
+GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", 4))
+GEMINI_MAX_PER_DOMAIN = int(os.getenv("GEMINI_MAX_PER_DOMAIN", 2))
+GEMINI_MAX_QUEUE      = int(os.getenv("GEMINI_MAX_QUEUE", 64))
+# Tiempo máximo esperando turno antes de rendirse
+ADMISSION_WAIT_SECONDS = float(os.getenv("ADMISSION_WAIT_SECONDS", 600))
+
+
+class AdmissionController:
+    """
+    Límite de concurrencia global y por clave (dominio) con una cola de
+    espera acotada. Cuando la cola está llena se lanza OverloadedError con
+    un Retry-After estimado a partir de la duración media de cada turno.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_per_key: int,
+        max_queue: int,
+        wait_seconds: float = ADMISSION_WAIT_SECONDS
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_per_key = max_per_key
+        self.max_queue = max_queue
+        self.wait_seconds = wait_seconds
+        self._cond = threading.Condition()
+        self._activos = 0
+        self._por_clave: dict[str, int] = defaultdict(int)
+        self._esperando = 0
+        # Media móvil de lo que dura un turno, para estimar Retry-After
+        self._duracion_media = 30.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _estimar(self, en_cola: int) -> int:
+        rondas = (self._esperando + en_cola) / max(self.max_concurrent, 1) + 1
+        return max(1, math.ceil(self._duracion_media * rondas))
+
+    def retry_after(self, en_cola: int = 0) -> int:
+        """
+        Segundos estimados hasta que haya turno, contando `en_cola`
+        trabajos que todavía no han pedido el suyo.
+        """
+        with self._cond:
+            return self._estimar(en_cola)
+
+    def _rechazar(self, motivo: str, en_cola: int = 0):
+        self.rejected += 1
+        retry_after = self._estimar(en_cola)
+        logger.warning(f"[{self.name}] {motivo} (Retry-After {retry_after}s)")
+        raise OverloadedError(f"Demasiados trabajos de {self.name} en curso", retry_after=retry_after)
+
+    def _hay_hueco(self, key: str | None) -> bool:
+        if self._activos >= self.max_concurrent:
+            return False
+        return key is None or self._por_clave[key] < self.max_per_key
+
+    def check(self, en_cola: int = 0):
+        """
+        Lanza OverloadedError si ahora mismo no se admitiría más trabajo
+        en espera. Sirve para rechazar en la API antes de encolar:
+        `en_cola` son los trabajos aceptados que aún no han llegado a pedir
+        turno y cuentan como si ya estuvieran esperando.
+        """
+        with self._cond:
+            if self._activos + self._esperando + en_cola >= self.max_concurrent + self.max_queue:
+                self._rechazar("cola de espera llena", en_cola)
+
+    @contextmanager
+    def slot(self, key: str | None = None):
+        """
+        Espera turno para `key` (None sólo cuenta para el límite global).
+        """
+        with self._cond:
+            if not self._hay_hueco(key):
+                if self._esperando >= self.max_queue:
+                    self._rechazar("cola de espera llena")
+                self._esperando += 1
+                try:
+                    admitido = self._cond.wait_for(lambda: self._hay_hueco(key), timeout=self.wait_seconds)
+                finally:
+                    self._esperando -= 1
+                if not admitido:
+                    self._rechazar(f"sin turno tras {self.wait_seconds:.0f}s")
+            self._activos += 1
+            if key is not None:
+                self._por_clave[key] += 1
+            self.admitted += 1
+
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            duracion = time.monotonic() - inicio
+            with self._cond:
+                self._activos -= 1
+                if key is not None:
+                    self._por_clave[key] -= 1
+                    if not self._por_clave[key]:
+                        del self._por_clave[key]
+                self._duracion_media = 0.8 * self._duracion_media + 0.2 * duracion
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running":  self._activos,
+                "waiting":  self._esperando,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+nmap_admission   = AdmissionController("nmap", NMAP_MAX_CONCURRENT, NMAP_MAX_PER_DOMAIN, NMAP_MAX_QUEUE)
+gemini_admission = AdmissionController("gemini", GEMINI_MAX_CONCURRENT, GEMINI_MAX_PER_DOMAIN, GEMINI_MAX_QUEUE)
+
+
+def check_capacity(en_cola: int = 0):
+    """
+    Rechaza con OverloadedError si nmap o Gemini tienen la cola llena,
+    contando los `en_cola` trabajos aceptados que aún no han empezado.
+    """
+    nmap_admission.check(en_cola)
+    gemini_admission.check(en_cola)
+
+
+def estimate_retry_after(en_cola: int = 0) -> int:
+    """
+    Retry-After para un rechazo por otros límites: lo que se estima que
+    tardará en liberarse turno en nmap o Gemini.
+    """
+    return max(nmap_admission.retry_after(en_cola), gemini_admission.retry_after(en_cola))
@@ -0,0 +1,96 @@
+# app/services/analysis_cache.py
+
+import hashlib
+import json
+import os
+import re
+from app.services.cache import DiskCache, CACHE_DIR
+from app.services.gemini_analyzer import GEMINI_MODEL, PROMPT_VERSION, PROMPT_SCAN_TOKEN_BUDGET
+
+ANALYSIS_CACHE_TTL         = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 5000))
+
+analysis_cache = DiskCache(
+    os.path.join(CACHE_DIR, "analysis.sqlite"),
+    ttl_seconds=ANALYSIS_CACHE_TTL,
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+)
+
+_DOMAIN = "{{domain}}"
+
+
+def _huella_host(puertos: list[dict]) -> list[list]:
+    return sorted({
+        (p.get("port"), p.get("state", ""), p.get("service", ""), p.get("product", ""), p.get("version", ""))
+        for p in puertos
+    })
+
+
+def _hosts_ordenados(scan_result: dict) -> list[tuple[str, list[list]]]:
+    """
+    Hosts del escaneo con su huella, en un orden que no depende de sus
+    direcciones: así dos dominios con la misma exposición producen la
+    misma huella y los mismos marcadores {{hostN}}.
+    """
+    hosts = [(h, _huella_host(p)) for h, p in scan_result.items() if isinstance(p, list)]
+    return sorted(hosts, key=lambda x: json.dumps(x[1]))
+
+
+def analysis_cache_key(scan_result: dict) -> str:
+    """
+    Clave por contenido: huella normalizada del escaneo + versión del prompt,
+    presupuesto de tokens y modelo. No incluye el dominio ni las IPs.
+    """
+    huella = [h for _, h in _hosts_ordenados(scan_result)]
+    raw = json.dumps([GEMINI_MODEL, PROMPT_VERSION, PROMPT_SCAN_TOKEN_BUDGET, huella])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _patron(sustituciones: list[tuple[str, str]]) -> re.Pattern:
+    """
+    Una sola expresión con todos los valores, del más largo al más corto,
+    que sólo casa con valores completos: 10.0.0.1 no casa dentro de
+    10.0.0.12 ni a.io dentro de www.a.io o a.io.example. Un punto final
+    (fin de frase) no cuenta como continuación.
+    """
+    valores = sorted((antes for antes, _ in sustituciones), key=len, reverse=True)
+    alternativas = "|".join(re.escape(v) for v in valores)
+    return re.compile(rf"(?<![\w.-])(?:{alternativas})(?![\w-]|\.\w)")
+
+
+def _reemplazar(obj, sustituciones: list[tuple[str, str]]):
+    tabla = dict(sustituciones)
+    patron = _patron(sustituciones)
+    return _reemplazar_con(obj, patron, lambda m: tabla[m.group(0)])
+
+
+def _reemplazar_con(obj, patron: re.Pattern, reemplazo):
+    if isinstance(obj, str):
+        return patron.sub(reemplazo, obj)
+    if isinstance(obj, list):
+        return [_reemplazar_con(v, patron, reemplazo) for v in obj]
+    if isinstance(obj, dict):
+        return {k: _reemplazar_con(v, patron, reemplazo) for k, v in obj.items()}
+    return obj
+
+
+def _sustituciones(domain: str, scan_result: dict) -> list[tuple[str, str]]:
+    return [(domain, _DOMAIN)] + [
+        (host, f"{{{{host{i}}}}}") for i, (host, _) in enumerate(_hosts_ordenados(scan_result))
+    ]
+
+
+def anonimizar(report: dict, domain: str, scan_result: dict) -> dict:
+    """
+    Sustituye dominio e IPs por marcadores antes de guardar en caché.
+    """
+    report = {k: v for k, v in report.items() if k not in ("domain", "timestamp")}
+    return _reemplazar(report, _sustituciones(domain, scan_result))
+
+
+def personalizar(report: dict, domain: str, scan_result: dict) -> dict:
+    """
+    Inversa de anonimizar para el dominio y escaneo de la petición actual.
+    """
+    inversas = [(marca, valor) for valor, marca in _sustituciones(domain, scan_result)]
+    return _reemplazar(report, inversas)
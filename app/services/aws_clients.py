@@ -0,0 +1,112 @@
+# app/services/aws_clients.py
+
+import os
+import threading
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("aws_clients")
+
+# AWS config
+AWS_REGION  = os.getenv("AWS_REGION", os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
+TABLE_NAME  = os.getenv("DYNAMODB_TABLE_NAME", "companies")
+BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "hacker4me")
+
+# Cada cuánto se vuelve a comprobar la disponibilidad de AWS y timeouts
+# cortos para que la comprobación no bloquee cuando no hay red
+AWS_HEALTH_INTERVAL_SECONDS = float(os.getenv("AWS_HEALTH_INTERVAL_SECONDS", 60))
+AWS_CONNECT_TIMEOUT         = float(os.getenv("AWS_CONNECT_TIMEOUT", 3))
+
+_lock     = threading.Lock()
+_clientes: dict[str, object] = {}
+_estado: bool | None = None
+_sonda: threading.Thread | None = None
+_parar    = threading.Event()
+
+
+def _crear(tipo: str, nombre: str):
+    """
+    Crea (una sola vez) un cliente o recurso de boto3. boto3 se importa
+    aquí para que importar la aplicación no pague su coste.
+    """
+    clave = f"{tipo}:{nombre}"
+    with _lock:
+        if clave not in _clientes:
+            import boto3
+            from botocore.config import Config
+
+            if "session" not in _clientes:
+                _clientes["session"] = boto3.session.Session()
+            session = _clientes["session"]
+            config = Config(connect_timeout=AWS_CONNECT_TIMEOUT, retries={"max_attempts": 3})
+            fabrica = session.resource if tipo == "resource" else session.client
+            _clientes[clave] = fabrica(nombre, region_name=AWS_REGION, config=config)
+        return _clientes[clave]
+
+
+def get_s3():
+    return _crear("client", "s3")
+
+
+def get_dynamodb():
+    return _crear("resource", "dynamodb")
+
+
+def get_sqs():
+    return _crear("client", "sqs")
+
+
+def comprobar_aws() -> bool:
+    """
+    Comprueba que la tabla de DynamoDB y el bucket de S3 responden y
+    actualiza el estado compartido.
+    """
+    global _estado
+    try:
+        get_dynamodb().Table(TABLE_NAME).load()
+        get_s3().head_bucket(Bucket=BUCKET_NAME)
+        disponible = True
+    except Exception as e:
+        logger.debug(f"Comprobación de AWS fallida: {e}")
+        disponible = False
+
+    if disponible != _estado:
+        if disponible:
+            logger.info("AWS OK: DynamoDB y S3 disponibles")
+        else:
+            logger.warning("Modo local: AWS no disponible")
+    _estado = disponible
+    return disponible
+
+
+def aws_disponible() -> bool:
+    """
+    Estado de AWS según la última comprobación. Si todavía no se ha hecho
+    ninguna (la sonda no ha arrancado), se comprueba en este momento.
+    """
+    if _estado is None:
+        return comprobar_aws()
+    return _estado
+
+
+def _bucle_sonda():
+    while not _parar.is_set():
+        comprobar_aws()
+        _parar.wait(AWS_HEALTH_INTERVAL_SECONDS)
+
+
+def start_health_probe():
+    """
+    Arranca en segundo plano la comprobación periódica de AWS, de modo que
+    el servicio pasa entre modo S3 y modo local sin reiniciar.
+    """
+    global _sonda
+    with _lock:
+        if _sonda is not None and _sonda.is_alive():
+            return
+        _parar.clear()
+        _sonda = threading.Thread(target=_bucle_sonda, name="aws-health-probe", daemon=True)
+        _sonda.start()
+
+
+def stop_health_probe():
+    _parar.set()
@@ -0,0 +1,85 @@
+# app/services/circuit_breaker.py
+
+import threading
+import time
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("circuit_breaker")
+
+CLOSED    = "closed"
+OPEN      = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a un servicio tras `failure_threshold` fallos
+    seguidos. Pasados `reset_seconds` deja pasar una única llamada de
+    prueba: si sale bien se cierra de nuevo y si falla vuelve a abrirse.
+    Una prueba que no informa de su resultado en `reset_seconds` se da por
+    perdida y se concede otra.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._estado = CLOSED
+        self._fallos = 0
+        self._abierto_en = 0.0
+        self._prueba_en_curso = False
+        self._prueba_desde = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._estado == OPEN and time.monotonic() - self._abierto_en >= self.reset_seconds:
+                return HALF_OPEN
+            return self._estado
+
+    def allow(self) -> bool:
+        """
+        True si se puede hacer una llamada ahora. En semiabierto sólo se
+        concede a la primera que lo pide.
+        """
+        with self._lock:
+            if self._estado == CLOSED:
+                return True
+            if self._estado == OPEN and time.monotonic() - self._abierto_en >= self.reset_seconds:
+                self._estado = HALF_OPEN
+                self._prueba_en_curso = False
+            if self._estado == HALF_OPEN and (
+                not self._prueba_en_curso
+                or time.monotonic() - self._prueba_desde >= self.reset_seconds
+            ):
+                self._prueba_en_curso = True
+                self._prueba_desde = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            if self._estado != CLOSED:
+                logger.info(f"[{self.name}] Circuito cerrado")
+            self._estado = CLOSED
+            self._fallos = 0
+            self._prueba_en_curso = False
+
+    def failure(self):
+        with self._lock:
+            self._fallos += 1
+            if self._estado == HALF_OPEN or (
+                self._estado == CLOSED and self._fallos >= self.failure_threshold
+            ):
+                self._estado = OPEN
+                self._abierto_en = time.monotonic()
+                self._prueba_en_curso = False
+                self.opened += 1
+                logger.warning(
+                    f"[{self.name}] Circuito abierto tras {self._fallos} fallos seguidos; "
+                    f"nuevo intento en {self.reset_seconds:.0f}s"
+                )
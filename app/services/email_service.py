@@ -2,11 +2,12 @@
 
 import os
 import smtplib
-import logging
+from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from app.factories.logger_factory import LoggerFactory
+from app.services.mailer import get_outbox
 
 logger = LoggerFactory.create_logger("email_service")
 
@@ -32,23 +33,14 @@ def render_scan_email(domain: str) -> str:
         raise
     
 
-def send_email(
+def _construir_mensaje(
+    remitente: str,
     destinatario: str,
     asunto: str,
     cuerpo_html: str,
     attachment: bytes = None,
-    filename: str = "report.pdf",
-    remitente: str = None
-) -> bool:
-    """
-    Envía un correo HTML usando SMTP.
-    """
-    remitente  = remitente or os.getenv("EMAIL_FROM", "noreply@hack4me.com")
-    smtp_host  = os.getenv("SMTP_HOST", "localhost")
-    smtp_port  = int(os.getenv("SMTP_PORT", 25))
-    smtp_user  = os.getenv("SMTP_USER")
-    smtp_pass  = os.getenv("SMTP_PASS")
-
+    filename: str = "report.pdf"
+) -> str:
     msg = MIMEMultipart("alternative")
     msg["From"]    = remitente
     msg["To"]      = destinatario
@@ -57,8 +49,6 @@ def send_email(
     msg.attach(MIMEText(cuerpo_html, "html", "utf-8"))
 
     if attachment:
-        from email.mime.application import MIMEApplication
-
         pdf_part = MIMEApplication(attachment, _subtype="pdf")
         pdf_part.add_header(
             "Content-Disposition",
@@ -67,12 +57,25 @@ def send_email(
         )
         msg.attach(pdf_part)
 
+    return msg.as_string()
+
+
+def send_email(
+    destinatario: str,
+    asunto: str,
+    cuerpo_html: str,
+    attachment: bytes = None,
+    filename: str = "report.pdf",
+    remitente: str = None
+) -> bool:
+    """
+    Envía un correo HTML de forma síncrona usando una conexión del pool SMTP.
+    """
+    remitente = remitente or os.getenv("EMAIL_FROM", "noreply@hack4me.com")
+    mensaje   = _construir_mensaje(remitente, destinatario, asunto, cuerpo_html, attachment, filename)
+
     try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            if smtp_user and smtp_pass:
-                server.starttls()
-                server.login(smtp_user, smtp_pass)
-            server.sendmail(remitente, destinatario, msg.as_string())
+        get_outbox().send_now(remitente, destinatario, mensaje)
         logger.info(f"Email enviado a {destinatario}")
         return True
 
@@ -83,3 +86,38 @@ def send_email(
     except Exception as e:
         logger.error(f"Error inesperado en send_email: {e}")
         return False
+
+
+def enqueue_email(
+    destinatario: str,
+    asunto: str,
+    cuerpo_html: str,
+    attachment: bytes = None,
+    filename: str = "report.pdf",
+    remitente: str = None
+) -> str:
+    """
+    Encola un correo HTML en el outbox y devuelve su id. El envío, con
+    reintentos, lo hacen los workers del mailer. Lanza EmailError si la
+    cola está llena.
+    """
+    remitente = remitente or os.getenv("EMAIL_FROM", "noreply@hack4me.com")
+    mensaje   = _construir_mensaje(remitente, destinatario, asunto, cuerpo_html, attachment, filename)
+    return get_outbox().enqueue(remitente, destinatario, mensaje)
+
+
+def deliver_email(
+    destinatario: str,
+    asunto: str,
+    cuerpo_html: str,
+    attachment: bytes = None,
+    filename: str = "report.pdf",
+    remitente: str = None
+) -> str:
+    """
+    Como enqueue_email, pero espera a que el outbox envíe el correo y
+    devuelve su id. Lanza EmailError si el envío falla.
+    """
+    remitente = remitente or os.getenv("EMAIL_FROM", "noreply@hack4me.com")
+    mensaje   = _construir_mensaje(remitente, destinatario, asunto, cuerpo_html, attachment, filename)
+    return get_outbox().deliver(remitente, destinatario, mensaje)
@@ -6,8 +6,18 @@ class ScanError(Exception):
 class AnalysisError(Exception):
     """Errores durante el análisis con IA."""
 
+class CircuitOpenError(AnalysisError):
+    """El circuit breaker no deja llamar al servicio de IA."""
+
 class ReportError(Exception):
     """Errores generando o subiendo reportes PDF."""
 
 class EmailError(Exception):
     """Errores al enviar emails."""
+
+class OverloadedError(Exception):
+    """El servicio no admite más trabajo por ahora."""
+
+    def __init__(self, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -1,44 +1,173 @@
 # app/services/gemini_analyzer.py
 
+import contextvars
 import os
+import socket
 import requests
 import json
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
+from typing import Callable
+from requests.adapters import HTTPAdapter
 from app.services import IAAnalyzer
+from app.services.scan_serializer import serializar_escaneo, estimar_tokens
+from app.services.circuit_breaker import CircuitBreaker, OPEN
+from app.services.exceptions import AnalysisError, CircuitOpenError
+from app.services.metrics import medir
 from app.factories.logger_factory import LoggerFactory
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Base de la API; se puede apuntar a un servidor local (benchmarks)
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta")
 HEADERS_GEMINI = {"Content-Type": "application/json"}
+GEMINI_MODEL   = "gemini-2.0-flash"
+# Cambiar al modificar el prompt: invalida los análisis cacheados
+PROMPT_VERSION = "3"
+# Presupuesto de tokens para el escaneo dentro del prompt
+PROMPT_SCAN_TOKEN_BUDGET = int(os.getenv("PROMPT_SCAN_TOKEN_BUDGET", 2000))
+
+# "single": una petición con todo el informe. "sections": una petición por
+# grupo de secciones (y por grupo de hosts en los hallazgos), en paralelo
+GEMINI_MODE = os.getenv("GEMINI_MODE", "single")
+# Timeout de la petición única del modo "single"
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 400))
+# Modo "sections": plazo total de cada sección (reintentos incluidos), a
+# partir de cuándo se lanza un intento duplicado y máximo de intentos
+GEMINI_CALL_DEADLINE_SECONDS = float(os.getenv("GEMINI_CALL_DEADLINE_SECONDS", 90))
+GEMINI_HEDGE_SECONDS         = float(os.getenv("GEMINI_HEDGE_SECONDS", 20))
+GEMINI_MAX_ATTEMPTS          = int(os.getenv("GEMINI_MAX_ATTEMPTS", 3))
+# Hosts por petición de hallazgos en escaneos con varios hosts
+GEMINI_HOSTS_PER_CHUNK = int(os.getenv("GEMINI_HOSTS_PER_CHUNK", 8))
+# Conexiones HTTP reutilizables e hilos para las peticiones en paralelo
+GEMINI_POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", 16))
+# Fallos seguidos que abren el circuito y tiempo hasta el siguiente intento
+GEMINI_BREAKER_FAILURES      = int(os.getenv("GEMINI_BREAKER_FAILURES", 5))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", 30))
+
+gemini_breaker = CircuitBreaker("gemini", GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET_SECONDS)
+
+# Descripción de cada campo del informe en el prompt
+_CAMPOS = {
+    "table_of_contents": "table_of_contents (as a list of strings)",
+    "summary": "summary",
+    "objective": "objective",
+    "requirements": "requirements (as a list of strings)",
+    "high_level_summary": "high_level_summary",
+    "recommendations": "recommendations (as a list of strings)",
+    "methodology": "methodology (as a list of objects with 'title', 'description', and 'evidence')",
+    "vulnerabilities": "vulnerabilities (as a list of objects with 'cve_id' and 'severity')",
+    "penetration": (
+        "penetration (as a list of vulnerabilities with 'vulnerability_exploited', 'system_vulnerable', "
+        "'description', 'severity', 'proof_of_concept')\n"
+        "              - NOTE: If no penetration testing was performed, map vulnerabilities from the "
+        "vulnerabilities section into penetration to avoid empty findings."
+    ),
+    "maintaining_access": "maintaining_access",
+    "house_cleaning": "house_cleaning",
+    "additional_notes": "additional_notes",
+}
+
+# Grupos de secciones independientes del modo "sections". Los hallazgos
+# son los únicos que dependen de cada host y se trocean por hosts.
+SECCIONES = {
+    "overview": ["table_of_contents", "summary", "objective", "requirements", "high_level_summary", "additional_notes"],
+    "findings": ["vulnerabilities", "penetration"],
+    "methodology": ["methodology"],
+    "remediation": ["recommendations", "maintaining_access", "house_cleaning"],
+}
+
+_session: requests.Session | None = None
+_executor: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Sesión HTTP compartida: reutiliza conexiones (TLS incluido) entre
+    llamadas y entre análisis.
+    """
+    global _session
+    with _pool_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GEMINI_POOL_SIZE, thread_name_prefix="gemini")
+        return _executor
+
+
+class _Intento:
+    """
+    Un intento de llamada a Gemini que se puede abortar desde otro hilo.
+    requests no corta una lectura en curso al cerrar la respuesta, así que
+    abortar cierra el socket: la lectura bloqueada falla en el acto y el
+    hilo del pool queda libre.
+    """
 
-class GeminiAnalyzer(IAAnalyzer):
     def __init__(self):
-        self.logger = LoggerFactory.create_logger("gemini_analyzer")
+        self._lock = threading.Lock()
+        self._response: requests.Response | None = None
+        self.cancelado = False
+        self.vencido = False
 
-    def analyze_scan(self, domain: str, scan_text: str) -> dict:
+    def registrar(self, response: requests.Response) -> bool:
+        """Asocia la respuesta en curso. False si el intento ya se abortó."""
+        with self._lock:
+            self._response = response
+            return not (self.cancelado or self.vencido)
+
+    def cancelar(self):
+        """Ya no hace falta: otro intento ganó o el análisis se dio por perdido."""
+        with self._lock:
+            self.cancelado = True
+        self._cerrar()
+
+    def vencer(self):
+        """Se agotó el plazo de la llamada."""
+        with self._lock:
+            self.vencido = True
+        self._cerrar()
+
+    def _cerrar(self):
+        with self._lock:
+            response = self._response
+        if response is None:
+            # Aún esperando cabeceras: acaba como tarde por el timeout de lectura
+            return
+        # urllib3 no expone el socket; si la conexión no se reutiliza
+        # (Connection: close) sólo queda accesible desde el fichero de lectura
+        sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+        if sock is None:
+            fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+            sock = getattr(getattr(fp, "raw", None), "_sock", None)
         try:
-            url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
 
-            prompt = f"""
+def _prompt(domain: str, scan_text: str, campos: list[str], alcance: str = "") -> str:
+    secciones = "\n            ".join(f"- {_CAMPOS[c]}" for c in campos)
+    return f"""
             You are a cybersecurity expert and an OSCP exam report writer.
-            You will receive an Nmap scan for the domain: {domain}.
+            You will receive an Nmap scan for the domain: {domain}.{alcance}
 
             Generate a JSON analysis in English with these sections:
-            - table_of_contents (as a list of strings)
-            - summary
-            - objective
-            - requirements (as a list of strings)
-            - high_level_summary
-            - recommendations (as a list of strings)
-            - methodology (as a list of objects with 'title', 'description', and 'evidence')
-            - vulnerabilities (as a list of objects with 'cve_id' and 'severity')
-            - penetration (as a list of vulnerabilities with 'vulnerability_exploited', 'system_vulnerable', 'description', 'severity', 'proof_of_concept')
-              - NOTE: If no penetration testing was performed, map vulnerabilities from the vulnerabilities section into penetration to avoid empty findings.
-            - maintaining_access
-            - house_cleaning
-            - additional_notes
-
-            IMPORTANT: 
+            {secciones}
+
+            IMPORTANT:
             - Return valid JSON **directly** (no code blocks, no triple backticks).
             - Do **NOT** wrap JSON as a string inside the JSON.
             - Each JSON field should contain its native type (arrays, objects).
@@ -46,89 +175,346 @@ class GeminiAnalyzer(IAAnalyzer):
             - If 'requirements' is a single string, convert it to a list with that single item.
             - If 'penetration' is empty but 'vulnerabilities' exists, map vulnerabilities into penetration automatically.
 
-            Here is the scan result:
+            Here is the scan result (open ports only, one "port service product version"
+            per line, hosts with identical exposure grouped):
             --------------------
             {scan_text}
             --------------------
             """
 
-            payload = {"contents": [{"parts": [{"text": prompt}]}]}
-            self.logger.info(f"🚀 Sending analysis to Gemini.")
-            response = requests.post(
-                f"{url}?key={GEMINI_API_KEY}",
-                headers=HEADERS_GEMINI,
-                json=payload,
-                timeout=400
+
+def _trozos_por_host(scan_result: dict, por_trozo: int) -> list[dict]:
+    """
+    Reparte los hosts del escaneo en grupos de como mucho `por_trozo`.
+    Las entradas de error van con el primer grupo.
+    """
+    hosts = [h for h, p in scan_result.items() if isinstance(p, list)]
+    if len(hosts) <= por_trozo:
+        return [scan_result]
+    extra = {h: p for h, p in scan_result.items() if not isinstance(p, list) and h != "changes"}
+    trozos = []
+    for i in range(0, len(hosts), por_trozo):
+        trozo = {h: scan_result[h] for h in hosts[i:i + por_trozo]}
+        trozos.append({**extra, **trozo} if i == 0 else trozo)
+    return trozos
+
+
+def _sin_duplicados(items: list, clave: Callable[[dict], tuple]) -> list:
+    vistos, unicos = set(), []
+    for item in items:
+        k = clave(item) if isinstance(item, dict) else (json.dumps(item, sort_keys=True),)
+        if k not in vistos:
+            vistos.add(k)
+            unicos.append(item)
+    return unicos
+
+
+def _informe_error(e: Exception) -> dict:
+    return {
+        "analysis_error": str(e),
+        "summary": f"Error: {e}",
+        "objective": "",
+        "requirements": ["No requirements specified."],
+        "high_level_summary": "",
+        "recommendations": [],
+        "methodology": [],
+        "information_gathering": "",
+        "service_enumeration": [],
+        "penetration": [],
+        "maintaining_access": "",
+        "house_cleaning": "",
+        "additional_notes": "",
+        "vulnerabilities": []
+    }
+
+
+class GeminiAnalyzer(IAAnalyzer):
+    def __init__(self):
+        self.logger = LoggerFactory.create_logger("gemini_analyzer")
+        self.prompt_stats: dict = {}
+
+    def analyze_scan(self, domain: str, scan_text: str) -> dict:
+        try:
+            if GEMINI_MODE == "sections" and isinstance(scan_text, dict):
+                return self._analizar_por_secciones(domain, scan_text)
+            return self._analizar_completo(domain, scan_text)
+        except Exception as e:
+            self.logger.error(f"❌ Error processing Gemini response: {e}")
+            return _informe_error(e)
+
+    # ── Llamada HTTP ─────────────────────────────────────────────────────
+
+    def _llamar(self, prompt: str, timeout: float, intento: _Intento | None = None) -> str:
+        """
+        Envía un prompt y devuelve el texto de la respuesta. Registra el
+        resultado en el circuit breaker.
+
+        `timeout` es el plazo total de la llamada, no sólo el de cada
+        lectura. Con `intento` la llamada se puede cancelar desde otro
+        hilo; un intento cancelado no cuenta como fallo de Gemini.
+        """
+        url = f"{GEMINI_API_URL}/models/{GEMINI_MODEL}:generateContent"
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        intento = intento or _Intento()
+        # El timeout de requests es por lectura; el plazo total lo vigila este temporizador
+        vigilante = threading.Timer(timeout, intento.vencer)
+        vigilante.daemon = True
+        vigilante.start()
+        try:
+            with medir("gemini_call"):
+                with get_session().post(
+                    f"{url}?key={GEMINI_API_KEY}",
+                    headers=HEADERS_GEMINI,
+                    json=payload,
+                    timeout=timeout,
+                    stream=True
+                ) as response:
+                    if not intento.registrar(response):
+                        raise AnalysisError("Intento de Gemini abortado")
+                    response.raise_for_status()
+                    result = response.json()
+        except Exception as e:
+            if intento.vencido:
+                gemini_breaker.failure()
+                raise requests.Timeout(f"Gemini sin respuesta completa en {timeout:.0f}s") from e
+            if intento.cancelado:
+                raise AnalysisError("Intento de Gemini cancelado") from e
+            gemini_breaker.failure()
+            raise
+        finally:
+            vigilante.cancel()
+        gemini_breaker.success()
+        # La respuesta completa sólo a nivel DEBUG: es grande y va en cada análisis
+        self.logger.info("✅ Gemini response received")
+        self.logger.debug(f"Gemini response: {result}")
+        return result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+
+    def _parsear(self, text: str) -> dict:
+        # Limpiar delimitadores de Markdown ```json ... ```
+        if text.startswith("```json"):
+            text = re.sub(r"^```json\s*|\s*```$", "", text, flags=re.DOTALL).strip()
+
+        # Deserializar si Gemini devuelve JSON serializado como string
+        if text.startswith('"') and text.endswith('"'):
+            try:
+                text = json.loads(text)
+            except Exception as e:
+                self.logger.error(f"❌ Error deserializing Gemini response (nested string): {e}")
+                text = text.strip('"')
+
+        parsed_result = json.loads(text)
+        if not isinstance(parsed_result, dict):
+            raise ValueError("Gemini's response is not a valid JSON dictionary.")
+        return parsed_result
+
+    def _normalizar(self, parsed_result: dict, domain: str) -> dict:
+        parsed_result.setdefault("domain", domain)
+        parsed_result.setdefault("timestamp", datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"))
+        parsed_result.setdefault("summary", "No summary available.")
+        parsed_result.setdefault("requirements", ["No requirements specified."])
+        parsed_result.setdefault("recommendations", [])
+        parsed_result.setdefault("methodology", [])
+        parsed_result.setdefault("service_enumeration", [])
+        parsed_result.setdefault("penetration", [])
+        parsed_result.setdefault("vulnerabilities", [])
+
+        # Convertir requirements a lista si es string
+        if isinstance(parsed_result.get("requirements"), str):
+            parsed_result["requirements"] = [parsed_result["requirements"]]
+
+        # Si no hay penetración pero hay vulnerabilidades, crear penetración
+        if not parsed_result["penetration"] and parsed_result["vulnerabilities"]:
+            parsed_result["penetration"] = [
+                {
+                    "vulnerability_exploited": vuln.get("cve_id", "Unknown CVE"),
+                    "system_vulnerable": domain,
+                    "description": "No detailed exploitation provided.",
+                    "severity": vuln.get("severity", "Unknown"),
+                    "proof_of_concept": "No PoC provided."
+                }
+                for vuln in parsed_result["vulnerabilities"]
+            ]
+
+        return parsed_result
+
+    # ── Modo "single" ────────────────────────────────────────────────────
+
+    def _analizar_completo(self, domain: str, scan_text) -> dict:
+        if isinstance(scan_text, dict):
+            scan_text, self.prompt_stats = serializar_escaneo(scan_text, PROMPT_SCAN_TOKEN_BUDGET)
+        if not gemini_breaker.allow():
+            raise CircuitOpenError("Circuito de Gemini abierto")
+
+        prompt = _prompt(domain, scan_text, list(_CAMPOS))
+        self.prompt_stats["prompt_chars"] = len(prompt)
+        self.prompt_stats["prompt_tokens"] = estimar_tokens(prompt)
+        self.logger.info(f"🚀 Sending analysis to Gemini. Prompt stats: {self.prompt_stats}")
+        text = self._llamar(prompt, GEMINI_TIMEOUT_SECONDS)
+
+        try:
+            parsed_result = self._parsear(text)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"❌ Error parsing Gemini JSON: {e}")
+            parsed_result = {}
+        return self._normalizar(parsed_result, domain)
+
+    # ── Modo "sections" ──────────────────────────────────────────────────
+
+    def _tarea(self, prompt: str) -> Callable[[float, _Intento], dict]:
+        def ejecutar(timeout: float, intento: _Intento) -> dict:
+            # El turno del circuit breaker se pide ya en el hilo del pool: un
+            # intento cancelado mientras esperaba no llega a ocuparlo
+            if not gemini_breaker.allow():
+                raise CircuitOpenError("Circuito de Gemini abierto")
+            # Una respuesta que no es JSON cuenta como fallo y se reintenta
+            return self._parsear(self._llamar(prompt, timeout, intento))
+        return ejecutar
+
+    def _analizar_por_secciones(self, domain: str, scan_result: dict) -> dict:
+        """
+        Pide cada grupo de SECCIONES en paralelo (los hallazgos, además,
+        por grupos de hosts) y combina las respuestas. Las secciones que no
+        llegan a tiempo quedan con sus valores por defecto y el informe se
+        marca con analysis_error para no cachearlo.
+        """
+        if gemini_breaker.state == OPEN:
+            raise CircuitOpenError("Circuito de Gemini abierto")
+        scan_text, self.prompt_stats = serializar_escaneo(scan_result, PROMPT_SCAN_TOKEN_BUDGET)
+        trozos = _trozos_por_host(scan_result, GEMINI_HOSTS_PER_CHUNK)
+
+        tareas: dict[str, Callable[[float, _Intento], dict]] = {}
+        for seccion, campos in SECCIONES.items():
+            if seccion == "findings" and len(trozos) > 1:
+                for i, trozo in enumerate(trozos):
+                    texto, _ = serializar_escaneo(trozo, PROMPT_SCAN_TOKEN_BUDGET)
+                    alcance = f" This part covers host group {i + 1} of {len(trozos)}."
+                    tareas[f"{seccion}.{i}"] = self._tarea(_prompt(domain, texto, campos, alcance))
+            else:
+                tareas[seccion] = self._tarea(_prompt(domain, scan_text, campos))
+
+        self.prompt_stats["calls"] = len(tareas)
+        self.logger.info(f"🚀 Sending sectioned analysis to Gemini. Prompt stats: {self.prompt_stats}")
+        resultados = self._ejecutar_con_cobertura(tareas)
+
+        informe: dict = {}
+        fallidas = []
+        for nombre, resultado in resultados.items():
+            if isinstance(resultado, Exception):
+                fallidas.append(nombre)
+                continue
+            seccion = nombre.split(".")[0]
+            for campo in SECCIONES[seccion]:
+                if campo not in resultado:
+                    continue
+                if nombre != seccion and isinstance(resultado[campo], list):
+                    informe.setdefault(campo, []).extend(resultado[campo])
+                else:
+                    informe[campo] = resultado[campo]
+
+        if len(fallidas) == len(tareas):
+            raise AnalysisError(f"Ninguna sección respondió: {resultados[fallidas[0]]}")
+
+        if "vulnerabilities" in informe:
+            informe["vulnerabilities"] = _sin_duplicados(
+                informe["vulnerabilities"], lambda v: (v.get("cve_id"),)
+            )
+        if "penetration" in informe:
+            informe["penetration"] = _sin_duplicados(
+                informe["penetration"],
+                lambda p: (p.get("vulnerability_exploited"), p.get("system_vulnerable")),
+            )
+        informe = self._normalizar(informe, domain)
+        if fallidas:
+            self.logger.warning(f"Secciones sin respuesta de Gemini: {', '.join(sorted(fallidas))}")
+            informe["analysis_error"] = f"Secciones sin respuesta: {', '.join(sorted(fallidas))}"
+        return informe
+
+    def _ejecutar_con_cobertura(
+        self, tareas: dict[str, Callable[[float, _Intento], dict]]
+    ) -> dict[str, dict | Exception]:
+        """
+        Ejecuta las tareas en paralelo con un plazo común de
+        GEMINI_CALL_DEADLINE_SECONDS. Si una tarea lleva GEMINI_HEDGE_SECONDS
+        sin responder se lanza un intento duplicado y vale la primera
+        respuesta; si falla se reintenta. Como mucho GEMINI_MAX_ATTEMPTS
+        intentos por tarea; con el circuito abierto no se reintenta.
+        Cada intento recibe como timeout lo que queda de plazo; los
+        duplicados que pierden y los que siguen en curso al vencer el plazo
+        se abortan para no retener conexiones ni hilos del pool.
+        """
+        executor = _get_executor()
+        limite = time.monotonic() + GEMINI_CALL_DEADLINE_SECONDS
+        resultados: dict[str, dict | Exception] = {}
+        intentos = {nombre: 0 for nombre in tareas}
+        ultimo: dict[str, float] = {}
+        en_vuelo: dict[Future, str] = {}
+        abortables: dict[Future, _Intento] = {}
+
+        def lanzar(nombre: str):
+            ultimo[nombre] = time.monotonic()
+            intentos[nombre] += 1
+            intento = _Intento()
+            # Los hilos del pool heredan request_id / job_id para los logs
+            futuro = executor.submit(
+                contextvars.copy_context().run, tareas[nombre], max(1.0, limite - ultimo[nombre]), intento
             )
-            response.raise_for_status()
-            result = response.json()
-            self.logger.info(f"✅ Gemini response: {result}")
+            en_vuelo[futuro] = nombre
+            abortables[futuro] = intento
 
-            text = result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+        def abortar(futuro: Future):
+            futuro.cancel()
+            abortables.pop(futuro).cancelar()
 
-            # Limpiar delimitadores de Markdown ```json ... ```
-            if text.startswith("```json"):
-                text = re.sub(r"^```json\s*|\s*```$", "", text, flags=re.DOTALL).strip()
+        for nombre in tareas:
+            lanzar(nombre)
 
-            # Deserializar si Gemini devuelve JSON serializado como string
-            if text.startswith('"') and text.endswith('"'):
+        while en_vuelo:
+            ahora = time.monotonic()
+            if ahora >= limite:
+                break
+            coberturas = [
+                ultimo[n] + GEMINI_HEDGE_SECONDS
+                for n in set(en_vuelo.values()) if intentos[n] < GEMINI_MAX_ATTEMPTS
+            ]
+            hechos, _ = wait(
+                list(en_vuelo),
+                timeout=max(0.0, min([limite, *coberturas]) - ahora),
+                return_when=FIRST_COMPLETED
+            )
+            for futuro in hechos:
+                abortables.pop(futuro, None)
+                nombre = en_vuelo.pop(futuro, None)
+                if nombre is None or nombre in resultados:
+                    continue
                 try:
-                    text = json.loads(text)
+                    resultados[nombre] = futuro.result()
                 except Exception as e:
-                    self.logger.error(f"❌ Error deserializing Gemini response (nested string): {e}")
-                    text = text.strip('"')
+                    self.logger.warning(f"Sección {nombre}: intento {intentos[nombre]} fallido ({e})")
+                    if nombre in en_vuelo.values():
+                        continue
+                    if intentos[nombre] < GEMINI_MAX_ATTEMPTS and not isinstance(e, CircuitOpenError):
+                        lanzar(nombre)
+                        continue
+                    resultados[nombre] = e
+                    continue
+                # Los intentos duplicados que siguen en curso ya no hacen falta
+                for otro in [f for f, n in en_vuelo.items() if n == nombre]:
+                    abortar(otro)
+                    del en_vuelo[otro]
 
-            try:
-                parsed_result = json.loads(text)
-            except json.JSONDecodeError as e:
-                self.logger.error(f"❌ Error parsing Gemini JSON: {e}")
-                parsed_result = {}
-
-            if isinstance(parsed_result, dict):
-                parsed_result.setdefault("domain", domain)
-                parsed_result.setdefault("timestamp", datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"))
-                parsed_result.setdefault("summary", "No summary available.")
-                parsed_result.setdefault("requirements", ["No requirements specified."])
-                parsed_result.setdefault("recommendations", [])
-                parsed_result.setdefault("methodology", [])
-                parsed_result.setdefault("service_enumeration", [])
-                parsed_result.setdefault("penetration", [])
-                parsed_result.setdefault("vulnerabilities", [])
-
-                # Convertir requirements a lista si es string
-                if isinstance(parsed_result.get("requirements"), str):
-                    parsed_result["requirements"] = [parsed_result["requirements"]]
-
-                # Si no hay penetración pero hay vulnerabilidades, crear penetración
-                if not parsed_result["penetration"] and parsed_result["vulnerabilities"]:
-                    parsed_result["penetration"] = [
-                        {
-                            "vulnerability_exploited": vuln.get("cve_id", "Unknown CVE"),
-                            "system_vulnerable": domain,
-                            "description": "No detailed exploitation provided.",
-                            "severity": vuln.get("severity", "Unknown"),
-                            "proof_of_concept": "No PoC provided."
-                        }
-                        for vuln in parsed_result["vulnerabilities"]
-                    ]
-
-                return parsed_result
-            else:
-                raise ValueError("Gemini's response is not a valid JSON dictionary.")
-        except Exception as e:
-            self.logger.error(f"❌ Error processing Gemini response: {e}")
-            return {
-                "summary": f"Error: {e}",
-                "objective": "",
-                "requirements": ["No requirements specified."],
-                "high_level_summary": "",
-                "recommendations": [],
-                "methodology": [],
-                "information_gathering": "",
-                "service_enumeration": [],
-                "penetration": [],
-                "maintaining_access": "",
-                "house_cleaning": "",
-                "additional_notes": "",
-                "vulnerabilities": []
-            }
+            ahora = time.monotonic()
+            for nombre in set(en_vuelo.values()):
+                if intentos[nombre] < GEMINI_MAX_ATTEMPTS and ahora - ultimo[nombre] >= GEMINI_HEDGE_SECONDS:
+                    self.logger.info(
+                        f"Sección {nombre} sin respuesta tras {ahora - ultimo[nombre]:.1f}s, "
+                        f"intento duplicado"
+                    )
+                    lanzar(nombre)
+
+        for futuro in en_vuelo:
+            abortar(futuro)
+        for nombre in tareas:
+            resultados.setdefault(
+                nombre, AnalysisError(f"Sección {nombre} sin respuesta en {GEMINI_CALL_DEADLINE_SECONDS:.0f}s")
+            )
+        return resultados
@@ -0,0 +1,214 @@
+# app/services/job_service.py
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
+from app.models.scan_job import ScanJob
+from app.models.scan_profile import DEFAULT_PROFILE
+from app.services.scan_service import run_scan_pipeline, run_batch_pipeline
+from app.services.exceptions import OverloadedError
+from app.services.admission import check_capacity, estimate_retry_after
+from app.factories.logger_factory import LoggerFactory, log_context
+
+logger = LoggerFactory.create_logger("job_service")
+
+# Configuración del pool de trabajos
+SCAN_WORKERS       = int(os.getenv("SCAN_WORKERS", 4))
+SCAN_MAX_PENDING   = int(os.getenv("SCAN_MAX_PENDING_JOBS", 500))
+SCAN_JOB_TTL_HORAS = int(os.getenv("SCAN_JOB_TTL_HORAS", 24))
+# Máximo de eventos de puertos que se guardan por trabajo
+SCAN_MAX_EVENTS    = int(os.getenv("SCAN_MAX_EVENTS_PER_JOB", 5000))
+
+_executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="scan-worker")
+_jobs: dict[str, ScanJob] = {}
+_eventos: dict[str, list[dict]] = {}
+_lock = threading.Lock()
+
+
+def _actualizar(job_id: str, **campos):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        for campo, valor in campos.items():
+            setattr(job, campo, valor)
+        job.updated_at = datetime.utcnow()
+
+
+def _publicar(job_id: str, event: str, data: dict):
+    with _lock:
+        eventos = _eventos.get(job_id)
+        if eventos is None or (event == "port" and len(eventos) >= SCAN_MAX_EVENTS):
+            return
+        eventos.append({"id": len(eventos), "event": event, "data": data})
+
+
+class _Progreso:
+    """
+    Traduce los callbacks del pipeline a estado del trabajo y eventos de
+    progreso, midiendo cuánto dura cada etapa.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.inicio = time.monotonic()
+        self.etapa: str | None = None
+        self.inicio_etapa = self.inicio
+        self.timings: dict[str, float] = {}
+
+    def _cerrar_etapa(self) -> float | None:
+        if self.etapa is None:
+            return None
+        ms = round((time.monotonic() - self.inicio_etapa) * 1000, 1)
+        self.timings[self.etapa] = self.timings.get(self.etapa, 0) + ms
+        return ms
+
+    def on_stage(self, stage: str):
+        previa, ms = self.etapa, self._cerrar_etapa()
+        self.etapa, self.inicio_etapa = stage, time.monotonic()
+        _actualizar(self.job_id, stage=stage, timings=dict(self.timings))
+        _publicar(self.job_id, "stage", {
+            "stage": stage,
+            "previous_stage": previa,
+            "previous_stage_ms": ms,
+            "elapsed_ms": round((time.monotonic() - self.inicio) * 1000, 1),
+        })
+
+    def on_port(self, host: str, port: dict):
+        _publicar(self.job_id, "port", {"host": host, **port})
+
+    def terminar(self):
+        self._cerrar_etapa()
+        self.etapa = None
+        return dict(self.timings)
+
+
+def _purgar_terminados():
+    """
+    Elimina de memoria los trabajos terminados hace más de SCAN_JOB_TTL_HORAS.
+    Debe llamarse con _lock adquirido.
+    """
+    limite = datetime.utcnow() - timedelta(hours=SCAN_JOB_TTL_HORAS)
+    for job_id in [j.job_id for j in _jobs.values()
+                   if j.status in ("completed", "failed") and j.updated_at < limite]:
+        del _jobs[job_id]
+        _eventos.pop(job_id, None)
+
+
+def _pendientes() -> int:
+    return sum(1 for j in _jobs.values() if j.status in ("queued", "running"))
+
+
+def _en_cola() -> int:
+    return sum(1 for j in _jobs.values() if j.status == "queued")
+
+
+def _ejecutar(job_id: str, trabajo: Callable[["_Progreso"], dict]):
+    with log_context(job_id=job_id):
+        _ejecutar_trabajo(job_id, trabajo)
+
+
+def _ejecutar_trabajo(job_id: str, trabajo: Callable[["_Progreso"], dict]):
+    _actualizar(job_id, status="running")
+    logger.info(f"Job {job_id} iniciado")
+    progreso = _Progreso(job_id)
+    try:
+        result = trabajo(progreso)
+        timings = progreso.terminar()
+        # El evento final se publica antes de marcar el trabajo como terminado
+        # para que el stream SSE no se cierre sin enviarlo
+        _publicar(job_id, "result", {"result": result, "timings": timings})
+        _actualizar(job_id, status="completed", stage="done", result=result, timings=timings)
+        logger.info(f"Job {job_id} completado")
+    except Exception as e:
+        logger.error(f"Job {job_id} falló: {e}")
+        timings = progreso.terminar()
+        _publicar(job_id, "error", {"error": str(e), "timings": timings})
+        _actualizar(job_id, status="failed", error=str(e), timings=timings)
+
+
+def _encolar(trabajo: Callable[[_Progreso], dict], **campos) -> ScanJob:
+    """
+    Registra un trabajo y lo envía al pool de workers.
+    Lanza OverloadedError si ya hay SCAN_MAX_PENDING trabajos sin terminar
+    o si las colas de espera de nmap o Gemini están llenas (los trabajos
+    que esperan en el pool cuentan como en espera de turno).
+    """
+    now = datetime.utcnow()
+    job = ScanJob(job_id=uuid.uuid4().hex, created_at=now, updated_at=now, **campos)
+    with _lock:
+        _purgar_terminados()
+        en_cola = _en_cola()
+        check_capacity(en_cola)
+        if _pendientes() >= SCAN_MAX_PENDING:
+            raise OverloadedError(
+                "Demasiados escaneos en cola, inténtalo más tarde",
+                retry_after=estimate_retry_after(en_cola),
+            )
+        _jobs[job.job_id] = job
+        _eventos[job.job_id] = []
+
+    # El trabajo hereda el contexto de la petición (request_id en los logs)
+    _executor.submit(contextvars.copy_context().run, _ejecutar, job.job_id, trabajo)
+    return job
+
+
+def submit_scan_job(domain: str, email: str, profile: str = DEFAULT_PROFILE) -> ScanJob:
+    """
+    Encola un escaneo en el pool de workers y devuelve el trabajo creado.
+    """
+    job = _encolar(
+        lambda progreso: run_scan_pipeline(
+            domain,
+            email,
+            on_stage=progreso.on_stage,
+            on_port=progreso.on_port,
+            profile=profile,
+        ),
+        domain=domain,
+        email=email,
+        profile=profile,
+    )
+    logger.info(f"Job {job.job_id} encolado para {domain}")
+    return job
+
+
+def submit_batch_job(items: list[tuple[str, str]], profile: str = DEFAULT_PROFILE) -> ScanJob:
+    """
+    Encola un lote de pares (dominio, email) como un único trabajo cuyo
+    resultado contiene el estado de cada elemento.
+    """
+    job = _encolar(
+        lambda progreso: run_batch_pipeline(items, on_stage=progreso.on_stage, profile=profile),
+        kind="batch",
+        profile=profile,
+    )
+    logger.info(f"Job {job.job_id} encolado con un lote de {len(items)} elementos")
+    return job
+
+
+def get_job(job_id: str) -> ScanJob | None:
+    """
+    Devuelve una copia del estado actual del trabajo, o None si no existe.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        return job.model_copy(deep=True) if job else None
+
+
+def get_job_events(job_id: str, desde: int = 0) -> tuple[list[dict], bool] | None:
+    """
+    Devuelve (eventos con id >= desde, terminado) o None si el trabajo no
+    existe. terminado indica que no se publicarán más eventos.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        eventos = list(_eventos.get(job_id, [])[desde:])
+        return eventos, job.status in ("completed", "failed")
@@ -0,0 +1,95 @@
+# app/services/local_reports.py
+
+import json
+import os
+import threading
+from datetime import datetime
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("local_reports")
+
+# Reportes conservados por dominio; los más antiguos se borran al guardar
+LOCAL_REPORTS_PER_DOMAIN = int(os.getenv("LOCAL_REPORTS_PER_DOMAIN", 5))
+
+# Prefijo de las keys de reportes locales, para distinguirlas de las de S3
+LOCAL_KEY_PREFIX = "local/"
+
+
+def es_local(key: str) -> bool:
+    return key.startswith(LOCAL_KEY_PREFIX)
+
+
+class LocalReportRepository:
+    """
+    Repositorio de PDFs en disco para el modo local: <raíz>/<dominio>/ con
+    los PDFs y un latest.json con la misma entrada que el índice de S3
+    ({key, timestamp, size, profile}).
+    """
+
+    def __init__(self, raiz: str, por_dominio: int = LOCAL_REPORTS_PER_DOMAIN):
+        self.raiz = raiz
+        self.por_dominio = max(1, por_dominio)
+        self._lock = threading.Lock()
+
+    def _ruta(self, key: str) -> str:
+        relativa = os.path.normpath(key[len(LOCAL_KEY_PREFIX):])
+        if relativa.startswith("..") or os.path.isabs(relativa):
+            raise ValueError(f"Key de reporte local inválida: {key}")
+        return os.path.join(self.raiz, relativa)
+
+    def _directorio(self, domain: str) -> str:
+        if not domain or domain in (".", "..") or "/" in domain or os.sep in domain:
+            raise ValueError(f"Dominio inválido para el repositorio local: {domain}")
+        return os.path.join(self.raiz, domain)
+
+    def _indice(self, domain: str) -> str:
+        return os.path.join(self._directorio(domain), "latest.json")
+
+    @staticmethod
+    def _escribir_atomico(path: str, datos: bytes):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(datos)
+        os.replace(tmp, path)
+
+    def save(self, domain: str, pdf_bytes: bytes, ts: datetime, profile: str) -> str:
+        """
+        Guarda el PDF, actualiza el índice del dominio y devuelve su key.
+        """
+        nombre = f"OSCP_{domain}_{ts.strftime('%Y%m%d%H%M%S')}.pdf"
+        key = f"{LOCAL_KEY_PREFIX}{domain}/{nombre}"
+        entrada = {"key": key, "timestamp": ts.isoformat(), "size": len(pdf_bytes), "profile": profile}
+        with self._lock:
+            os.makedirs(self._directorio(domain), exist_ok=True)
+            self._escribir_atomico(self._ruta(key), pdf_bytes)
+            self._escribir_atomico(self._indice(domain), json.dumps(entrada).encode())
+            self._purgar(domain)
+        logger.info(f"PDF guardado en el repositorio local: {key}")
+        return key
+
+    def _purgar(self, domain: str):
+        directorio = self._directorio(domain)
+        # El timestamp del nombre ordena los PDFs cronológicamente
+        pdfs = sorted(f for f in os.listdir(directorio) if f.endswith(".pdf"))
+        for viejo in pdfs[:-self.por_dominio]:
+            try:
+                os.remove(os.path.join(directorio, viejo))
+            except OSError as e:
+                logger.warning(f"No se pudo borrar el reporte local {viejo}: {e}")
+
+    def latest(self, domain: str) -> dict:
+        """
+        Entrada del último reporte del dominio, o {} si no hay ninguno.
+        """
+        try:
+            with open(self._indice(domain)) as fh:
+                entrada = json.load(fh)
+        except FileNotFoundError:
+            return {}
+        if not os.path.exists(self._ruta(entrada["key"])):
+            return {}
+        return entrada
+
+    def read(self, key: str) -> bytes:
+        with open(self._ruta(key), "rb") as fh:
+            return fh.read()
@@ -0,0 +1,326 @@
+# app/services/mailer.py
+
+import heapq
+import itertools
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from app.services.exceptions import EmailError
+from app.services.metrics import medir
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("mailer")
+
+MAIL_POOL_SIZE       = int(os.getenv("MAIL_POOL_SIZE", 2))
+MAIL_WORKERS         = int(os.getenv("MAIL_WORKERS", 2))
+MAIL_OUTBOX_SIZE     = int(os.getenv("MAIL_OUTBOX_SIZE", 1000))
+MAIL_MAX_RETRIES     = int(os.getenv("MAIL_MAX_RETRIES", 5))
+MAIL_BACKOFF_SECONDS = float(os.getenv("MAIL_BACKOFF_SECONDS", 2))
+# Una conexión inactiva más de este tiempo se comprueba con NOOP antes de usarla
+MAIL_IDLE_CHECK_SECONDS = float(os.getenv("MAIL_IDLE_CHECK_SECONDS", 30))
+SMTP_TIMEOUT         = float(os.getenv("SMTP_TIMEOUT", 30))
+# Espera máxima de deliver() (cubre los reintentos con backoff por defecto)
+MAIL_DELIVERY_TIMEOUT_SECONDS = float(os.getenv("MAIL_DELIVERY_TIMEOUT_SECONDS", 300))
+
+
+class SMTPConnectionPool:
+    """
+    Pool de conexiones SMTP persistentes: el handshake (EHLO, STARTTLS,
+    login) se paga una vez por conexión y no una vez por mensaje.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str | None = None,
+        password: str | None = None,
+        size: int = MAIL_POOL_SIZE
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self._libres: queue.LifoQueue = queue.LifoQueue()
+        self._huecos = threading.BoundedSemaphore(size)
+
+    def _conectar(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        if self.user and self.password:
+            server.starttls()
+            server.login(self.user, self.password)
+        logger.info(f"Conexión SMTP abierta con {self.host}:{self.port}")
+        return server
+
+    @staticmethod
+    def _cerrar(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión viva. Si el bloque lanza una excepción SMTP o de
+        red, la conexión se descarta en lugar de devolverse al pool.
+        """
+        self._huecos.acquire()
+        server = None
+        try:
+            try:
+                server, ultimo_uso = self._libres.get_nowait()
+                if time.monotonic() - ultimo_uso > MAIL_IDLE_CHECK_SECONDS and server.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP fallido")
+            except queue.Empty:
+                server = self._conectar()
+            except (smtplib.SMTPException, OSError):
+                self._cerrar(server)
+                server = self._conectar()
+
+            yield server
+            self._libres.put((server, time.monotonic()))
+        except BaseException:
+            if server is not None:
+                self._cerrar(server)
+            raise
+        finally:
+            self._huecos.release()
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._libres.get_nowait()
+            except queue.Empty:
+                return
+            self._cerrar(server)
+
+
+class Outbox:
+    """
+    Cola de salida de emails vaciada por workers en segundo plano, con
+    reintentos y backoff exponencial. Los reintentos esperan en un heap
+    hasta su hora y vuelven a la cola, así que un mensaje que falla no
+    ocupa a un worker durante el backoff.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        workers: int = MAIL_WORKERS,
+        max_size: int = MAIL_OUTBOX_SIZE,
+        max_retries: int = MAIL_MAX_RETRIES,
+        backoff_seconds: float = MAIL_BACKOFF_SECONDS
+    ):
+        self.pool = pool
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._cola: queue.Queue = queue.Queue(maxsize=max_size)
+        self._hilos: list[threading.Thread] = []
+        self._programador: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Reintentos programados: (vence, secuencia, item)
+        self._reintentos: list[tuple] = []
+        self._secuencia = itertools.count()
+        self._reintentos_cond = threading.Condition()
+        self._parar_reintentos = False
+        # Aparte de _lock: stop() lo retiene mientras encola los marcadores
+        self._contadores_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        with self._lock:
+            if self._hilos:
+                return
+            self._parar_reintentos = False
+            for i in range(self.workers):
+                hilo = threading.Thread(target=self._worker, name=f"mail-worker-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+            self._programador = threading.Thread(target=self._bucle_reintentos, name="mail-retry", daemon=True)
+            self._programador.start()
+
+    def enqueue(self, remitente: str, destinatario: str, mensaje: str) -> str:
+        """
+        Añade un mensaje ya serializado a la cola y devuelve su id.
+        Lanza EmailError si la cola está llena.
+        """
+        return self._encolar(remitente, destinatario, mensaje, None)
+
+    def deliver(
+        self,
+        remitente: str,
+        destinatario: str,
+        mensaje: str,
+        timeout: float = MAIL_DELIVERY_TIMEOUT_SECONDS
+    ) -> str:
+        """
+        Como enqueue, pero espera a que los workers envíen el mensaje (con
+        sus reintentos). Lanza EmailError si el envío falla o no termina en
+        `timeout`; en ese caso el mensaje puede llegar a enviarse más tarde.
+        """
+        entrega: Future = Future()
+        message_id = self._encolar(remitente, destinatario, mensaje, entrega)
+        try:
+            enviado = entrega.result(timeout)
+        except FutureTimeout:
+            raise EmailError(f"Email {message_id} sin enviar tras {timeout:.0f}s")
+        if not enviado:
+            raise EmailError(f"No se pudo enviar el email {message_id} a {destinatario}")
+        return message_id
+
+    def _encolar(self, remitente: str, destinatario: str, mensaje: str, entrega: Future | None) -> str:
+        self.start()
+        message_id = uuid.uuid4().hex
+        try:
+            self._cola.put_nowait((message_id, remitente, destinatario, mensaje, entrega, 0))
+        except queue.Full:
+            raise EmailError("La cola de emails está llena")
+        logger.info(f"Email {message_id} para {destinatario} encolado")
+        return message_id
+
+    def send_now(self, remitente: str, destinatario: str, mensaje: str):
+        with medir("smtp"), self.pool.connection() as server:
+            server.sendmail(remitente, destinatario, mensaje)
+
+    def _worker(self):
+        while True:
+            item = self._cola.get()
+            if item is None:
+                self._cola.task_done()
+                return
+            try:
+                self._entregar(item)
+            finally:
+                self._cola.task_done()
+
+    def _entregar(self, item: tuple):
+        """
+        Un intento de envío. Si falla por un error transitorio el mensaje
+        se programa para más tarde; el resultado de `deliver()` se resuelve
+        al enviarlo o al darlo por fallido.
+        """
+        message_id, remitente, destinatario, mensaje, entrega, intento = item
+        try:
+            self.send_now(remitente, destinatario, mensaje)
+            self._contar("sent")
+            logger.info(f"Email {message_id} enviado a {destinatario}")
+            self._resolver(entrega, True)
+            return
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+            # Rechazos permanentes: reintentar no sirve
+            logger.error(f"Email {message_id} rechazado: {e}")
+        except Exception as e:
+            if intento < self.max_retries:
+                espera = self.backoff_seconds * (2 ** intento)
+                self._contar("retried")
+                logger.warning(f"Error enviando email {message_id} ({e}); reintento en {espera:.1f}s")
+                self._programar((message_id, remitente, destinatario, mensaje, entrega, intento + 1), espera)
+                return
+            logger.error(f"Email {message_id} a {destinatario} falló tras {intento + 1} intentos: {e}")
+        self._contar("failed")
+        self._resolver(entrega, False)
+
+    @staticmethod
+    def _resolver(entrega: Future | None, enviado: bool):
+        if entrega is not None and not entrega.done():
+            entrega.set_result(enviado)
+
+    def _programar(self, item: tuple, espera: float):
+        with self._reintentos_cond:
+            heapq.heappush(self._reintentos, (time.monotonic() + espera, next(self._secuencia), item))
+            self._reintentos_cond.notify()
+
+    def _bucle_reintentos(self):
+        """
+        Devuelve a la cola los reintentos cuya hora ha llegado.
+        """
+        while True:
+            with self._reintentos_cond:
+                while not self._parar_reintentos:
+                    ahora = time.monotonic()
+                    if self._reintentos and self._reintentos[0][0] <= ahora:
+                        break
+                    espera = self._reintentos[0][0] - ahora if self._reintentos else None
+                    self._reintentos_cond.wait(espera)
+                if self._parar_reintentos:
+                    return
+                _, _, item = heapq.heappop(self._reintentos)
+            # Fuera del lock: con la cola llena espera a que haya hueco
+            self._cola.put(item)
+
+    def _contar(self, campo: str):
+        # Varios workers actualizan los contadores a la vez
+        with self._contadores_lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def pending(self) -> int:
+        with self._reintentos_cond:
+            return self._cola.qsize() + len(self._reintentos)
+
+    def stop(self, timeout: float = 30):
+        """
+        Espera a que se vacíen la cola y los reintentos programados (como
+        mucho `timeout`) y detiene los workers y las conexiones. Los
+        reintentos que quedan se dan por fallidos.
+        """
+        limite = time.monotonic() + timeout
+        while (self._cola.unfinished_tasks or self._reintentos) and time.monotonic() < limite:
+            time.sleep(0.1)
+        with self._reintentos_cond:
+            self._parar_reintentos = True
+            abandonados, self._reintentos = self._reintentos, []
+            self._reintentos_cond.notify_all()
+        # Un reintento que el programador ya sacó entra en la cola antes
+        # que los marcadores de parada
+        if self._programador is not None:
+            self._programador.join(timeout)
+        for _, _, item in abandonados:
+            logger.error(f"Email {item[0]} a {item[2]} sin enviar al detener el outbox")
+            self._contar("failed")
+            self._resolver(item[4], False)
+        with self._lock:
+            for _ in self._hilos:
+                self._cola.put(None)
+            self._hilos = []
+            self._programador = None
+        self.pool.close()
+
+
+_outbox: Outbox | None = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """
+    Outbox compartido configurado con SMTP_HOST/SMTP_PORT/SMTP_USER/SMTP_PASS.
+    La configuración se lee en el primer uso para poder apuntarla a un
+    servidor SMTP local en pruebas.
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            pool = SMTPConnectionPool(
+                host=os.getenv("SMTP_HOST", "localhost"),
+                port=int(os.getenv("SMTP_PORT", 25)),
+                user=os.getenv("SMTP_USER"),
+                password=os.getenv("SMTP_PASS"),
+            )
+            _outbox = Outbox(pool)
+        return _outbox
+
+
+def shutdown(timeout: float = 30):
+    global _outbox
+    with _outbox_lock:
+        outbox, _outbox = _outbox, None
+    if outbox is not None:
+        outbox.stop(timeout)
@@ -0,0 +1,227 @@
+# app/services/metadata_store.py
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from app.services.aws_clients import get_dynamodb, aws_disponible, TABLE_NAME
+from app.services.metrics import medir
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("metadata_store")
+
+BASE_DIR         = os.path.abspath(os.getenv("PROJECT_ROOT", "."))
+METADATA_DB_PATH = os.getenv("METADATA_DB_PATH", os.path.join(BASE_DIR, "reports", "metadata.sqlite"))
+# Se escribe al juntar METADATA_BATCH_SIZE registros o cada METADATA_FLUSH_SECONDS
+# (25 es el máximo de BatchWriteItem)
+METADATA_BATCH_SIZE    = int(os.getenv("METADATA_BATCH_SIZE", 25))
+METADATA_FLUSH_SECONDS = float(os.getenv("METADATA_FLUSH_SECONDS", 2))
+METADATA_QUEUE_SIZE    = int(os.getenv("METADATA_QUEUE_SIZE", 10000))
+
+
+class MetadataStore:
+    """
+    Registro local de escaneos (SQLite, sólo inserciones) con índices por
+    dominio y por email. Sustituye a los JSON sueltos por petición.
+    """
+
+    def __init__(self, path: str = METADATA_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " domain TEXT NOT NULL,"
+            " email TEXT NOT NULL,"
+            " timestamp TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS scans_domain ON scans (domain, timestamp)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS scans_email ON scans (email, timestamp)"
+        )
+
+    def append_many(self, items: list[dict]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO scans (domain, email, timestamp) VALUES (?, ?, ?)",
+                    [(i["domain"], i["email"], i["timestamp"]) for i in items]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _consultar(self, sql: str, params: tuple) -> list[dict]:
+        with self._lock:
+            filas = self._conn.execute(sql, params).fetchall()
+        return [{"domain": d, "email": e, "timestamp": ts} for d, e, ts in filas]
+
+    def latest_for_domain(self, domain: str) -> dict | None:
+        filas = self._consultar(
+            "SELECT domain, email, timestamp FROM scans WHERE domain = ?"
+            " ORDER BY timestamp DESC LIMIT 1",
+            (domain,)
+        )
+        return filas[0] if filas else None
+
+    def by_email(self, email: str, limit: int = 100) -> list[dict]:
+        return self._consultar(
+            "SELECT domain, email, timestamp FROM scans WHERE email = ?"
+            " ORDER BY timestamp DESC LIMIT ?",
+            (email, limit)
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scans").fetchone()[0]
+
+
+class MetadataWriter:
+    """
+    Buffer de metadatos vaciado por un hilo en segundo plano: agrupa los
+    registros y los escribe con el batch writer de DynamoDB o, en modo
+    local o si DynamoDB falla, en el MetadataStore.
+    """
+
+    def __init__(
+        self,
+        store: MetadataStore,
+        batch_size: int = METADATA_BATCH_SIZE,
+        flush_seconds: float = METADATA_FLUSH_SECONDS,
+        max_size: int = METADATA_QUEUE_SIZE
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._cola: queue.Queue = queue.Queue(maxsize=max_size)
+        self._hilo: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # add() también guarda en local cuando el buffer está lleno
+        self._contadores_lock = threading.Lock()
+        self.written = 0
+        self.fallback = 0
+        self.failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._worker, name="metadata-writer", daemon=True)
+                self._hilo.start()
+
+    def add(self, item: dict):
+        """
+        Encola un registro sin esperar a la escritura. Si el buffer está
+        lleno (DynamoDB no da abasto) el registro va directo al
+        MetadataStore: una inserción local no bloquea a quien lo añade.
+        """
+        self.start()
+        try:
+            self._cola.put_nowait(item)
+        except queue.Full:
+            logger.warning("Buffer de metadatos lleno, registro guardado sólo en local")
+            self._guardar_local([item])
+
+    def _worker(self):
+        while True:
+            # El primer registro abre la ventana de agrupación
+            primero = self._cola.get()
+            lote = [] if primero is None else [primero]
+            parar = primero is None
+            limite = time.monotonic() + self.flush_seconds
+            while not parar and len(lote) < self.batch_size:
+                try:
+                    item = self._cola.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    parar = True
+                    break
+                lote.append(item)
+            if lote:
+                self._escribir(lote)
+            for _ in range(len(lote) + parar):
+                self._cola.task_done()
+            if parar:
+                return
+
+    def _escribir(self, lote: list[dict]):
+        if aws_disponible():
+            try:
+                with medir("dynamodb"):
+                    # overwrite_by_pkeys: un mismo (domain, email) repetido
+                    # en el lote haría fallar BatchWriteItem
+                    with get_dynamodb().Table(TABLE_NAME).batch_writer(
+                        overwrite_by_pkeys=["domain", "email"]
+                    ) as batch:
+                        for item in lote:
+                            batch.put_item(Item=item)
+                self.written += len(lote)
+                logger.info(f"{len(lote)} registros guardados en DynamoDB")
+                return
+            except Exception as e:
+                logger.error(f"DynamoDB falla, fallback local: {e}")
+        self._guardar_local(lote)
+
+    def _guardar_local(self, lote: list[dict]):
+        try:
+            self.store.append_many(lote)
+            with self._contadores_lock:
+                self.fallback += len(lote)
+            logger.info(f"{len(lote)} registros guardados en {self.store.path}")
+        except Exception as e:
+            with self._contadores_lock:
+                self.failed += len(lote)
+            logger.error(f"No se pudieron guardar {len(lote)} registros de metadatos: {e}")
+
+    def pending(self) -> int:
+        return self._cola.qsize()
+
+    def stop(self, timeout: float = 30):
+        """
+        Escribe lo encolado (el marcador de parada cierra la ventana del
+        último lote) y detiene el hilo.
+        """
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        if hilo is not None:
+            self._cola.put(None)
+            hilo.join(timeout)
+
+
+_writer: MetadataWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> MetadataWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MetadataWriter(MetadataStore())
+        return _writer
+
+
+def current_writer() -> MetadataWriter | None:
+    """
+    Writer ya creado, o None si aún no se ha registrado ningún escaneo.
+    No crea el registro local (útil para leer métricas).
+    """
+    return _writer
+
+
+def shutdown(timeout: float = 30):
+    """
+    Escribe los registros pendientes y detiene el hilo de escritura.
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop(timeout)
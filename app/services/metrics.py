@@ -0,0 +1,197 @@
+# app/services/metrics.py
+
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Los escaneos tardan de segundos a minutos; las lecturas de caché, milisegundos
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+STAGE_SECONDS = Histogram(
+    "hack4me_stage_duration_seconds",
+    "Duración de cada etapa del pipeline de escaneo",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+STAGE_IN_FLIGHT = Gauge(
+    "hack4me_stage_in_flight",
+    "Ejecuciones en curso de cada etapa",
+    ["stage"],
+)
+ERRORS = Counter(
+    "hack4me_errors_total",
+    "Excepciones por etapa y tipo (ScanError, AnalysisError, ...)",
+    ["stage", "type"],
+)
+REPORT_LOOKUPS = Counter(
+    "hack4me_report_lookups_total",
+    "Búsquedas de un reporte reciente: reused (se reenvía) o miss (pipeline completo)",
+    ["result"],
+)
+
+
+@contextmanager
+def medir(stage: str):
+    """
+    Mide la duración de una etapa, la cuenta como en curso mientras dura
+    y registra el tipo de la excepción si falla.
+    """
+    en_curso = STAGE_IN_FLIGHT.labels(stage)
+    en_curso.inc()
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.labels(stage, type(e).__name__).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - inicio)
+        en_curso.dec()
+
+
+class _ColectorEstado:
+    """
+    Lee en cada scrape los contadores que ya llevan las cachés, el control
+    de admisión, la deduplicación y la cola de emails, en lugar de
+    duplicarlos. Los módulos se importan aquí para evitar ciclos.
+    """
+
+    def describe(self):
+        # Nombres fijos: el registro no necesita llamar a collect() al
+        # registrarse, cuando los módulos observados aún no existen
+        yield CounterMetricFamily("hack4me_cache_requests", "", labels=["cache", "result"])
+        yield CounterMetricFamily("hack4me_scans_coalesced", "")
+        yield GaugeMetricFamily("hack4me_admission_slots", "", labels=["resource", "state"])
+        yield CounterMetricFamily("hack4me_admission_rejected", "", labels=["resource"])
+        yield GaugeMetricFamily("hack4me_email_outbox_pending", "")
+        yield CounterMetricFamily("hack4me_emails", "", labels=["result"])
+        yield CounterMetricFamily("hack4me_log_records_dropped", "")
+        yield GaugeMetricFamily("hack4me_metadata_pending", "")
+        yield CounterMetricFamily("hack4me_metadata_records", "", labels=["result"])
+        yield GaugeMetricFamily("hack4me_circuit_state", "", labels=["name", "state"])
+        yield CounterMetricFamily("hack4me_circuit_rejected", "", labels=["name"])
+
+    def collect(self):
+        from app.services.scan_cache import scan_cache
+        from app.services.analysis_cache import analysis_cache
+        from app.services.pdf_cache import pdf_cache
+        from app.services.report_service import _indice_cache
+        from app.services.scan_service import scans_coalescidos
+        from app.services.admission import nmap_admission, gemini_admission
+        from app.services import mailer, metadata_store
+        from app.factories.logger_factory import dropped_records
+        from app.services.gemini_analyzer import gemini_breaker
+        from app.services.circuit_breaker import CLOSED, OPEN, HALF_OPEN
+
+        cache = CounterMetricFamily(
+            "hack4me_cache_requests",
+            "Consultas a las cachés por resultado",
+            labels=["cache", "result"],
+        )
+        for nombre, c in (
+            ("nmap", scan_cache),
+            ("analysis", analysis_cache),
+            ("pdf", pdf_cache),
+            ("report_index", _indice_cache),
+        ):
+            cache.add_metric([nombre, "hit"], c.hits)
+            cache.add_metric([nombre, "miss"], c.misses)
+        yield cache
+
+        yield CounterMetricFamily(
+            "hack4me_scans_coalesced",
+            "Ejecuciones del pipeline ahorradas al unirse a una en curso",
+            value=scans_coalescidos(),
+        )
+
+        admision = GaugeMetricFamily(
+            "hack4me_admission_slots",
+            "Turnos ocupados y en espera del control de admisión",
+            labels=["resource", "state"],
+        )
+        rechazos = CounterMetricFamily(
+            "hack4me_admission_rejected",
+            "Peticiones rechazadas por sobrecarga",
+            labels=["resource"],
+        )
+        for controlador in (nmap_admission, gemini_admission):
+            stats = controlador.stats()
+            admision.add_metric([controlador.name, "running"], stats["running"])
+            admision.add_metric([controlador.name, "waiting"], stats["waiting"])
+            rechazos.add_metric([controlador.name], stats["rejected"])
+        yield admision
+        yield rechazos
+
+        outbox = mailer.get_outbox()
+        yield GaugeMetricFamily(
+            "hack4me_email_outbox_pending",
+            "Emails en cola pendientes de enviar",
+            value=outbox.pending(),
+        )
+        emails = CounterMetricFamily(
+            "hack4me_emails",
+            "Emails procesados por el outbox",
+            labels=["result"],
+        )
+        emails.add_metric(["sent"], outbox.sent)
+        emails.add_metric(["failed"], outbox.failed)
+        emails.add_metric(["retried"], outbox.retried)
+        yield emails
+
+        yield CounterMetricFamily(
+            "hack4me_log_records_dropped",
+            "Registros de log descartados por tener la cola llena",
+            value=dropped_records(),
+        )
+
+        # Sin escaneos todavía no hay writer; no se crea sólo para leerlo
+        writer = metadata_store.current_writer()
+        yield GaugeMetricFamily(
+            "hack4me_metadata_pending",
+            "Registros de metadatos en el buffer pendientes de escribir",
+            value=writer.pending() if writer else 0,
+        )
+        registros = CounterMetricFamily(
+            "hack4me_metadata_records",
+            "Registros de metadatos escritos en DynamoDB, en el registro local o perdidos",
+            labels=["result"],
+        )
+        registros.add_metric(["dynamodb"], writer.written if writer else 0)
+        registros.add_metric(["local"], writer.fallback if writer else 0)
+        registros.add_metric(["failed"], writer.failed if writer else 0)
+        yield registros
+
+        circuito = GaugeMetricFamily(
+            "hack4me_circuit_state",
+            "Estado del circuit breaker (1 en el estado actual)",
+            labels=["name", "state"],
+        )
+        estado = gemini_breaker.state
+        for posible in (CLOSED, OPEN, HALF_OPEN):
+            circuito.add_metric([gemini_breaker.name, posible], 1 if estado == posible else 0)
+        yield circuito
+        rechazos_circuito = CounterMetricFamily(
+            "hack4me_circuit_rejected",
+            "Llamadas no realizadas por tener el circuito abierto",
+            labels=["name"],
+        )
+        rechazos_circuito.add_metric([gemini_breaker.name], gemini_breaker.rejected)
+        yield rechazos_circuito
+
+
+REGISTRY.register(_ColectorEstado())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Devuelve (cuerpo, content-type) en formato de exposición de Prometheus.
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,22 +1,284 @@
 # app/services/nmap_scanner.py
+import copy
+import os
+import shlex
 import nmap
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from app.factories.logger_factory import LoggerFactory
-from app.services import Scanner
+from app.services import Scanner, PortCallback
+from app.services.exceptions import ScanError
+from app.services.port_history import calcular_cambios, solo_hosts
+
+# Escaneo por fragmentos: número de fragmentos del rango de puertos y cuántos
+# procesos nmap pueden correr a la vez. NMAP_SHARDS=1 desactiva el modo.
+NMAP_SHARDS      = int(os.getenv("NMAP_SHARDS", 1))
+NMAP_PARALLELISM = int(os.getenv("NMAP_PARALLELISM", os.cpu_count() or 1))
+# Argumentos extra del barrido rápido (sin -sV) de los reescaneos incrementales
+NMAP_SWEEP_ARGUMENTS = os.getenv("NMAP_SWEEP_ARGUMENTS", "--open")
+
+
+# Un elemento <host> del XML de nmap: (dirección, hostnames "user", puertos).
+# Varios dominios pueden resolver a la misma dirección (hosting compartido,
+# CDN): cada uno llega en su propio <host> y no deben mezclarse.
+HostEntry = tuple[str, list[str], list]
+
+
+def puerto_desde_elemento(elem: ET.Element) -> dict:
+    state_el = elem.find("state")
+    service_el = elem.find("service")
+    service = service_el.attrib if service_el is not None else {}
+    return {
+        'port': int(elem.get("portid")),
+        'state': state_el.get("state", "") if state_el is not None else "",
+        'service': service.get("name", ""),
+        'product': service.get("product", ""),
+        'version': service.get("version", ""),
+    }
+
+
+def hosts_desde_xml(xml: str | bytes) -> list[HostEntry]:
+    """
+    Una entrada por <host> del XML de nmap, con los puertos ordenados.
+    """
+    entradas = []
+    for host in ET.fromstring(xml).iter("host"):
+        addr = next(
+            (a.get("addr") for a in host.findall("address") if a.get("addrtype") in ("ipv4", "ipv6")),
+            None
+        )
+        if not addr:
+            continue
+        nombres = [h.get("name") for h in host.iter("hostname") if h.get("type") == "user"]
+        puertos = sorted((puerto_desde_elemento(p) for p in host.iter("port")), key=lambda p: p['port'])
+        entradas.append((addr, nombres, puertos))
+    return entradas
+
+
+def _expandir_puertos(ports: str) -> list[int] | None:
+    """
+    Convierte una especificación "22,80,100-200" en la lista de puertos.
+    Devuelve None si la especificación no es de ese tipo (p. ej. "T:80").
+    """
+    puertos: set[int] = set()
+    try:
+        for parte in ports.split(","):
+            parte = parte.strip()
+            if "-" in parte:
+                inicio, fin = parte.split("-", 1)
+                puertos.update(range(int(inicio), int(fin) + 1))
+            elif parte:
+                puertos.add(int(parte))
+    except ValueError:
+        return None
+    return sorted(puertos)
+
+
+def _compactar_puertos(puertos: list[int]) -> str:
+    """
+    Inversa de _expandir_puertos: [1, 2, 3, 80] -> "1-3,80".
+    """
+    rangos = []
+    inicio = previo = puertos[0]
+    for p in puertos[1:]:
+        if p != previo + 1:
+            rangos.append(f"{inicio}-{previo}" if inicio != previo else str(inicio))
+            inicio = p
+        previo = p
+    rangos.append(f"{inicio}-{previo}" if inicio != previo else str(inicio))
+    return ",".join(rangos)
+
+
+def dividir_puertos(ports: str | None, shards: int) -> list[str | None]:
+    """
+    Divide una especificación de puertos en hasta `shards` fragmentos
+    contiguos de tamaño similar. Si no se puede dividir, devuelve [ports].
+    """
+    if not ports or shards <= 1:
+        return [ports]
+    puertos = _expandir_puertos(ports)
+    if not puertos or len(puertos) < 2:
+        return [ports]
+
+    shards = min(shards, len(puertos))
+    tam, resto = divmod(len(puertos), shards)
+    fragmentos, inicio = [], 0
+    for i in range(shards):
+        fin = inicio + tam + (1 if i < resto else 0)
+        fragmentos.append(_compactar_puertos(puertos[inicio:fin]))
+        inicio = fin
+    return fragmentos
+
 
 class NmapScanner(Scanner):
-    def __init__(self):
-        self.scanner = nmap.PortScanner()
+    def __init__(
+        self,
+        ports: str | None = "1-1024",
+        arguments: str = "-sV",
+        shards: int = NMAP_SHARDS,
+        parallelism: int = NMAP_PARALLELISM,
+        timeout: int = 0
+    ):
+        self.ports = ports
+        self.arguments = arguments
+        self.shards = shards
+        self.parallelism = max(1, parallelism)
+        # Límite de reloj por objetivo de cada proceso nmap (0 = sin límite)
+        self.timeout = timeout
         self.logger = LoggerFactory.create_logger("nmap_scanner")
 
-    def scan_domain(self, domain: str):
+    def _timeout_para(self, targets: list[str]) -> int:
+        # Cota superior: los objetivos de una invocación compartida podrían
+        # escanearse uno detrás de otro
+        return self.timeout * len(targets)
+
+    def scan_domain(self, domain: str, on_port: PortCallback | None = None):
         """
-        Realiza un escaneo básico de puertos (1-1024) a un dominio.
+        Realiza un escaneo de puertos (por defecto 1-1024 con -sV) a un dominio.
+        En modo fragmentado lanza un nmap por fragmento del rango en paralelo
+        y combina los resultados en la misma estructura {host: [puertos]}.
         """
-        result = {}
+        return self.scan_domains([domain], on_port)[domain]
+
+    def scan_domains(
+        self,
+        domains: list[str],
+        on_port: PortCallback | None = None
+    ) -> dict[str, dict]:
+        """
+        Escanea varios dominios en una sola invocación de nmap (por fragmento)
+        y devuelve {dominio: {host: [puertos]}}.
+        """
+        fragmentos = dividir_puertos(self.ports, self.shards)
+        if len(fragmentos) == 1:
+            return self._scan_targets(domains, self.ports, on_port)
+
+        self.logger.info(
+            f"Escaneo fragmentado de {', '.join(domains)}: {len(fragmentos)} fragmentos, "
+            f"paralelismo {self.parallelism}"
+        )
+        # Basta con hilos porque el trabajo real lo hace el proceso nmap.
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            parciales = list(pool.map(
+                lambda ports: self._scan_targets(domains, ports, on_port),
+                fragmentos
+            ))
+        return {d: self._combinar([p[d] for p in parciales]) for d in domains}
+
+    def _variante(self, ports: str | None, arguments: str | None = None) -> "NmapScanner":
+        """
+        Copia del scanner con otro rango de puertos y/o argumentos.
+        """
+        variante = copy.copy(self)
+        variante.ports = ports
+        if arguments is not None:
+            variante.arguments = arguments
+        return variante
+
+    def _argumentos_barrido(self) -> str:
+        """
+        Argumentos actuales sin detección de versiones, más NMAP_SWEEP_ARGUMENTS.
+        """
+        args = [a for a in shlex.split(self.arguments)
+                if a not in ("-sV", "-A") and not a.startswith("--version")]
+        return " ".join(args + shlex.split(NMAP_SWEEP_ARGUMENTS))
+
+    def rescan_domain(
+        self,
+        domain: str,
+        anterior: dict,
+        on_port: PortCallback | None = None
+    ) -> dict:
+        """
+        Reescaneo incremental a partir del último mapa de puertos conocido:
+          1. -sV sólo sobre los puertos que estaban abiertos,
+          2. barrido rápido sin -sV del resto del rango,
+          3. -sV sólo sobre los puertos que aparecen abiertos por primera vez.
+        El resultado tiene la forma de scan_domain más la clave "changes"
+        con lo abierto, cerrado o cambiado de versión. Si algo falla se
+        recurre a un escaneo completo.
+        """
+        rango = _expandir_puertos(self.ports) if self.ports else None
+        if not rango:
+            return self.scan_domain(domain, on_port)
+
+        en_rango = set(rango)
+        conocidos = sorted({
+            p["port"] for puertos in solo_hosts(anterior).values()
+            for p in puertos if p.get("state") == "open" and p["port"] in en_rango
+        })
+        resto = sorted(en_rango - set(conocidos))
+
+        parciales = []
+        if conocidos:
+            parciales.append(self._variante(_compactar_puertos(conocidos)).scan_domain(domain, on_port))
+        nuevos: set[int] = set()
+        if resto:
+            barrido = self._variante(_compactar_puertos(resto), self._argumentos_barrido()).scan_domain(domain)
+            if "error" in barrido:
+                parciales.append(barrido)
+            nuevos = {
+                p["port"] for puertos in solo_hosts(barrido).values()
+                for p in puertos if p.get("state") == "open"
+            }
+        if nuevos:
+            parciales.append(self._variante(_compactar_puertos(sorted(nuevos))).scan_domain(domain, on_port))
+
+        result = self._combinar(parciales)
+        if "error" in result:
+            self.logger.warning(f"Reescaneo incremental de {domain} fallido ({result['error']}); escaneo completo")
+            return self.scan_domain(domain, on_port)
+
+        # Los puertos conocidos que ya no están abiertos sólo cuentan para el diff
+        for host in list(result):
+            result[host] = [p for p in result[host] if p.get("state") != "closed"]
+        result["changes"] = calcular_cambios(anterior, result)
+        self.logger.info(
+            f"Reescaneo incremental de {domain}: {len(conocidos)} puertos conocidos, "
+            f"{len(resto)} barridos, {len(nuevos)} nuevos; "
+            f"{len(result['changes']['opened'])} abiertos, {len(result['changes']['closed'])} cerrados, "
+            f"{len(result['changes']['changed'])} con cambios"
+        )
+        return result
+
+    @staticmethod
+    def _asignar_hosts(targets: list[str], entradas: list[HostEntry]) -> dict[str, dict]:
+        """
+        Reparte los hosts escaneados entre los objetivos pedidos usando el
+        hostname de tipo "user" de cada entrada, de modo que dos dominios
+        con la misma IP reciben cada uno sus puertos. Con un único objetivo
+        todos los hosts le pertenecen (p. ej. rangos CIDR).
+        """
+        if len(targets) == 1:
+            return {targets[0]: {addr: list(puertos) for addr, _, puertos in entradas}}
+        por_target: dict[str, dict] = {t: {} for t in targets}
+        for addr, nombres, puertos in entradas:
+            for nombre in nombres or [addr]:
+                if nombre in por_target:
+                    por_target[nombre][addr] = list(puertos)
+        return por_target
+
+    def _scan_targets(
+        self,
+        targets: list[str],
+        ports: str | None,
+        on_port: PortCallback | None = None
+    ) -> dict[str, dict]:
+        """
+        Escanea un rango con python-nmap. Cada llamada usa su propio
+        PortScanner (no es seguro entre hilos); se crea aquí y no en
+        __init__ porque al instanciarse ejecuta `nmap -V`, lo que se
+        evita por completo cuando el resultado está en caché.
+        """
+        objetivo = " ".join(targets)
 
         try:
-            self.logger.info(f"Iniciando escaneo para el dominio: {domain}")
-            self.scanner.scan(domain, '1-1024', arguments='-sV')
+            self.logger.info(f"Iniciando escaneo para el dominio: {objetivo} (puertos {ports})")
+            scanner = nmap.PortScanner()
+            scanner.scan(objetivo, ports, arguments=self.arguments, timeout=self._timeout_para(targets))
+        except nmap.PortScannerTimeout as e:
+            self.logger.error(f"nmap superó el presupuesto de tiempo para {objetivo}")
+            raise ScanError(f"nmap superó el presupuesto de {self._timeout_para(targets)}s") from e
         except nmap.PortScannerError as e:
             self.logger.exception("Error invocando nmap")
             raise ScanError(f"Error al lanzar nmap: {e}") from e
@@ -25,28 +287,33 @@ class NmapScanner(Scanner):
             raise ScanError("Error inesperado en el escaneo") from e
 
         try:
-            for host in self.scanner.all_hosts():
-                self.logger.debug(f"Procesando host: {host}")
-                result[host] = []
-                for proto in self.scanner[host].all_protocols():
-                    ports = self.scanner[host][proto].keys()
-                    for port in sorted(ports):
-                        port_data = self.scanner[host][proto][port]
-                        state = port_data['state']
-                        service = port_data.get('name', '')
-                        product = port_data.get('product', '')
-                        version = port_data.get('version', '')
-                        result[host].append({
-                            'port': port,
-                            'state': state,
-                            'service': service,
-                            'product': product,
-                            'version': version
-                        })
-                        self.logger.debug(f"Puerto {port} encontrado en estado: {state}")
-            self.logger.info(f"Escaneo completado para: {domain}")
+            # Se parsea el XML y no scanner[host]: python-nmap indexa por IP y
+            # se queda sólo con el último <host> de cada dirección
+            entradas = hosts_desde_xml(scanner.get_nmap_last_output())
+            for addr, _, puertos in entradas:
+                self.logger.debug(f"Procesando host: {addr}")
+                for puerto in puertos:
+                    self.logger.debug(f"Puerto {puerto['port']} encontrado en estado: {puerto['state']}")
+                    if on_port:
+                        on_port(addr, puerto)
+            self.logger.info(f"Escaneo completado para: {objetivo}")
         except Exception as e:
-            self.logger.error(f"Error durante el escaneo de {domain}: {str(e)}")
-            result['error'] = str(e)
+            self.logger.error(f"Error durante el escaneo de {objetivo}: {str(e)}")
+            return {t: {'error': str(e)} for t in targets}
+        return self._asignar_hosts(targets, entradas)
+
+    @staticmethod
+    def _combinar(parciales: list[dict]) -> dict:
+        result: dict = {}
+        errores = []
+        for parcial in parciales:
+            for host, puertos in parcial.items():
+                if host == 'error':
+                    errores.append(puertos)
+                    continue
+                result.setdefault(host, []).extend(puertos)
+        for puertos in result.values():
+            puertos.sort(key=lambda p: p['port'])
+        if errores:
+            result['error'] = "; ".join(errores)
         return result
-        
\ No newline at end of file
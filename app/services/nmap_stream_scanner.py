@@ -0,0 +1,171 @@
+# app/services/nmap_stream_scanner.py
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from app.services import PortCallback
+from app.services.nmap_scanner import NmapScanner, puerto_desde_elemento
+from app.services.exceptions import ScanError
+
+NMAP_BIN = os.getenv("NMAP_BIN", "nmap")
+
+
+class PortResult:
+    """
+    Registro compacto de un puerto. Usa __slots__ para no crear un dict
+    por puerto mientras se acumulan los resultados de escaneos grandes.
+    """
+    __slots__ = ("port", "state", "service", "product", "version")
+
+    def __init__(self, port: int, state: str, service: str = "", product: str = "", version: str = ""):
+        self.port = port
+        self.state = state
+        self.service = service
+        self.product = product
+        self.version = version
+
+    def to_dict(self) -> dict:
+        return {
+            'port': self.port,
+            'state': self.state,
+            'service': self.service,
+            'product': self.product,
+            'version': self.version
+        }
+
+    @classmethod
+    def from_element(cls, elem: ET.Element) -> "PortResult":
+        return cls(**puerto_desde_elemento(elem))
+
+
+class NmapStreamScanner(NmapScanner):
+    """
+    Variante de NmapScanner que lanza nmap con salida XML por stdout y la
+    parsea de forma incremental con iterparse, liberando cada <host> en
+    cuanto se procesa. Los puertos se guardan como PortResult hasta el
+    final y se convierten a dicts host a host. El resultado tiene la misma
+    forma {host: [puertos]}.
+    """
+
+    def _comando(self, targets: list[str], ports: str | None) -> list[str]:
+        cmd = [NMAP_BIN, "-oX", "-", *shlex.split(self.arguments)]
+        if ports:
+            cmd += ["-p", ports]
+        return cmd + targets
+
+    def _stream(
+        self,
+        targets: list[str],
+        ports: str | None,
+        on_port: PortCallback | None = None
+    ) -> list[tuple[str, list[str], list[PortResult]]]:
+        """
+        Ejecuta nmap y devuelve una entrada (host, [hostnames], [PortResult])
+        por cada <host> según llega el XML. nmap vuelca cada host al terminarlo, así que
+        on_port recibe los puertos host a host (o fragmento a fragmento) y
+        no al final.
+        """
+        cmd = self._comando(targets, ports)
+        self.logger.info(f"Iniciando escaneo en streaming: {' '.join(cmd)}")
+        entradas: list[tuple[str, list[str], list[PortResult]]] = []
+
+        # stderr a fichero temporal para que no se llene la tubería mientras
+        # se consume stdout
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+            except OSError as e:
+                self.logger.exception("Error invocando nmap")
+                raise ScanError(f"Error al lanzar nmap: {e}") from e
+
+            # Presupuesto de reloj: pasado el límite se mata el proceso
+            limite = self._timeout_para(targets)
+            expirado = threading.Event()
+
+            def matar():
+                expirado.set()
+                proc.kill()
+
+            vigilante = threading.Timer(limite, matar) if limite else None
+            if vigilante:
+                vigilante.daemon = True
+                vigilante.start()
+
+            try:
+                raiz = None
+                host_addr, host_ports, host_nombres = None, [], []
+                for event, elem in ET.iterparse(proc.stdout, events=("start", "end")):
+                    if event == "start":
+                        if raiz is None:
+                            raiz = elem
+                        elif elem.tag == "host":
+                            host_addr, host_ports, host_nombres = None, [], []
+                        continue
+
+                    if elem.tag == "address" and elem.get("addrtype") in ("ipv4", "ipv6"):
+                        host_addr = host_addr or elem.get("addr")
+                    elif elem.tag == "hostname" and elem.get("type") == "user":
+                        host_nombres.append(elem.get("name"))
+                    elif elem.tag == "port":
+                        port = PortResult.from_element(elem)
+                        host_ports.append(port)
+                        self.logger.debug(f"Puerto {port.port} encontrado en estado: {port.state}")
+                        if on_port and host_addr:
+                            on_port(host_addr, port.to_dict())
+                        elem.clear()
+                    elif elem.tag == "host":
+                        if host_addr:
+                            entradas.append((host_addr, host_nombres, host_ports))
+                        # Limpiar el <host> no basta: la raíz <nmaprun> lo
+                        # sigue referenciando hasta el final del documento
+                        raiz.clear()
+            except ET.ParseError as e:
+                # Al matar el proceso el XML queda cortado
+                if expirado.is_set():
+                    raise ScanError(f"nmap superó el presupuesto de {limite}s") from e
+                raise
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+                if vigilante:
+                    vigilante.cancel()
+
+            if expirado.is_set():
+                raise ScanError(f"nmap superó el presupuesto de {limite}s")
+            if returncode != 0:
+                stderr.seek(0)
+                detalle = stderr.read().decode(errors="replace").strip()
+                raise ScanError(f"nmap terminó con código {returncode}: {detalle}")
+
+        return entradas
+
+    def _scan_targets(
+        self,
+        targets: list[str],
+        ports: str | None,
+        on_port: PortCallback | None = None
+    ) -> dict[str, dict]:
+        objetivo = " ".join(targets)
+        try:
+            entradas = self._stream(targets, ports, on_port)
+        except ScanError:
+            raise
+        except ET.ParseError as e:
+            self.logger.error(f"XML de nmap inválido para {objetivo}: {e}")
+            return {t: {'error': str(e)} for t in targets}
+        except Exception as e:
+            self.logger.exception("Error inesperado durante el escaneo")
+            raise ScanError("Error inesperado en el escaneo") from e
+
+        self.logger.info(f"Escaneo completado para: {objetivo}")
+        resultado = self._asignar_hosts(targets, entradas)
+        del entradas
+        # Conversión a dicts host a host: cada lista de PortResult se libera
+        # en cuanto se sustituye, sin tener ambas copias completas a la vez
+        for hosts in resultado.values():
+            for addr, puertos in hosts.items():
+                puertos.sort(key=lambda p: p.port)
+                hosts[addr] = [p.to_dict() for p in puertos]
+        return resultado
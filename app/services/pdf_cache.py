@@ -0,0 +1,163 @@
+# app/services/pdf_cache.py
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from app.services.cache import CACHE_DIR, TTLCache
+from app.services.aws_clients import get_s3, BUCKET_NAME
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("pdf_cache")
+
+PDF_CACHE_DIR       = os.path.join(CACHE_DIR, "pdf")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Tras validar un PDF con S3 no se vuelve a validar durante este tiempo
+PDF_CACHE_REVALIDATE_SECONDS = int(os.getenv("PDF_CACHE_REVALIDATE_SECONDS", 300))
+
+
+class PdfDiskCache:
+    """
+    Caché LRU en disco de PDFs de S3, acotada en bytes. Cada entrada es un
+    fichero <sha256(key)>.pdf con su ETag en <sha256(key)>.json; el orden
+    LRU se lleva con la fecha de modificación del PDF.
+    """
+
+    def __init__(self, directorio: str, max_bytes: int):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._validados = TTLCache(ttl_seconds=PDF_CACHE_REVALIDATE_SECONDS, max_entries=10000)
+        os.makedirs(directorio, exist_ok=True)
+        # nombre -> (tamaño, último uso), reconstruido desde disco al arrancar
+        self._entradas: dict[str, tuple[int, float]] = {}
+        for fichero in os.listdir(directorio):
+            if fichero.endswith(".pdf"):
+                st = os.stat(os.path.join(directorio, fichero))
+                self._entradas[fichero[:-4]] = (st.st_size, st.st_mtime)
+
+    def _rutas(self, key: str) -> tuple[str, str, str]:
+        nombre = hashlib.sha256(key.encode()).hexdigest()
+        base = os.path.join(self.directorio, nombre)
+        return nombre, base + ".pdf", base + ".json"
+
+    def _leer(self, pdf_path: str) -> bytes:
+        with open(pdf_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return bytes(m)
+
+    def _etag_local(self, key: str) -> str | None:
+        nombre, pdf_path, meta_path = self._rutas(key)
+        with self._lock:
+            if nombre not in self._entradas:
+                return None
+        try:
+            with open(meta_path) as fh:
+                return json.load(fh).get("etag")
+        except (OSError, ValueError):
+            return None
+
+    def _escribir_atomico(self, path: str, datos: bytes):
+        # Temporal propio de cada escritor: dos escrituras de la misma key
+        # no se pisan y un lector nunca ve un fichero a medias
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(datos)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def put(self, key: str, pdf_bytes: bytes, etag: str | None):
+        nombre, pdf_path, meta_path = self._rutas(key)
+        # Primero el PDF y después su ETag: un lector puede ver el ETag
+        # antiguo con el PDF nuevo (sólo cuesta una descarga de más), nunca
+        # el ETag nuevo con el PDF antiguo
+        self._escribir_atomico(pdf_path, pdf_bytes)
+        self._escribir_atomico(meta_path, json.dumps({"key": key, "etag": etag}).encode())
+        with self._lock:
+            self._entradas[nombre] = (len(pdf_bytes), time.time())
+            self._desalojar()
+        self._validados.set(key, True)
+
+    def _desalojar(self):
+        total = sum(size for size, _ in self._entradas.values())
+        for nombre, (size, _) in sorted(self._entradas.items(), key=lambda x: x[1][1]):
+            if total <= self.max_bytes:
+                break
+            base = os.path.join(self.directorio, nombre)
+            for ruta in (base + ".pdf", base + ".json"):
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+            del self._entradas[nombre]
+            total -= size
+
+    def _tocar(self, nombre: str, pdf_path: str):
+        """
+        Marca la entrada como recién usada y cuenta el acierto.
+        """
+        now = time.time()
+        os.utime(pdf_path, (now, now))
+        with self._lock:
+            size, _ = self._entradas[nombre]
+            self._entradas[nombre] = (size, now)
+            self.hits += 1
+
+    def get(self, key: str) -> bytes:
+        """
+        Devuelve el PDF de `key`. Si hay copia local se valida con un GET
+        condicional (If-None-Match); un 304 sirve la copia local sin
+        descargar el cuerpo.
+        """
+        from botocore.exceptions import ClientError
+
+        nombre, pdf_path, _ = self._rutas(key)
+        etag = self._etag_local(key)
+
+        if etag is not None and key in self._validados:
+            try:
+                data = self._leer(pdf_path)
+                self._tocar(nombre, pdf_path)
+                return data
+            except (OSError, ValueError, KeyError):
+                pass
+
+        params = {"Bucket": BUCKET_NAME, "Key": key}
+        if etag:
+            params["IfNoneMatch"] = etag
+        try:
+            obj = get_s3().get_object(**params)
+        except ClientError as e:
+            codigo = e.response.get("Error", {}).get("Code")
+            if not (etag and codigo in ("304", "NotModified")):
+                raise
+            try:
+                data = self._leer(pdf_path)
+                self._tocar(nombre, pdf_path)
+                self._validados.set(key, True)
+                return data
+            except (OSError, ValueError, KeyError):
+                # La copia local se desalojó entre la validación y la lectura
+                obj = get_s3().get_object(Bucket=BUCKET_NAME, Key=key)
+
+        data = obj["Body"].read()
+        with self._lock:
+            self.misses += 1
+        try:
+            self.put(key, data, obj.get("ETag"))
+        except OSError as e:
+            logger.warning(f"No se pudo guardar {key} en la caché local: {e}")
+        return data
+
+
+pdf_cache = PdfDiskCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES)
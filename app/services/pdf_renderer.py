@@ -0,0 +1,81 @@
+# app/services/pdf_renderer.py
+
+import os
+import threading
+import pdfkit
+from concurrent.futures import Future, ThreadPoolExecutor
+from jinja2 import Environment, FileSystemLoader, Template
+from app.factories.logger_factory import LoggerFactory
+
+logger = LoggerFactory.create_logger("pdf_renderer")
+
+BASE_DIR     = os.path.abspath(os.getenv("PROJECT_ROOT", "."))
+TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
+
+# Renders simultáneos de wkhtmltopdf y renders que pueden esperar en cola
+PDF_WORKERS   = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PDF_MAX_QUEUE = int(os.getenv("PDF_MAX_QUEUE", 100))
+PDF_OPTIONS   = {"quiet": "", "encoding": "UTF-8"}
+
+# Un único Environment: Jinja guarda las plantillas compiladas en su caché
+_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), auto_reload=False)
+
+_executor    = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf-worker")
+_huecos      = threading.BoundedSemaphore(PDF_WORKERS + PDF_MAX_QUEUE)
+_config      = None
+_config_lock = threading.Lock()
+
+
+def get_template(name: str) -> Template:
+    return _env.get_template(name)
+
+
+def _configuracion():
+    """
+    Resuelve la ruta de wkhtmltopdf una sola vez. Sin configuración
+    explícita pdfkit lanza `which wkhtmltopdf` en cada conversión.
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = pdfkit.configuration(wkhtmltopdf=os.getenv("WKHTMLTOPDF_BIN", ""))
+            logger.info(f"wkhtmltopdf: {_config.wkhtmltopdf}")
+        return _config
+
+
+def _convertir(html: str) -> bytes:
+    try:
+        return pdfkit.from_string(html, False, options=PDF_OPTIONS, configuration=_configuracion())
+    finally:
+        _huecos.release()
+
+
+def submit_render(html: str) -> Future:
+    """
+    Encola la conversión HTML -> PDF en el pool de workers. Si ya hay
+    PDF_WORKERS + PDF_MAX_QUEUE renders pendientes, bloquea hasta que haya
+    hueco (contrapresión hacia el pipeline).
+    """
+    _huecos.acquire()
+    try:
+        return _executor.submit(_convertir, html)
+    except Exception:
+        _huecos.release()
+        raise
+
+
+def render_pdf(html: str) -> bytes:
+    """
+    Convierte HTML a PDF en el pool y espera al resultado.
+    """
+    return submit_render(html).result()
+
+
+def warm_up():
+    """
+    Precompila las plantillas y resuelve wkhtmltopdf al arrancar para que
+    la primera petición no pague ese coste.
+    """
+    for name in ("oscp_report_template.html",):
+        get_template(name)
+    _configuracion()
@@ -0,0 +1,61 @@
+# app/services/port_history.py
+
+import hashlib
+import os
+from app.services.cache import DiskCache, CACHE_DIR
+
+# Último mapa de puertos conocido por dominio, base de los reescaneos
+# incrementales. Vive mucho más que la caché de resultados de nmap.
+NMAP_HISTORY_TTL         = int(os.getenv("NMAP_HISTORY_TTL_SECONDS", 30 * 24 * 3600))
+NMAP_HISTORY_MAX_ENTRIES = int(os.getenv("NMAP_HISTORY_MAX_ENTRIES", 10000))
+
+port_history = DiskCache(
+    os.path.join(CACHE_DIR, "port_history.sqlite"),
+    ttl_seconds=NMAP_HISTORY_TTL,
+    max_entries=NMAP_HISTORY_MAX_ENTRIES,
+)
+
+
+def port_history_key(target: str, ports: str | None) -> str:
+    """
+    Clave del historial: objetivo normalizado + rango de puertos. No
+    depende de los argumentos de nmap, que cambian entre fases.
+    """
+    raw = "|".join([target.strip().lower().rstrip("."), ports or ""])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def solo_hosts(scan_result: dict) -> dict:
+    """
+    Copia del resultado con sólo las entradas {host: [puertos]}.
+    """
+    return {h: p for h, p in scan_result.items() if isinstance(p, list)}
+
+
+def _abiertos(scan_result: dict) -> dict[str, dict[int, dict]]:
+    return {
+        host: {p["port"]: p for p in puertos if p.get("state") == "open"}
+        for host, puertos in solo_hosts(scan_result).items()
+    }
+
+
+def calcular_cambios(anterior: dict, actual: dict) -> dict:
+    """
+    Diferencias de exposición por host entre dos escaneos: puertos abiertos
+    nuevos, puertos que dejaron de estar abiertos y puertos cuyo servicio,
+    producto o versión cambió.
+    """
+    antes, ahora = _abiertos(anterior), _abiertos(actual)
+    cambios: dict[str, list] = {"opened": [], "closed": [], "changed": []}
+    for host in sorted(set(antes) | set(ahora)):
+        previos, nuevos = antes.get(host, {}), ahora.get(host, {})
+        for port in sorted(set(nuevos) - set(previos)):
+            cambios["opened"].append({"host": host, **nuevos[port]})
+        for port in sorted(set(previos) - set(nuevos)):
+            cambios["closed"].append({"host": host, **previos[port]})
+        for port in sorted(set(previos) & set(nuevos)):
+            before = {k: previos[port].get(k, "") for k in ("service", "product", "version")}
+            after = {k: nuevos[port].get(k, "") for k in ("service", "product", "version")}
+            if before != after:
+                cambios["changed"].append({"host": host, "port": port, "before": before, "after": after})
+    return cambios
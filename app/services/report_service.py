@@ -2,96 +2,153 @@
 
 import os
 import json
-import io
-import pdfkit
-import boto3
 from datetime import datetime, timedelta
-from jinja2 import Environment, FileSystemLoader
 from app.factories.logger_factory import LoggerFactory
+from app.services.pdf_renderer import get_template, render_pdf
+from app.services.cache import TTLCache
+from app.services.pdf_cache import pdf_cache
+from app.services.metadata_store import get_writer
+from app.services.local_reports import LocalReportRepository, es_local
+from app.models.scan_profile import PROFILE_DEPTH, DEFAULT_PROFILE
+from app.services.aws_clients import (
+    get_s3,
+    aws_disponible,
+    BUCKET_NAME,
+)
 
 logger = LoggerFactory.create_logger("report_service")
 
 # Paths base
 BASE_DIR     = os.path.abspath(os.getenv("PROJECT_ROOT", "."))
-TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
 REPORTS_DIR  = os.path.join(BASE_DIR, "reports")
 PDF_FALLBACK = os.path.join(REPORTS_DIR, "pdf")
 os.makedirs(PDF_FALLBACK, exist_ok=True)
 
-# AWS config
-AWS_REGION  = os.getenv("AWS_REGION", os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-TABLE_NAME  = os.getenv("DYNAMODB_TABLE_NAME", "companies")
-BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "hacker4me")
-
-# Inicializa sesión AWS
-_session    = boto3.session.Session()
-dynamodb    = _session.resource("dynamodb", region_name=AWS_REGION)
-s3          = _session.client("s3", region_name=AWS_REGION)
-try:
-    dynamodb.Table(TABLE_NAME).load()
-    s3.head_bucket(Bucket=BUCKET_NAME)
-    aws_disponible = True
-    logger.info("AWS OK: DynamoDB y S3 disponibles")
-except Exception:
-    aws_disponible = False
-    logger.warning("Modo local: AWS no disponible")
-
-def buscar_reporte_s3(domain: str, max_age_horas: int = 24) -> str | None:
-    """
-    Busca en S3 un objeto OSCP_<domain>_<timestamp>.pdf dentro de reports/<domain>/,
-    y devuelve la key del más reciente si fue generado hace ≤ max_age_horas.
-    """
-    if not aws_disponible:
+# Reportes generados sin AWS, con el mismo índice de último reporte que S3
+_reportes_locales = LocalReportRepository(PDF_FALLBACK)
+
+# Caché en memoria del índice domain -> último reporte
+REPORT_INDEX_TTL = int(os.getenv("REPORT_INDEX_TTL_SECONDS", 300))
+_indice_cache    = TTLCache(ttl_seconds=REPORT_INDEX_TTL, max_entries=10000)
+
+def _indice_key(domain: str) -> str:
+    return f"reports/{domain}/latest.json"
+
+
+def _timestamp_de_key(key: str) -> datetime | None:
+    # extrae el timestamp final: OSCP_domain_YYYYMMDDHHMMSS.pdf
+    ts_str = key.rsplit("_", 1)[-1].removesuffix(".pdf")
+    try:
+        return datetime.strptime(ts_str, "%Y%m%d%H%M%S")
+    except ValueError:
         return None
 
+
+def _escribir_indice(domain: str, key: str, ts: datetime, size: int, profile: str = DEFAULT_PROFILE):
+    entrada = {"key": key, "timestamp": ts.isoformat(), "size": size, "profile": profile}
+    get_s3().put_object(
+        Bucket=BUCKET_NAME,
+        Key=_indice_key(domain),
+        Body=json.dumps(entrada).encode(),
+        ContentType="application/json"
+    )
+    _indice_cache.set(domain, entrada)
+
+
+def _reconstruir_indice(domain: str) -> dict:
+    """
+    Recorre (paginando) los PDFs históricos del dominio para crear el índice
+    cuando todavía no existe. Sólo ocurre una vez por dominio.
+    """
     prefix = f"reports/{domain}/OSCP_{domain}_"
+    mejor: tuple[datetime, str, int] | None = None
+    paginator = get_s3().get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        for o in page.get("Contents", []):
+            ts = _timestamp_de_key(o["Key"])
+            if ts and (mejor is None or ts > mejor[0]):
+                mejor = (ts, o["Key"], o.get("Size", 0))
+
+    if mejor is None:
+        return {}
+    logger.info(f"Reconstruyendo índice de reportes para {domain}")
+    _escribir_indice(domain, mejor[1], mejor[0], mejor[2])
+    return _indice_cache.get(domain, {})
+
+
+def obtener_ultimo_reporte(domain: str) -> dict:
+    """
+    Devuelve la entrada del índice {key, timestamp, size} del último PDF
+    del dominio, o {} si no hay ninguno. Pasa por la caché TTL en memoria.
+    """
+    entrada = _indice_cache.get(domain)
+    if entrada is not None:
+        return entrada
+
+    from botocore.exceptions import ClientError
+
     try:
-        resp = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix)
-        items = resp.get("Contents", [])
-        candidatos: list[tuple[datetime, str]] = []
-        for o in items:
-            key = o["Key"]
-            # extrae el timestamp final: OSCP_domain_YYYYMMDDHHMMSS.pdf
-            ts_str = key.rsplit("_", 1)[-1].removesuffix(".pdf")
-            try:
-                ts = datetime.strptime(ts_str, "%Y%m%d%H%M%S")
-            except Exception:
-                continue
-            candidatos.append((ts, key))
-
-        if not candidatos:
+        obj = get_s3().get_object(Bucket=BUCKET_NAME, Key=_indice_key(domain))
+        entrada = json.loads(obj["Body"].read())
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            raise
+        entrada = _reconstruir_indice(domain)
+
+    _indice_cache.set(domain, entrada)
+    return entrada
+
+
+def buscar_reporte_s3(
+    domain: str,
+    max_age_horas: int = 24,
+    profile: str = DEFAULT_PROFILE
+) -> str | None:
+    """
+    Consulta el índice de último reporte del dominio (en S3 o, sin AWS, en
+    el repositorio local) y devuelve su key si fue generado hace
+    ≤ max_age_horas con un perfil al menos tan profundo como el pedido
+    (las entradas sin perfil son "standard").
+    """
+    try:
+        if aws_disponible():
+            entrada = obtener_ultimo_reporte(domain)
+        else:
+            entrada = _reportes_locales.latest(domain)
+        if not entrada:
             return None
 
-        # elegir el más reciente
-        ts_max, key_max = max(candidatos, key=lambda x: x[0])
-        if datetime.utcnow() - ts_max <= timedelta(hours=max_age_horas):
-            return key_max
+        if PROFILE_DEPTH[entrada.get("profile", DEFAULT_PROFILE)] < PROFILE_DEPTH[profile]:
+            return None
+
+        ts = datetime.fromisoformat(entrada["timestamp"])
+        if datetime.utcnow() - ts <= timedelta(hours=max_age_horas):
+            return entrada["key"]
 
     except Exception as e:
-        logger.error(f"Error buscando reporte en S3: {e}")
+        logger.error(f"Error buscando reporte reciente: {e}")
 
     return None
 
+
+def leer_pdf(key: str) -> bytes:
+    """
+    Lee un PDF por su key: del repositorio local o de S3 a través de la
+    caché local de PDFs (sólo se descarga si cambió el ETag).
+    """
+    if es_local(key):
+        return _reportes_locales.read(key)
+    return pdf_cache.get(key)
+
 def guardar_en_dynamodb(domain: str, email: str):
+    """
+    Encola los metadatos del escaneo. Los escribe en segundo plano, por
+    lotes, el MetadataWriter (DynamoDB o el registro SQLite local).
+    """
     ts   = datetime.utcnow().isoformat()
     item = {"domain": domain, "email": email, "timestamp": ts}
-    logger.info("Guardando metadatos en DynamoDB o fallback local")
-
-    if aws_disponible:
-        try:
-            dynamodb.Table(TABLE_NAME).put_item(Item=item)
-            logger.info(f"Guardado en DynamoDB: {domain}/{email}")
-            return
-        except Exception as e:
-            logger.error(f"DynamoDB falla, fallback local: {e}")
-
-    # Fallback JSON local
-    dir_ = os.path.join(REPORTS_DIR, domain)
-    os.makedirs(dir_, exist_ok=True)
-    path = os.path.join(dir_, f"{domain}_{email}_{ts}.json")
-    with open(path, "w") as f:
-        json.dump(item, f, indent=2)
-    logger.info(f"Guardado JSON local: {path}")
+    logger.info(f"Metadatos de {domain}/{email} encolados")
+    get_writer().add(item)
 
 
 def generar_pdf_en_memoria(domain: str, scan_result: dict, report_data: dict) -> bytes:
@@ -101,8 +158,7 @@ def generar_pdf_en_memoria(domain: str, scan_result: dict, report_data: dict) ->
     ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
     logger.info(f"Generando PDF en memoria para {domain} @ {ts}")
     try:
-        env      = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-        template = env.get_template("oscp_report_template.html")
+        template = get_template("oscp_report_template.html")
         logger.info("Renderizando plantilla HTML para PDF")
 
         html = template.render(
@@ -114,7 +170,7 @@ def generar_pdf_en_memoria(domain: str, scan_result: dict, report_data: dict) ->
         )
 
         logger.info("Convirtiendo HTML a PDF")
-        pdf_bytes = pdfkit.from_string(html, False)
+        pdf_bytes = render_pdf(html)
         logger.info("PDF generado en memoria")
         return pdf_bytes
 
@@ -123,22 +179,32 @@ def generar_pdf_en_memoria(domain: str, scan_result: dict, report_data: dict) ->
         return b""
 
 
-def subir_pdf_memoria_a_s3(domain: str, pdf_bytes: bytes) -> str:
+def subir_pdf_memoria_a_s3(domain: str, pdf_bytes: bytes, profile: str = DEFAULT_PROFILE) -> str:
     """
-    Sube un PDF en memoria a S3 en reports/<domain>/ y retorna la URL firmada.
+    Sube un PDF en memoria a S3 en reports/<domain>/, actualiza el índice
+    de último reporte (con el perfil de escaneo) y retorna la key. Sin AWS
+    lo guarda en el repositorio local para poder reutilizarlo igualmente.
     """
-    key = f"reports/{domain}/OSCP_{domain}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.pdf"
+    ts  = datetime.utcnow().replace(microsecond=0)
+    key = f"reports/{domain}/OSCP_{domain}_{ts.strftime('%Y%m%d%H%M%S')}.pdf"
+    if not aws_disponible():
+        logger.warning("AWS no disponible, PDF guardado en el repositorio local")
+        try:
+            return _reportes_locales.save(domain, pdf_bytes, ts, profile)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error guardando PDF en el repositorio local: {e}")
+            return ""
+
     logger.info(f"Subiendo PDF a S3 con key: {key}")
-    if not aws_disponible:
-        logger.warning("AWS no disponible, no se sube a S3")
-        return ""
 
     try:
-        s3.upload_fileobj(
-            io.BytesIO(pdf_bytes),
-            BUCKET_NAME,
-            key,
-            ExtraArgs={"ContentType": "application/pdf"}
+        # put_object (y no upload_fileobj) porque devuelve el ETag con el
+        # que se valida la copia de la caché local
+        resp = get_s3().put_object(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            Body=pdf_bytes,
+            ContentType="application/pdf"
         )
         logger.info("PDF subido a S3 exitosamente")
         # url = s3.generate_presigned_url(
@@ -147,8 +213,17 @@ def subir_pdf_memoria_a_s3(domain: str, pdf_bytes: bytes) -> str:
         #     ExpiresIn=3600
         # )
         # logger.info("URL firmada generada")
-        # return key
-
     except Exception as e:
         logger.error(f"Error subiendo PDF a S3: {e}")
         return ""
+
+    try:
+        pdf_cache.put(key, pdf_bytes, resp.get("ETag"))
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el PDF en la caché local: {e}")
+
+    try:
+        _escribir_indice(domain, key, ts, len(pdf_bytes), profile)
+    except Exception as e:
+        logger.error(f"Error actualizando índice de reportes: {e}")
+    return key
@@ -0,0 +1,22 @@
+# app/services/scan_cache.py
+
+import hashlib
+import os
+from app.services.cache import DiskCache, CACHE_DIR
+
+NMAP_CACHE_TTL         = int(os.getenv("NMAP_CACHE_TTL_SECONDS", 3600))
+NMAP_CACHE_MAX_ENTRIES = int(os.getenv("NMAP_CACHE_MAX_ENTRIES", 1000))
+
+scan_cache = DiskCache(
+    os.path.join(CACHE_DIR, "nmap.sqlite"),
+    ttl_seconds=NMAP_CACHE_TTL,
+    max_entries=NMAP_CACHE_MAX_ENTRIES,
+)
+
+
+def scan_cache_key(target: str, ports: str | None, arguments: str) -> str:
+    """
+    Clave de caché para un escaneo: objetivo normalizado + rango + argumentos.
+    """
+    raw = "|".join([target.strip().lower().rstrip("."), ports or "", " ".join(arguments.split())])
+    return hashlib.sha256(raw.encode()).hexdigest()
@@ -0,0 +1,100 @@
+# app/services/scan_serializer.py
+
+import math
+
+# Puertos que se conservan antes que el resto cuando hay que recortar
+PUERTOS_PRIORITARIOS = {
+    21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443, 445, 1433, 1521,
+    2049, 3306, 3389, 5432, 5900, 6379, 8080, 8443, 9200, 11211, 27017,
+}
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Aproximación barata del número de tokens (~4 caracteres por token).
+    """
+    return math.ceil(len(texto) / 4)
+
+
+def _linea(puerto: tuple) -> str:
+    return " ".join(str(v) for v in puerto if v != "")
+
+
+def _prioridad(puerto: tuple) -> tuple:
+    port, service, product, version = puerto
+    return (
+        port not in PUERTOS_PRIORITARIOS,
+        not version,
+        not product,
+        port,
+    )
+
+
+def serializar_escaneo(scan_result: dict, token_budget: int) -> tuple[str, dict]:
+    """
+    Convierte el resultado de nmap en un texto compacto para el prompt:
+    sólo puertos abiertos con servicio/producto/versión, sin duplicados,
+    agrupando los hosts con la misma exposición. Si no cabe en token_budget
+    se descartan primero los puertos menos relevantes.
+
+    Devuelve (texto, estadísticas).
+    """
+    # host -> puertos abiertos únicos (port, service, product, version)
+    hosts: dict[str, list[tuple]] = {}
+    errores = []
+    for host, puertos in scan_result.items():
+        if host == "changes":
+            continue
+        if not isinstance(puertos, list):
+            errores.append(f"{host}: {puertos}")
+            continue
+        hosts[host] = sorted({
+            (p.get("port"), p.get("service", ""), p.get("product", ""), p.get("version", ""))
+            for p in puertos if p.get("state") == "open"
+        })
+
+    # Hosts con idéntica exposición comparten bloque
+    grupos: dict[tuple, list[str]] = {}
+    for host, puertos in hosts.items():
+        grupos.setdefault(tuple(puertos), []).append(host)
+
+    candidatos = [
+        (_prioridad(p), i, p)
+        for i, puertos in enumerate(grupos)
+        for p in puertos
+    ]
+    total = len(candidatos)
+    cabeceras = [f"host {', '.join(sorted(h))}" for h in grupos.values()]
+    # Se reserva sitio para la línea final de puertos omitidos
+    usados = estimar_tokens("\n".join(cabeceras + errores)) + 12
+
+    incluidos: dict[int, list[tuple]] = {i: [] for i in range(len(grupos))}
+    for _, i, puerto in sorted(candidatos):
+        coste = estimar_tokens(" " + _linea(puerto) + "\n")
+        if usados + coste > token_budget:
+            break
+        incluidos[i].append(puerto)
+        usados += coste
+    n_incluidos = sum(len(p) for p in incluidos.values())
+
+    lineas = []
+    for i, (puertos, cabecera) in enumerate(zip(grupos, cabeceras)):
+        lineas.append(cabecera)
+        if not puertos:
+            lineas.append(" no open ports")
+        lineas.extend(" " + _linea(p) for p in sorted(incluidos[i]))
+    if n_incluidos < total:
+        lineas.append(f"... {total - n_incluidos} lower-priority open ports omitted")
+    lineas.extend(errores)
+
+    texto = "\n".join(lineas)
+    stats = {
+        "hosts": len(hosts),
+        "open_ports": total,
+        "included_ports": n_incluidos,
+        "omitted_ports": total - n_incluidos,
+        "raw_chars": len(str(scan_result)),
+        "chars": len(texto),
+        "estimated_tokens": estimar_tokens(texto),
+    }
+    return texto, stats
@@ -1,6 +1,10 @@
 # app/services/scan_service.py
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Callable
 from app.factories.nmap_creator   import NmapScannerCreator
 from app.factories.gemini_creator import GeminiAnalyzerCreator
 from app.services.report_service  import (
@@ -8,82 +12,277 @@ from app.services.report_service  import (
     generar_pdf_en_memoria,
     subir_pdf_memoria_a_s3,
     buscar_reporte_s3,
-    s3,
-    BUCKET_NAME,
+    leer_pdf,
+)
+from app.services.email_service   import render_scan_email, enqueue_email, deliver_email
+from app.services.singleflight    import SingleFlight
+from app.services.local_reports   import es_local
+from app.services.metrics         import medir, ERRORS, REPORT_LOOKUPS
+from app.services                 import PortCallback
+from app.models.scan_profile      import DEFAULT_PROFILE
+from app.services.exceptions      import (
+    ScanError,
+    AnalysisError,
+    ReportError,
+    EmailError,
+    OverloadedError,
 )
-from app.services.email_service   import render_scan_email, send_email
-from app.services.exceptions      import ScanError, AnalysisError, ReportError, EmailError
 from app.factories.logger_factory import LoggerFactory
 
 logger = LoggerFactory.create_logger("scan_service")
 
-async def perform_scan(domain: str, email: str) -> dict:
-    try:
+# Ejecuciones del pipeline en curso, indexadas por dominio normalizado
+_scans_en_curso = SingleFlight()
 
-        # 0️⃣ ¿Ya existe un reporte reciente en S3?
-        existing_key = buscar_reporte_s3(domain)
-        if existing_key:
-            logger.info(f"Reutilizando PDF existente en S3: {existing_key}")
-            obj       = s3.get_object(Bucket=BUCKET_NAME, Key=existing_key)
-            pdf_bytes = obj["Body"].read()
-            filename  = existing_key.split("/")[-1]
-
-            asunto      = f"Reporte Hack4Me: {domain}"
-            cuerpo_html = render_scan_email(domain=domain)  # plantilla solo menciona "adjunto"
-            if not send_email(
-                destinatario=email,
-                asunto=asunto,
-                cuerpo_html=cuerpo_html,
-                attachment=pdf_bytes,
-                filename=filename
-            ):
-                raise EmailError(f"No se pudo enviar el email a {email}")
-            logger.info("Email con reporte reutilizado enviado con éxito")
-            return {
-                "domain": domain,
-                "email":  email,
-                "reused": True,
-            }
+# Dominios de un lote que se analizan / envían a la vez
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+
+
+def normalizar_dominio(domain: str) -> str:
+    return domain.strip().lower().rstrip(".")
+
+
+def scans_coalescidos() -> int:
+    """
+    Número de ejecuciones del pipeline ahorradas por deduplicación.
+    """
+    return _scans_en_curso.coalesced
+
+
+def _notificar(on_stage: Callable[[str], None] | None, stage: str):
+    logger.info(f"Etapa: {stage}")
+    if on_stage:
+        on_stage(stage)
 
-        # 1️⃣ Flujo completo (no había PDF reciente)
-        scan_result = NmapScannerCreator().scan(domain)
+
+def _generar_reporte(
+    domain: str,
+    on_stage: Callable[[str], None] | None,
+    on_port: PortCallback | None = None,
+    scan_result: dict | None = None,
+    profile: str = DEFAULT_PROFILE
+) -> dict:
+    """
+    Escaneo + análisis + PDF + subida a S3. Es la parte costosa que se
+    comparte entre peticiones concurrentes del mismo dominio y perfil.
+    Si se pasa scan_result (escaneo por lotes) no se vuelve a lanzar nmap.
+    """
+    if scan_result is None:
+        _notificar(on_stage, "nmap")
+        with medir("nmap"):
+            scan_result = NmapScannerCreator(profile).scan(domain, on_port=on_port)
+    _notificar(on_stage, "analysis")
+    with medir("analysis"):
         report_data = GeminiAnalyzerCreator().analyze(domain, scan_result)
-        guardar_en_dynamodb(domain, email)
+    if "analysis_error" in report_data:
+        # El analizador no propaga sus fallos (el PDF sale con el informe de
+        # error), así que medir() no los ve
+        ERRORS.labels("analysis", "AnalysisError").inc()
 
-        # 4️⃣ Generar PDF en memoria
+    # 4️⃣ Generar PDF en memoria
+    _notificar(on_stage, "pdf")
+    with medir("pdf"):
         pdf_bytes = generar_pdf_en_memoria(
             domain=domain,
             scan_result=scan_result,
             report_data=report_data,
         )
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        filename  = f"OSCP_{domain}_{timestamp}.pdf"
+    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    filename  = f"OSCP_{domain}_{timestamp}.pdf"
 
-        # 5️⃣ Subir a S3 (ya no devuelve URL)
-        key = subir_pdf_memoria_a_s3(domain, pdf_bytes)
-        logger.info(f"PDF guardado en S3 con key: {key}")
+    # 5️⃣ Subir a S3 (ya no devuelve URL)
+    _notificar(on_stage, "upload")
+    with medir("upload"):
+        key = subir_pdf_memoria_a_s3(domain, pdf_bytes, profile)
+    logger.info(f"PDF guardado con key: {key}")
 
-        # 6️⃣ Enviar email CON el PDF adjunto
-        asunto      = f"Reporte Hack4Me: {domain}"
-        cuerpo_html = render_scan_email(domain=domain)
-        if not send_email(
+    return {
+        "scan_result": scan_result,
+        "report_data": report_data,
+        "pdf_bytes":   pdf_bytes,
+        "filename":    filename,
+    }
+
+
+def _leer_pdf(key: str) -> tuple[bytes, str]:
+    # Repositorio local o S3 (vía la caché local de PDFs)
+    with medir("local_read" if es_local(key) else "s3_read"):
+        return leer_pdf(key), key.split("/")[-1]
+
+
+def _enviar_reporte(domain: str, email: str, pdf_bytes: bytes, filename: str, esperar: bool = False) -> str:
+    """
+    Encola el email con el PDF adjunto y devuelve el id del mensaje.
+    El envío real lo hacen los workers del mailer; con `esperar` no se
+    vuelve hasta que el email se ha enviado.
+    """
+    asunto      = f"Reporte Hack4Me: {domain}"
+    with medir("email"):
+        cuerpo_html = render_scan_email(domain=domain)  # plantilla solo menciona "adjunto"
+        return (deliver_email if esperar else enqueue_email)(
             destinatario=email,
             asunto=asunto,
             cuerpo_html=cuerpo_html,
             attachment=pdf_bytes,
             filename=filename
-        ):
-            raise EmailError(f"No se pudo enviar el email a {email}")
+        )
+
+
+def run_scan_pipeline(
+    domain: str,
+    email: str,
+    on_stage: Callable[[str], None] | None = None,
+    on_port: PortCallback | None = None,
+    profile: str = DEFAULT_PROFILE,
+    wait_email: bool = False
+) -> dict:
+    """
+    Ejecuta el flujo completo de forma síncrona (bloqueante) con el
+    perfil de escaneo indicado. on_stage recibe el nombre de cada etapa
+    según se alcanza y on_port cada puerto que descubre nmap. Con
+    wait_email no se vuelve hasta que el email se ha enviado (EmailError
+    si falla); si no, basta con que quede encolado.
+    """
+    with medir("pipeline"):
+        return _ejecutar_pipeline(domain, email, on_stage, on_port, profile, wait_email)
+
+
+def _ejecutar_pipeline(
+    domain: str,
+    email: str,
+    on_stage: Callable[[str], None] | None,
+    on_port: PortCallback | None,
+    profile: str,
+    wait_email: bool = False
+) -> dict:
+    try:
+
+        # 0️⃣ ¿Ya existe un reporte reciente (en S3 o local)?
+        _notificar(on_stage, "lookup")
+        with medir("lookup"):
+            existing_key = buscar_reporte_s3(domain, profile=profile)
+        REPORT_LOOKUPS.labels("reused" if existing_key else "miss").inc()
+        if existing_key:
+            logger.info(f"Reutilizando PDF existente: {existing_key}")
+            pdf_bytes, filename = _leer_pdf(existing_key)
+
+            _notificar(on_stage, "email")
+            email_id = _enviar_reporte(domain, email, pdf_bytes, filename, esperar=wait_email)
+            logger.info("Email con reporte reutilizado encolado con éxito")
+            return {
+                "domain":   domain,
+                "email":    email,
+                "profile":  profile,
+                "reused":   True,
+                "email_id": email_id,
+            }
+
+        # 1️⃣ Flujo completo (no había PDF reciente). Si ya hay una ejecución
+        # en curso para el mismo dominio y perfil, nos adjuntamos a ella.
+        reporte, compartido = _scans_en_curso.do(
+            f"{normalizar_dominio(domain)}|{profile}",
+            lambda: _generar_reporte(domain, on_stage, on_port, profile=profile),
+            on_join=lambda: _notificar(on_stage, "coalesced"),
+        )
+        if compartido:
+            logger.info(
+                f"Reutilizando ejecución en curso para {domain} "
+                f"(ejecuciones ahorradas: {_scans_en_curso.coalesced})"
+            )
+        scan_result = reporte["scan_result"]
+        report_data = reporte["report_data"]
+        pdf_bytes   = reporte["pdf_bytes"]
+        filename    = reporte["filename"]
+        guardar_en_dynamodb(domain, email)
+
+        # 6️⃣ Enviar email CON el PDF adjunto
+        _notificar(on_stage, "email")
+        email_id = _enviar_reporte(domain, email, pdf_bytes, filename, esperar=wait_email)
 
         return {
             "domain":          domain,
             "email":           email,
+            "profile":         profile,
             "scan_result":     scan_result,
             "security_report": report_data,
             "reused":          False,
+            "coalesced":       compartido,
+            "email_id":        email_id,
         }
 
-    except (ScanError, AnalysisError, ReportError, EmailError):
+    except (ScanError, AnalysisError, ReportError, EmailError, OverloadedError):
         raise
     except Exception as e:
         raise ReportError(f"Fallo inesperado en perform_scan: {e}")
+
+
+def run_batch_pipeline(
+    items: list[tuple[str, str]],
+    on_stage: Callable[[str], None] | None = None,
+    profile: str = DEFAULT_PROFILE
+) -> dict:
+    """
+    Procesa un lote de pares (dominio, email) con un mismo perfil de
+    escaneo. Los dominios sin reporte reciente se escanean en
+    invocaciones compartidas de nmap; después el
+    análisis, el PDF y los emails se ejecutan con concurrencia acotada.
+    Un fallo en un elemento no interrumpe el resto del lote.
+    """
+    _notificar(on_stage, "lookup")
+    dominios = list(dict.fromkeys(normalizar_dominio(d) for d, _ in items))
+    with medir("lookup"):
+        existentes = {d: buscar_reporte_s3(d, profile=profile) for d in dominios}
+    a_escanear = [d for d in dominios if not existentes[d]]
+    for d in dominios:
+        REPORT_LOOKUPS.labels("reused" if existentes[d] else "miss").inc()
+
+    _notificar(on_stage, "nmap")
+    with medir("nmap_batch"):
+        scans = NmapScannerCreator(profile).scan_many(a_escanear) if a_escanear else {}
+
+    def preparar(domain: str):
+        try:
+            if existentes[domain]:
+                return _leer_pdf(existentes[domain]), True
+            reporte, _ = _scans_en_curso.do(
+                f"{domain}|{profile}",
+                lambda: _generar_reporte(domain, None, scan_result=scans[domain], profile=profile),
+            )
+            return (reporte["pdf_bytes"], reporte["filename"]), False
+        except Exception as e:
+            logger.error(f"Error generando reporte de {domain} en lote: {e}")
+            return e, False
+
+    def entregar(item: tuple[str, str]) -> dict:
+        domain, email = normalizar_dominio(item[0]), item[1]
+        resultado = {"domain": domain, "email": email}
+        preparado, reused = reportes[domain]
+        try:
+            if isinstance(preparado, Exception):
+                raise preparado
+            if not reused:
+                guardar_en_dynamodb(domain, email)
+            email_id = _enviar_reporte(domain, email, *preparado)
+            return {**resultado, "status": "completed", "reused": reused, "email_id": email_id}
+        except Exception as e:
+            return {**resultado, "status": "failed", "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as pool:
+        _notificar(on_stage, "analysis")
+        reportes = dict(zip(dominios, pool.map(preparar, dominios)))
+        _notificar(on_stage, "email")
+        resultados = list(pool.map(entregar, items))
+
+    return {
+        "items":     resultados,
+        "total":     len(resultados),
+        "failed":    sum(1 for r in resultados if r["status"] == "failed"),
+        "scanned":   len(a_escanear),
+    }
+
+
+async def perform_scan(domain: str, email: str, profile: str = DEFAULT_PROFILE) -> dict:
+    """
+    Ejecuta run_scan_pipeline en un hilo para no bloquear el event loop.
+    """
+    return await asyncio.to_thread(run_scan_pipeline, domain, email, profile=profile)
@@ -0,0 +1,57 @@
+# app/services/singleflight.py
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+class SingleFlight:
+    """
+    Deduplica ejecuciones concurrentes por clave: la primera llamada ejecuta
+    la función y las que llegan mientras está en curso esperan su resultado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self.coalesced = 0
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        on_join: Callable[[], None] | None = None
+    ) -> tuple[Any, bool]:
+        """
+        Devuelve (resultado, compartido). compartido es True si la llamada
+        se adjuntó a una ejecución ya en curso; en ese caso se invoca
+        on_join antes de esperar. Las excepciones de la ejecución original
+        se propagan a todos los que esperan.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                leader = True
+
+        if not leader:
+            if on_join:
+                on_join()
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return future.result(), False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,383 @@
+# app/worker.py
+"""
+Worker que consume de SQS los mensajes {"domain", "email"} que publica la
+Lambda de registro y ejecuta el pipeline de escaneo para cada uno.
+
+    python -m app.worker
+
+Se escala añadiendo procesos worker, sin necesidad de más réplicas de la API.
+
+Un mensaje sólo se borra de la cola cuando el email con el reporte se ha
+enviado; si el envío falla vuelve a la cola y el reintento reutiliza el PDF
+ya generado. La entrega es al menos una vez: un envío que termina después
+de agotar la espera puede repetirse.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.factories.logger_factory import LoggerFactory, log_context
+from app.services import aws_clients, mailer, metadata_store
+from app.services.aws_clients import get_sqs
+from app.services.scan_service import run_scan_pipeline
+from app.models.scan_profile import get_profile
+from app.services.exceptions import OverloadedError
+
+logger = LoggerFactory.create_logger("worker")
+
+SQS_URL = os.getenv("SQS_URL")
+# Mensajes procesándose a la vez en este proceso
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 4))
+# Hilos haciendo long polling (cada receive trae hasta 10 mensajes)
+WORKER_POLLERS = int(os.getenv("WORKER_POLLERS", 1))
+WORKER_WAIT_SECONDS = int(os.getenv("WORKER_WAIT_SECONDS", 20))
+# Visibilidad inicial; mientras el escaneo sigue en curso se va prorrogando
+WORKER_VISIBILITY_TIMEOUT = int(os.getenv("WORKER_VISIBILITY_TIMEOUT", 120))
+# Tras un fallo el mensaje vuelve a la cola pasado este tiempo
+WORKER_RETRY_DELAY_SECONDS = int(os.getenv("WORKER_RETRY_DELAY_SECONDS", 60))
+# Los borrados se agrupan en lotes de 10 o se envían pasado este tiempo
+WORKER_DELETE_FLUSH_SECONDS = float(os.getenv("WORKER_DELETE_FLUSH_SECONDS", 1))
+WORKER_METRICS_INTERVAL = float(os.getenv("WORKER_METRICS_INTERVAL", 60))
+
+SQS_MAX_BATCH = 10
+
+
+class WorkerMetrics:
+    """
+    Contadores del worker: mensajes recibidos, procesados y fallidos, y el
+    retraso (lag) entre que la Lambda envió el mensaje y que se recibió.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.monotonic()
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.deleted = 0
+        self.extended = 0
+        self.in_flight = 0
+        self.lag_ultimo = 0.0
+        self.lag_max = 0.0
+        self._ultimo_informe = (self.inicio, 0)
+
+    def recibido(self, lag: float):
+        with self._lock:
+            self.received += 1
+            self.in_flight += 1
+            self.lag_ultimo = lag
+            self.lag_max = max(self.lag_max, lag)
+
+    def terminado(self, ok: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+
+    def incrementar(self, campo: str, n: int = 1):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + n)
+
+    def snapshot(self) -> dict:
+        """
+        Estado actual. `throughput` es mensajes/s desde el snapshot anterior.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            t0, hechos0 = self._ultimo_informe
+            hechos = self.processed + self.failed
+            throughput = (hechos - hechos0) / max(ahora - t0, 1e-9)
+            self._ultimo_informe = (ahora, hechos)
+            datos = {
+                "received":        self.received,
+                "processed":       self.processed,
+                "failed":          self.failed,
+                "deleted":         self.deleted,
+                "extended":        self.extended,
+                "in_flight":       self.in_flight,
+                "throughput":      round(throughput, 3),
+                "lag_seconds":     round(self.lag_ultimo, 3),
+                "max_lag_seconds": round(self.lag_max, 3),
+            }
+            self.lag_max = 0.0
+            return datos
+
+
+class SQSWorker:
+    """
+    Long polling sobre la cola con concurrencia acotada. Sólo se piden a SQS
+    tantos mensajes como huecos libres hay en el pool, así que ningún mensaje
+    espera en memoria con la visibilidad corriendo.
+    """
+
+    def __init__(
+        self,
+        queue_url: str,
+        concurrency: int = WORKER_CONCURRENCY,
+        pollers: int = WORKER_POLLERS,
+        visibility_timeout: int = WORKER_VISIBILITY_TIMEOUT
+    ):
+        self.queue_url = queue_url
+        self.concurrency = concurrency
+        self.pollers = pollers
+        self.visibility_timeout = visibility_timeout
+        self.metrics = WorkerMetrics()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scan-worker")
+        self._huecos = threading.Semaphore(concurrency)
+        self._parar = threading.Event()
+        self._pollers: list[threading.Thread] = []
+        self._mantenimiento: threading.Thread | None = None
+        # receipt handle -> instante en que caduca la visibilidad
+        self._en_curso: dict[str, float] = {}
+        self._borrados: list[str] = []
+        self._lock = threading.Lock()
+
+    # ── Recepción ────────────────────────────────────────────────────────
+
+    def _reservar(self) -> int:
+        """
+        Bloquea hasta tener al menos un hueco y reserva hasta 10.
+        """
+        while not self._huecos.acquire(timeout=1):
+            if self._parar.is_set():
+                return 0
+        n = 1
+        while n < SQS_MAX_BATCH and self._huecos.acquire(blocking=False):
+            n += 1
+        return n
+
+    def _bucle_poller(self):
+        sqs = get_sqs()
+        while not self._parar.is_set():
+            n = self._reservar()
+            if not n:
+                return
+            try:
+                resp = sqs.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=n,
+                    WaitTimeSeconds=WORKER_WAIT_SECONDS,
+                    VisibilityTimeout=self.visibility_timeout,
+                    AttributeNames=["SentTimestamp", "ApproximateReceiveCount"],
+                )
+                mensajes = resp.get("Messages", [])
+            except Exception as e:
+                logger.error(f"Error recibiendo mensajes de SQS: {e}")
+                mensajes = []
+                self._parar.wait(5)
+
+            for _ in range(n - len(mensajes)):
+                self._huecos.release()
+            for mensaje in mensajes:
+                self._aceptar(mensaje)
+
+    def _aceptar(self, mensaje: dict):
+        enviado = int(mensaje.get("Attributes", {}).get("SentTimestamp", 0)) / 1000
+        self.metrics.recibido(max(time.time() - enviado, 0.0) if enviado else 0.0)
+        with self._lock:
+            self._en_curso[mensaje["ReceiptHandle"]] = time.monotonic() + self.visibility_timeout
+        self._pool.submit(self._procesar, mensaje)
+
+    # ── Procesado ────────────────────────────────────────────────────────
+
+    def _procesar(self, mensaje: dict):
+        with log_context(job_id=mensaje.get("MessageId")):
+            self._procesar_mensaje(mensaje)
+
+    def _procesar_mensaje(self, mensaje: dict):
+        handle = mensaje["ReceiptHandle"]
+        ok = False
+        try:
+            try:
+                body = json.loads(mensaje["Body"])
+                domain, email = body["domain"], body["email"]
+                profile = get_profile(body.get("profile")).name
+            except (ValueError, KeyError, TypeError) as e:
+                # Un mensaje mal formado nunca va a funcionar: se descarta
+                logger.error(f"Mensaje {mensaje.get('MessageId')} inválido, se descarta: {e}")
+                self._liberar(handle, borrar=True)
+                return
+
+            intento = mensaje.get("Attributes", {}).get("ApproximateReceiveCount", "1")
+            logger.info(f"Procesando {domain} para {email} (intento {intento})")
+            try:
+                # Se espera al envío del email: el outbox está en memoria y
+                # un mensaje borrado de SQS con el email aún encolado se
+                # perdería si el proceso se detiene
+                resultado = run_scan_pipeline(domain, email, profile=profile, wait_email=True)
+                logger.info(f"Escaneo de {domain} completado (reused={resultado.get('reused')})")
+                ok = True
+            except OverloadedError as e:
+                # Sin turno para nmap/Gemini: se reintenta cuando indique el control de admisión
+                logger.warning(f"Sobrecarga procesando {domain}, reintento en {e.retry_after}s")
+                self._liberar(handle, borrar=False, retraso=e.retry_after)
+                return
+            except Exception as e:
+                logger.error(f"Fallo procesando {domain}: {type(e).__name__}: {e}")
+            self._liberar(handle, borrar=ok)
+        finally:
+            self.metrics.terminado(ok)
+            self._huecos.release()
+
+    def _liberar(self, handle: str, borrar: bool, retraso: int = WORKER_RETRY_DELAY_SECONDS):
+        with self._lock:
+            self._en_curso.pop(handle, None)
+            if borrar:
+                self._borrados.append(handle)
+        if not borrar:
+            # Devolver el mensaje a la cola tras un retardo en lugar de
+            # esperar a que caduque la visibilidad
+            try:
+                get_sqs().change_message_visibility(
+                    QueueUrl=self.queue_url,
+                    ReceiptHandle=handle,
+                    VisibilityTimeout=retraso,
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo reprogramar el mensaje: {e}")
+
+    # ── Mantenimiento: prórrogas, borrados por lotes y métricas ─────────
+
+    def _prorrogar(self):
+        """
+        Prorroga la visibilidad de los mensajes en curso a los que les queda
+        menos de la mitad del timeout.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            pendientes = [h for h, caduca in self._en_curso.items()
+                          if caduca - ahora < self.visibility_timeout / 2]
+        for i in range(0, len(pendientes), SQS_MAX_BATCH):
+            lote = pendientes[i:i + SQS_MAX_BATCH]
+            try:
+                resp = get_sqs().change_message_visibility_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        {"Id": str(j), "ReceiptHandle": h, "VisibilityTimeout": self.visibility_timeout}
+                        for j, h in enumerate(lote)
+                    ],
+                )
+            except Exception as e:
+                logger.warning(f"Error prorrogando visibilidad: {e}")
+                continue
+            fallidos = {f["Id"] for f in resp.get("Failed", [])}
+            with self._lock:
+                for j, h in enumerate(lote):
+                    if str(j) not in fallidos and h in self._en_curso:
+                        self._en_curso[h] = ahora + self.visibility_timeout
+            self.metrics.incrementar("extended", len(lote) - len(fallidos))
+
+    def _vaciar_borrados(self):
+        with self._lock:
+            handles, self._borrados = self._borrados, []
+        for i in range(0, len(handles), SQS_MAX_BATCH):
+            lote = handles[i:i + SQS_MAX_BATCH]
+            try:
+                resp = get_sqs().delete_message_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[{"Id": str(j), "ReceiptHandle": h} for j, h in enumerate(lote)],
+                )
+            except Exception as e:
+                logger.error(f"Error borrando mensajes de SQS: {e}")
+                continue
+            for f in resp.get("Failed", []):
+                logger.warning(f"SQS no borró el mensaje {f.get('Id')}: {f.get('Message')}")
+            self.metrics.incrementar("deleted", len(resp.get("Successful", [])))
+
+    def _informar(self):
+        datos = self.metrics.snapshot()
+        try:
+            attrs = get_sqs().get_queue_attributes(
+                QueueUrl=self.queue_url,
+                AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+            )["Attributes"]
+            datos["queue_visible"] = int(attrs.get("ApproximateNumberOfMessages", 0))
+            datos["queue_not_visible"] = int(attrs.get("ApproximateNumberOfMessagesNotVisible", 0))
+        except Exception as e:
+            logger.debug(f"No se pudo leer el tamaño de la cola: {e}")
+        logger.info(f"Métricas del worker: {json.dumps(datos)}")
+
+    def _bucle_mantenimiento(self):
+        proximo_informe = time.monotonic() + WORKER_METRICS_INTERVAL
+        while True:
+            parado = self._parar.wait(WORKER_DELETE_FLUSH_SECONDS)
+            with self._lock:
+                ocupado = bool(self._en_curso)
+            self._vaciar_borrados()
+            if parado and not ocupado:
+                return
+            self._prorrogar()
+            if time.monotonic() >= proximo_informe:
+                self._informar()
+                proximo_informe = time.monotonic() + WORKER_METRICS_INTERVAL
+
+    # ── Ciclo de vida ────────────────────────────────────────────────────
+
+    def start(self):
+        logger.info(
+            f"Worker escuchando {self.queue_url} "
+            f"(concurrencia={self.concurrency}, pollers={self.pollers})"
+        )
+        for i in range(self.pollers):
+            hilo = threading.Thread(target=self._bucle_poller, name=f"sqs-poller-{i}", daemon=True)
+            hilo.start()
+            self._pollers.append(hilo)
+        self._mantenimiento = threading.Thread(
+            target=self._bucle_mantenimiento, name="sqs-maintenance", daemon=True
+        )
+        self._mantenimiento.start()
+
+    def interrupt(self):
+        """
+        Pide la parada; es seguro llamarlo desde un manejador de señales.
+        """
+        self._parar.set()
+
+    def stop(self):
+        """
+        Deja de recibir, espera a los mensajes en curso (sus visibilidades
+        se siguen prorrogando) y envía los borrados pendientes.
+        """
+        logger.info("Deteniendo worker: esperando a los mensajes en curso")
+        self._parar.set()
+        for hilo in self._pollers:
+            hilo.join()
+        self._pool.shutdown(wait=True)
+        if self._mantenimiento is not None:
+            self._mantenimiento.join()
+        self._informar()
+
+    def wait(self):
+        while not self._parar.wait(1):
+            pass
+
+
+def main():
+    if not SQS_URL:
+        raise SystemExit("SQS_URL no está configurada")
+
+    aws_clients.start_health_probe()
+    worker = SQSWorker(SQS_URL)
+
+    def detener(signum, frame):
+        logger.info(f"Señal {signum} recibida")
+        worker.interrupt()
+
+    signal.signal(signal.SIGTERM, detener)
+    signal.signal(signal.SIGINT, detener)
+
+    worker.start()
+    worker.wait()
+    worker.stop()
+    metadata_store.shutdown()
+    aws_clients.stop_health_probe()
+    mailer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# benchmarks/fake_services.py
+"""
+Sustitutos locales de los servicios externos para los benchmarks:
+Gemini (HTTP con latencia configurable), un sumidero SMTP y S3/DynamoDB
+con moto en modo servidor.
+"""
+
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPORTE_GEMINI = {
+    "table_of_contents": ["Summary", "Findings", "Recommendations"],
+    "summary": "Benchmark report.",
+    "objective": "Measure pipeline latency.",
+    "requirements": ["None"],
+    "high_level_summary": "Synthetic findings for benchmarking.",
+    "recommendations": ["Patch exposed services.", "Restrict management ports."],
+    "methodology": [{"title": "Scan", "description": "nmap -sV", "evidence": "fake"}],
+    "vulnerabilities": [{"cve_id": "CVE-2023-0001", "severity": "Medium"}],
+    "penetration": [],
+    "maintaining_access": "N/A",
+    "house_cleaning": "N/A",
+    "additional_notes": "Generated by benchmarks/fake_services.py",
+}
+
+
+class FakeGemini:
+    """
+    Servidor que responde a POST .../models/<modelo>:generateContent con un
+    informe fijo tras `latency` segundos (± jitter). `error_rate` es la
+    fracción de peticiones que responden 503.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 1.0, jitter: float = 0.2, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        servicio = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                servicio.requests += 1
+                time.sleep(max(0.0, servicio.latency + random.uniform(-servicio.jitter, servicio.jitter)))
+                if random.random() < servicio.error_rate:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                cuerpo = json.dumps({
+                    "candidates": [{"content": {"parts": [{"text": json.dumps(REPORTE_GEMINI)}]}}]
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}/v1beta"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-gemini", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+class SMTPSink:
+    """
+    Servidor SMTP mínimo que acepta y descarta todos los mensajes.
+    Cuenta mensajes y conexiones para comprobar el pool del mailer.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.messages = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+
+                def responder(linea: str):
+                    self.wfile.write((linea + "\r\n").encode())
+
+                responder("220 bench-sink ESMTP")
+                en_datos = False
+                while True:
+                    linea = self.rfile.readline()
+                    if not linea:
+                        return
+                    if en_datos:
+                        if linea.rstrip(b"\r\n") == b".":
+                            en_datos = False
+                            time.sleep(sink.latency)
+                            with sink._lock:
+                                sink.messages += 1
+                            responder("250 OK")
+                        continue
+                    comando = linea.decode(errors="replace").strip().upper()
+                    if comando.startswith(("EHLO", "HELO")):
+                        responder("250 bench-sink")
+                    elif comando == "DATA":
+                        en_datos = True
+                        responder("354 End data with <CR><LF>.<CR><LF>")
+                    elif comando == "QUIT":
+                        responder("221 Bye")
+                        return
+                    else:
+                        responder("250 OK")
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server(("127.0.0.1", port), Handler)
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+class FakeAWS:
+    """
+    S3 y DynamoDB con moto en modo servidor. Crea el bucket y la tabla que
+    espera la aplicación.
+    """
+
+    def __init__(self, port: int, bucket: str, table: str, region: str = "us-east-1"):
+        from moto.server import ThreadedMotoServer
+
+        self.port = port
+        self.bucket = bucket
+        self.table = table
+        self.region = region
+        self.url = f"http://127.0.0.1:{port}"
+        self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+
+    def start(self):
+        import logging
+        import boto3
+
+        # moto registra cada petición HTTP a través de werkzeug
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self._server.start()
+        kwargs = {
+            "endpoint_url": self.url,
+            "region_name": self.region,
+            "aws_access_key_id": "bench",
+            "aws_secret_access_key": "bench",
+        }
+        boto3.client("s3", **kwargs).create_bucket(Bucket=self.bucket)
+        boto3.client("dynamodb", **kwargs).create_table(
+            TableName=self.table,
+            KeySchema=[
+                {"AttributeName": "domain", "KeyType": "HASH"},
+                {"AttributeName": "email", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "domain", "AttributeType": "S"},
+                {"AttributeName": "email", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        return self
+
+    def stop(self):
+        self._server.stop()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# benchmarks/run.py
+"""
+Benchmark de carga del pipeline de escaneo contra la API real (uvicorn)
+con sustitutos locales de nmap, wkhtmltopdf, Gemini, S3/DynamoDB y SMTP.
+
+    python benchmarks/run.py --requests 50 --concurrency 10
+    python benchmarks/run.py --save default
+    python benchmarks/run.py --compare benchmarks/baselines/default.json
+
+Cada escaneo se lanza como trabajo (POST /scan) y se consulta hasta que
+termina; las duraciones por etapa salen del campo `timings` del trabajo y
+la de SMTP del histograma de /metrics.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from fake_services import FakeAWS, FakeGemini, SMTPSink
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+FAKES_DIR = os.path.join(BENCH_DIR, "fakes")
+BASELINES_DIR = os.path.join(BENCH_DIR, "baselines")
+
+BUCKET = "hacker4me-bench"
+TABLE = "companies-bench"
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentiles(valores: list[float]) -> dict:
+    if not valores:
+        return {"count": 0}
+    orden = sorted(valores)
+
+    def p(q: float) -> float:
+        # nearest-rank
+        return orden[min(len(orden) - 1, max(0, int(round(q * len(orden) + 0.5)) - 1))]
+
+    return {
+        "count": len(orden),
+        "mean": round(sum(orden) / len(orden), 4),
+        "p50": round(p(0.50), 4),
+        "p95": round(p(0.95), 4),
+        "p99": round(p(0.99), 4),
+        "max": round(orden[-1], 4),
+    }
+
+
+def percentiles_histograma(metrics: str, stage: str) -> dict:
+    """
+    Percentiles aproximados (límite superior del bucket) de una etapa a
+    partir de hack4me_stage_duration_seconds en formato Prometheus.
+    """
+    buckets, total = [], 0.0
+    suma = 0.0
+    prefijo = f'stage="{stage}"'
+    for linea in metrics.splitlines():
+        if linea.startswith("hack4me_stage_duration_seconds_bucket") and prefijo in linea:
+            le = linea.split('le="', 1)[1].split('"', 1)[0]
+            buckets.append((float("inf") if le == "+Inf" else float(le), float(linea.rsplit(" ", 1)[1])))
+        elif linea.startswith("hack4me_stage_duration_seconds_count") and prefijo in linea:
+            total = float(linea.rsplit(" ", 1)[1])
+        elif linea.startswith("hack4me_stage_duration_seconds_sum") and prefijo in linea:
+            suma = float(linea.rsplit(" ", 1)[1])
+    if not total:
+        return {"count": 0}
+
+    def p(q: float) -> float:
+        for le, acumulado in sorted(buckets):
+            if acumulado >= q * total:
+                return le
+        return float("inf")
+
+    return {
+        "count": int(total),
+        "mean": round(suma / total, 4),
+        "p50": p(0.50),
+        "p95": p(0.95),
+        "p99": p(0.99),
+        "approx": "bucket upper bound",
+    }
+
+
+class Entorno:
+    """
+    Arranca los servicios falsos y la API en un subproceso apuntando a ellos.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="hack4me-bench-")
+        self.gemini = FakeGemini(latency=args.gemini_latency, jitter=args.gemini_jitter,
+                                 error_rate=args.gemini_error_rate)
+        self.smtp = SMTPSink(latency=args.smtp_latency)
+        self.aws = FakeAWS(puerto_libre(), BUCKET, TABLE)
+        self.api_port = puerto_libre()
+        self.api: subprocess.Popen | None = None
+
+    def env(self) -> dict:
+        env = dict(os.environ)
+        env.update({
+            "PROJECT_ROOT": REPO_DIR,
+            "PYTHONPATH": REPO_DIR,
+            "PATH": FAKES_DIR + os.pathsep + env.get("PATH", ""),
+            "CACHE_DIR": os.path.join(self.workdir, "cache"),
+            "METADATA_DB_PATH": os.path.join(self.workdir, "metadata.sqlite"),
+            "NMAP_BIN": os.path.join(FAKES_DIR, "nmap"),
+            "WKHTMLTOPDF_BIN": os.path.join(FAKES_DIR, "wkhtmltopdf"),
+            "BENCH_NMAP_LATENCY": str(self.args.nmap_latency),
+            "BENCH_NMAP_JITTER": str(self.args.nmap_jitter),
+            "BENCH_PDF_LATENCY": str(self.args.pdf_latency),
+            "GEMINI_API_URL": self.gemini.url,
+            "GEMINI_API_KEY": "bench",
+            "AWS_ENDPOINT_URL": self.aws.url,
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_REGION": self.aws.region,
+            "S3_BUCKET_NAME": BUCKET,
+            "DYNAMODB_TABLE_NAME": TABLE,
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.smtp.port),
+            "SMTP_USER": "",
+            "SMTP_PASS": "",
+        })
+        env.update(dict(kv.split("=", 1) for kv in self.args.env))
+        return env
+
+    def __enter__(self):
+        self.gemini.start()
+        self.smtp.start()
+        self.aws.start()
+        self.api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.api_port), "--log-level", "warning"],
+            cwd=self.workdir,
+            env=self.env(),
+            stdout=subprocess.DEVNULL,
+            stderr=open(os.path.join(self.workdir, "uvicorn.log"), "wb"),
+        )
+        limite = time.monotonic() + 60
+        while time.monotonic() < limite:
+            if self.api.poll() is not None:
+                raise RuntimeError(f"La API no arrancó; ver {self.workdir}/uvicorn.log")
+            try:
+                httpx.get(f"http://127.0.0.1:{self.api_port}/", timeout=1)
+                return self
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        raise RuntimeError("La API no respondió en 60s")
+
+    def __exit__(self, *exc):
+        if self.api is not None:
+            self.api.terminate()
+            try:
+                self.api.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.api.kill()
+        self.aws.stop()
+        self.smtp.stop()
+        self.gemini.stop()
+        if self.args.keep_workdir:
+            print(f"Directorio de trabajo: {self.workdir}")
+        else:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+async def un_escaneo(cliente: httpx.AsyncClient, dominio: str, email: str, poll: float) -> dict:
+    inicio = time.perf_counter()
+    r = await cliente.post("/scan/", json={"domain": dominio, "email": email})
+    if r.status_code == 429:
+        return {"status": "rejected", "total": time.perf_counter() - inicio}
+    r.raise_for_status()
+    job_id = r.json()["job_id"]
+    while True:
+        await asyncio.sleep(poll)
+        job = (await cliente.get(f"/scan/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            return {
+                "status": job["status"],
+                "total": time.perf_counter() - inicio,
+                "timings": job.get("timings", {}),
+                "reused": (job.get("result") or {}).get("reused"),
+                "error": job.get("error"),
+            }
+
+
+async def cargar(args, base_url: str) -> tuple[list[dict], float]:
+    semaforo = asyncio.Semaphore(args.concurrency)
+    limites = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limites) as cliente:
+        async def tarea(i: int):
+            async with semaforo:
+                dominio = f"bench-{i % args.domains}.example.com"
+                return await un_escaneo(cliente, dominio, f"user{i}@example.com", args.poll)
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(tarea(i) for i in range(args.requests)))
+        return resultados, time.perf_counter() - inicio
+
+
+def informe(args, resultados: list[dict], duracion: float, metrics: str, entregados: int) -> dict:
+    completados = [r for r in resultados if r["status"] == "completed"]
+    etapas: dict[str, list[float]] = {}
+    for r in completados:
+        for etapa, ms in r.get("timings", {}).items():
+            etapas.setdefault(etapa, []).append(ms / 1000)
+    stages = {etapa: percentiles(v) for etapa, v in sorted(etapas.items())}
+    stages["smtp"] = percentiles_histograma(metrics, "smtp")
+
+    return {
+        "meta": {
+            "date": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "keep_workdir")},
+        },
+        "requests": len(resultados),
+        "completed": len(completados),
+        "failed": sum(1 for r in resultados if r["status"] == "failed"),
+        "rejected": sum(1 for r in resultados if r["status"] == "rejected"),
+        "reused": sum(1 for r in completados if r.get("reused")),
+        "emails_delivered": entregados,
+        "duration_seconds": round(duracion, 3),
+        "rps": round(len(completados) / duracion, 3) if duracion else 0.0,
+        "total": percentiles([r["total"] for r in completados]),
+        "stages": stages,
+    }
+
+
+def imprimir(res: dict):
+    print(f"\n{res['completed']}/{res['requests']} completados, {res['failed']} fallidos, "
+          f"{res['rejected']} rechazados (429), {res['reused']} reutilizados, "
+          f"{res['emails_delivered']} emails entregados")
+    print(f"{res['duration_seconds']}s  ->  {res['rps']} req/s\n")
+    print(f"{'etapa':<12}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'media':>10}")
+    for nombre, p in [("total", res["total"]), *res["stages"].items()]:
+        if p.get("count"):
+            print(f"{nombre:<12}{p['count']:>6}{p['p50']:>10.3f}{p['p95']:>10.3f}{p['p99']:>10.3f}{p['mean']:>10.3f}")
+
+
+def comparar(res: dict, base: dict, umbral: float) -> bool:
+    """
+    Imprime la variación frente a una línea base y devuelve True si hay
+    regresión: p95 total o req/s peor que `umbral` (fracción).
+    """
+    print(f"\nComparación con la línea base ({base['meta']['date']}):")
+    print(f"{'métrica':<18}{'base':>10}{'actual':>10}{'cambio':>10}")
+
+    def fila(nombre: str, b: float, a: float) -> float:
+        cambio = (a - b) / b if b else 0.0
+        print(f"{nombre:<18}{b:>10.3f}{a:>10.3f}{cambio:>+10.1%}")
+        return cambio
+
+    regresion = False
+    if fila("req/s", base["rps"], res["rps"]) < -umbral:
+        regresion = True
+    if fila("total p95", base["total"].get("p95", 0), res["total"].get("p95", 0)) > umbral:
+        regresion = True
+    for etapa, p in res["stages"].items():
+        b = base["stages"].get(etapa, {})
+        if p.get("count") and b.get("count"):
+            fila(f"{etapa} p95", b["p95"], p["p95"])
+    print("\nREGRESIÓN" if regresion else "\nSin regresión")
+    return regresion
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--domains", type=int, default=None,
+                        help="dominios distintos (por defecto uno por petición: todo sin caché)")
+    parser.add_argument("--nmap-latency", type=float, default=2.0)
+    parser.add_argument("--nmap-jitter", type=float, default=0.5)
+    parser.add_argument("--gemini-latency", type=float, default=1.0)
+    parser.add_argument("--gemini-jitter", type=float, default=0.2)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--pdf-latency", type=float, default=0.3)
+    parser.add_argument("--smtp-latency", type=float, default=0.05)
+    parser.add_argument("--poll", type=float, default=0.1, help="intervalo de consulta del trabajo")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--env", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="variable extra para la API (p. ej. --env NMAP_BACKEND=stream)")
+    parser.add_argument("--save", metavar="NOMBRE", help="guarda el resultado en baselines/NOMBRE.json")
+    parser.add_argument("--compare", metavar="RUTA", help="compara con una línea base guardada")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args(argv)
+    args.domains = args.domains or args.requests
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with Entorno(args) as entorno:
+        base_url = f"http://127.0.0.1:{entorno.api_port}"
+        resultados, duracion = asyncio.run(cargar(args, base_url))
+
+        # Los emails se envían en segundo plano: esperar a que el outbox se vacíe
+        esperados = sum(1 for r in resultados if r["status"] == "completed")
+        limite = time.monotonic() + 60
+        while entorno.smtp.messages < esperados and time.monotonic() < limite:
+            time.sleep(0.2)
+        metrics = httpx.get(f"{base_url}/metrics", timeout=10).text
+        res = informe(args, resultados, duracion, metrics, entorno.smtp.messages)
+
+    imprimir(res)
+    for r in resultados:
+        if r["status"] == "failed":
+            print(f"  fallo: {r['error']}")
+            break
+
+    if args.save:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        ruta = os.path.join(BASELINES_DIR, f"{args.save}.json")
+        with open(ruta, "w") as fh:
+            json.dump(res, fh, indent=2)
+        print(f"\nLínea base guardada en {ruta}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            if comparar(res, json.load(fh), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,62 +3,114 @@ import re
 import boto3
 from datetime import datetime, timedelta
 from utils.domain_validator import is_valid_domain
+from utils.dynamodb_client import get_emails_since
+from utils.report_index import get_last_report_info
+from utils.sqs_batcher import SQSBatcher
+from utils.ttl_cache import TTLCache
 import os
 
-# SQS
+# Clientes creados una vez por contenedor
 sqs = boto3.client('sqs')
-dynamo = boto3.client('dynamodb')
+s3 = boto3.client('s3')
+dynamodb = boto3.resource('dynamodb')
 SQS_URL = os.getenv('SQS_URL')
+BUCKET_NAME = os.getenv('S3_BUCKET_NAME', 'hacker4me')
+TABLE_NAME = os.getenv('DYNAMODB_TABLE_NAME', 'companies')
+table = dynamodb.Table(TABLE_NAME)
+
+# Cachés que sobreviven entre invocaciones mientras el contenedor está caliente
+LAST_REPORT_TTL = int(os.getenv('LAST_REPORT_CACHE_TTL_SECONDS', 300))
+ENQUEUE_DEDUP_TTL = int(os.getenv('ENQUEUE_DEDUP_TTL_SECONDS', 300))
+REPORT_MAX_AGE = timedelta(hours=12)
+
+_last_reports = TTLCache(LAST_REPORT_TTL)
+_companies = TTLCache(LAST_REPORT_TTL)
+_recently_enqueued = TTLCache(ENQUEUE_DEDUP_TTL)
+_NO_REPORT = object()
+
+
+def last_report(domain):
+    """
+    Último reporte del dominio (índice latest.json de S3) con los emails a
+    los que se envió, consultando como mucho una vez cada LAST_REPORT_TTL
+    segundos por dominio.
+    """
+    cached = _last_reports.get(domain)
+    if cached is None:
+        cached = get_last_report_info(s3, BUCKET_NAME, domain) or _NO_REPORT
+        if cached is not _NO_REPORT:
+            cached['emails'] = get_emails_since(table, domain, cached['timestamp'])
+        _last_reports.set(domain, cached)
+    return None if cached is _NO_REPORT else cached
+
+
+def company_registered(domain, email):
+    key = (domain, email)
+    cached = _companies.get(key)
+    if cached is None:
+        cached = 'Item' in table.get_item(Key={'domain': domain, 'email': email})
+        _companies.set(key, cached)
+    return cached
+
+
+def handle_signup(body, batcher):
+    """
+    Procesa una petición {email}. Devuelve (status_code, body) y, si hace
+    falta escanear, añade el par (domain, email) al batcher.
+    """
+    email = body.get('email')
+    domain = email.split('@')[-1] if email else None
+    if not domain:
+        return 400, {"error": "Domain is required."}
+
+    # 2️⃣ Validar dominio con regex
+    if not is_valid_domain(domain):
+        return 400, {"error": "Invalid domain format."}
+
+    # 3️⃣ Búsqueda del último reporte en S3 y sus envíos en DynamoDB (con caché)
+    report = last_report(domain)
+    if report:
+        report_time = report['timestamp']
+        if datetime.utcnow() - report_time < REPORT_MAX_AGE:
+            return 200, {
+                "status": "report_sent",
+                "last_report_time": report_time.isoformat(),
+                "emails_sent": report['emails']
+            }
+    if company_registered(domain, email):
+        return 200, {"status": "success"}
+
+    # 4️⃣ Si no existe o es mayor a 12 horas, encolar en SQS (por lotes)
+    batcher.add(domain, email)
+    return 200, {"status": "success"}
 
-# Datos quemados simulando la tabla DynamoDB
-SIMULATED_DATA = {
-    'scanme.nmap.org': {
-        'timestamp': datetime.utcnow() - timedelta(hours=8),  # Simula un reporte hace 8 horas
-        'emails': ['user1@example.com', 'user2@example.com']
-    },
-    'example.com': {
-        'timestamp': datetime.utcnow() - timedelta(hours=15),  # Simula un reporte hace 15 horas
-        'emails': ['admin@example.com']
-    }
-}
 
 def lambda_handler(event, context):
+    """
+    Acepta un evento de API Gateway o un lote de registros (event['Records'])
+    con el mismo body. Los envíos a SQS se agrupan con send_message_batch y
+    se vacían antes de terminar la invocación.
+    """
     try:
         print("Evento recibido:", event)
+        batcher = SQSBatcher(sqs, SQS_URL, recently_sent=_recently_enqueued)
+
+        # 1️⃣ Extraer los bodies del evento
+        if 'Records' in event:
+            bodies = [json.loads(r['body']) for r in event['Records']]
+        else:
+            bodies = [json.loads(event['body'])]
+
+        results = [handle_signup(body, batcher) for body in bodies]
+
+        failed = batcher.flush()
+        if failed:
+            print(f"Mensajes no aceptados por SQS: {failed}")
+            return response(500, {"error": "Internal server error."})
 
-        # 1️⃣ Extraer dominio del evento
-        body = json.loads(event['body'])
-        email = body.get('email')
-        domain = email.split('@')[-1] if email else None
-        if not domain:
-            return response(400, {"error": "Domain is required."})
-
-        # 2️⃣ Validar dominio con regex
-        if not is_valid_domain(domain):
-            return response(400, {"error": "Invalid domain format."})
-
-        # 3️⃣ Simular búsqueda en DynamoDB (con datos quemados)
-        last_report = SIMULATED_DATA.get(domain)
-        if last_report:
-            report_time = last_report['timestamp']
-            emails_sent = last_report['emails']
-            if datetime.utcnow() - report_time < timedelta(hours=12):
-                return response(200, {
-                    "status": "report_sent",
-                    "last_report_time": report_time.isoformat(),
-                    "emails_sent": emails_sent
-                })
-        company = dynamo.get_item(TableName='companies', Key={'domain': {'S': domain},'email': {'S': email}})
-        if company.get('Item'):
-            return response(200, {"status": "success"})
-
-        # 4️⃣ Si no existe o es mayor a 12 horas, enviar a SQS
-        sqs.send_message(
-            QueueUrl=SQS_URL,
-            MessageBody=json.dumps({"domain": domain, "email": email})
-        )
-
-        return response(200, {"status": "success"})
+        if 'Records' in event:
+            return response(200, {"results": [{"statusCode": c, **b} for c, b in results]})
+        return response(*results[0])
 
     except Exception as e:
         print(f"Error: {e}")
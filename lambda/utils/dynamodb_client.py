@@ -1,16 +1,21 @@
-from boto3.dynamodb.conditions import Key
-from datetime import datetime
+from boto3.dynamodb.conditions import Attr, Key
 
-def get_last_report_info(table, domain):
-    response = table.query(
-        KeyConditionExpression=Key('domain').eq(domain),
-        ScanIndexForward=False,
-        Limit=1
-    )
-    items = response.get('Items', [])
-    if items:
-        last_item = items[0]
-        timestamp = datetime.fromisoformat(last_item['timestamp'])
-        emails = last_item.get('emails_sent', [])
-        return {"timestamp": timestamp, "emails": emails}
-    return None
+
+def get_emails_since(table, domain, since):
+    """
+    Emails registrados para el dominio desde `since` (datetime). La tabla
+    tiene como clave (domain, email) y la app guarda la fecha del último
+    envío en `timestamp`.
+    """
+    params = {
+        'KeyConditionExpression': Key('domain').eq(domain),
+        'FilterExpression': Attr('timestamp').gte(since.isoformat()),
+        'ProjectionExpression': 'email',
+    }
+    emails = []
+    while True:
+        response = table.query(**params)
+        emails.extend(item['email'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return sorted(emails)
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,19 @@
+import json
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+
+def get_last_report_info(s3, bucket, domain):
+    """
+    Lee el índice reports/<domain>/latest.json que mantiene la app al subir
+    cada PDF. Devuelve {"timestamp", "key"} o None si no hay reporte.
+    """
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=f"reports/{domain}/latest.json")
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    entry = json.loads(obj['Body'].read())
+    return {"timestamp": datetime.fromisoformat(entry['timestamp']), "key": entry['key']}
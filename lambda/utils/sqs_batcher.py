@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+SQS_MAX_BATCH = 10
+
+
+class SQSBatcher:
+    """
+    Acumula mensajes {"domain", "email"} y los envía con send_message_batch
+    en grupos de hasta 10, descartando pares (domain, email) repetidos.
+    """
+
+    def __init__(self, sqs, queue_url, recently_sent=None):
+        self.sqs = sqs
+        self.queue_url = queue_url
+        self.recently_sent = recently_sent
+        self.fifo = bool(queue_url) and queue_url.endswith(".fifo")
+        self._buffer = {}
+
+    @staticmethod
+    def _dedup_id(domain, email):
+        return hashlib.sha256(f"{domain}|{email}".encode()).hexdigest()
+
+    def add(self, domain, email):
+        """
+        Añade un par al buffer. Devuelve False si es un duplicado (en este
+        buffer o enviado hace poco desde este contenedor).
+        """
+        key = (domain, email)
+        if key in self._buffer:
+            return False
+        if self.recently_sent is not None and key in self.recently_sent:
+            return False
+        self._buffer[key] = {"domain": domain, "email": email}
+        return True
+
+    def _entry(self, i, key, body):
+        entry = {"Id": str(i), "MessageBody": json.dumps(body)}
+        if self.fifo:
+            entry["MessageGroupId"] = key[0]
+            entry["MessageDeduplicationId"] = self._dedup_id(*key)
+        return entry
+
+    def flush(self):
+        """
+        Envía el buffer. Devuelve la lista de pares que SQS no aceptó.
+        """
+        pending = list(self._buffer.items())
+        self._buffer = {}
+        failed = []
+        for start in range(0, len(pending), SQS_MAX_BATCH):
+            chunk = pending[start:start + SQS_MAX_BATCH]
+            entries = [self._entry(i, key, body) for i, (key, body) in enumerate(chunk)]
+            resp = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            failed_ids = {f["Id"] for f in resp.get("Failed", [])}
+            for i, (key, _) in enumerate(chunk):
+                if str(i) in failed_ids:
+                    failed.append(key)
+                elif self.recently_sent is not None:
+                    self.recently_sent.set(key, True)
+        return failed
+
+    def __len__(self):
+        return len(self._buffer)
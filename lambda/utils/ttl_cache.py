@@ -0,0 +1,43 @@
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Caché mínima con expiración por entrada. Vive a nivel de módulo, así que
+    se conserva entre invocaciones mientras el contenedor de Lambda siga
+    caliente.
+    """
+
+    def __init__(self, ttl_seconds, max_entries=5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data = {}
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key, value):
+        if len(self._data) >= self.max_entries:
+            self._purge()
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def _purge(self):
+        now = time.monotonic()
+        for key in [k for k, (exp, _) in self._data.items() if exp < now]:
+            del self._data[key]
+        # Si sigue llena, se descartan las entradas más antiguas
+        while len(self._data) >= self.max_entries:
+            del self._data[next(iter(self._data))]
+
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Cachés, logs y reportes de la aplicación fuera del árbol del repositorio.
+# Se fija antes de que los tests importen app.*
+_tmp = tempfile.mkdtemp(prefix="hack4me-tests-")
+os.environ.setdefault("CACHE_DIR", os.path.join(_tmp, "cache"))
+os.environ.setdefault("LOG_DIR", os.path.join(_tmp, "logs"))
+os.environ.setdefault("LOG_MODE", "sync")
+os.environ.setdefault("PROJECT_ROOT", _tmp)
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.services.job_service as job_service
+from app.routers.scan import router
+from app.services.admission import nmap_admission
+
+
+def test_api_responde_429_con_retry_after_estimado(monkeypatch):
+    liberar = threading.Event()
+
+    def pipeline(domain, email, **kwargs):
+        # Como el pipeline real: los trabajos en ejecución ocupan un turno de nmap
+        with nmap_admission.slot(domain):
+            liberar.wait(10)
+        return {}
+
+    monkeypatch.setattr(job_service, "run_scan_pipeline", pipeline)
+    monkeypatch.setattr(nmap_admission, "max_queue", 2)
+    monkeypatch.setattr(nmap_admission, "_duracion_media", 10.0)
+
+    app = FastAPI()
+    app.include_router(router, prefix="/scan")
+    client = TestClient(app)
+    aceptados = []
+    try:
+        for i in range(job_service.SCAN_WORKERS):
+            aceptados.append(client.post("/scan/", json={"domain": f"d{i}.example", "email": "u@x.example"}))
+        # Esperar a que los workers del pool ocupen todos los turnos de nmap
+        limite = time.monotonic() + 5
+        while nmap_admission.stats()["running"] < nmap_admission.max_concurrent and time.monotonic() < limite:
+            time.sleep(0.01)
+
+        for i in range(2):
+            aceptados.append(client.post("/scan/", json={"domain": f"q{i}.example", "email": "u@x.example"}))
+        rechazo = client.post("/scan/", json={"domain": "extra.example", "email": "u@x.example"})
+    finally:
+        liberar.set()
+
+    assert [r.status_code for r in aceptados] == [202] * (job_service.SCAN_WORKERS + 2)
+    assert rechazo.status_code == 429
+    # 2 trabajos en cola para 4 turnos: 10s * (2/4 + 1)
+    assert rechazo.headers["Retry-After"] == "15"
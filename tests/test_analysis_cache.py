@@ -0,0 +1,24 @@
+from app.services.analysis_cache import analysis_cache_key, anonimizar, personalizar
+
+PUERTOS_WEB = [{"port": 443, "state": "open", "service": "https", "product": "nginx", "version": ""}]
+PUERTOS_SSH = [{"port": 22, "state": "open", "service": "ssh", "product": "OpenSSH", "version": ""}]
+
+
+def test_ips_que_se_solapan_se_restauran_intactas():
+    escaneo = {"10.0.0.1": PUERTOS_WEB, "10.0.0.12": PUERTOS_SSH}
+    informe = {
+        "summary": "a.io exposes 10.0.0.1 and 10.0.0.12; see www.a.io and a.io.example. Host a.io.",
+        "penetration": [{"system_vulnerable": "10.0.0.12:22"}],
+    }
+    cacheado = anonimizar(informe, "a.io", escaneo)
+    assert "10.0.0" not in cacheado["summary"]
+    assert "www.a.io" in cacheado["summary"] and "a.io.example" in cacheado["summary"]
+
+    # Otro cliente con la misma exposición en direcciones que se solapan al revés
+    otro = {"192.168.1.10": PUERTOS_WEB, "192.168.1.1": PUERTOS_SSH}
+    assert analysis_cache_key(otro) == analysis_cache_key(escaneo)
+    restaurado = personalizar(cacheado, "b.io", otro)
+    assert restaurado["summary"] == (
+        "b.io exposes 192.168.1.10 and 192.168.1.1; see www.a.io and a.io.example. Host b.io."
+    )
+    assert restaurado["penetration"] == [{"system_vulnerable": "192.168.1.1:22"}]
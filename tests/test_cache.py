@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.cache as cache_module
+from app.services.cache import DiskCache
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    # Sólo el módulo de la caché ve el reloj falso
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=reloj, monotonic=time.monotonic))
+    return reloj
+
+
+def test_disk_cache_caduca_por_ttl(tmp_path, reloj):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl_seconds=60)
+    cache.set("a", {"80": "open"})
+    cache.set("b", [1, 2], ttl_seconds=300)
+
+    reloj.ahora += 61
+    assert cache.get("a") is None
+    assert cache.get("b") == [1, 2]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_cache_desaloja_la_menos_usada(tmp_path, reloj):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl_seconds=3600, max_entries=2)
+    cache.set("a", 1)
+    reloj.ahora += 1
+    cache.set("b", 2)
+    reloj.ahora += 1
+    # Leer "a" la hace más reciente que "b"
+    assert cache.get("a") == 1
+    reloj.ahora += 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_disk_cache_persiste_entre_instancias(tmp_path, reloj):
+    ruta = str(tmp_path / "c.sqlite")
+    DiskCache(ruta, ttl_seconds=60).set("a", {"x": 1})
+    assert DiskCache(ruta, ttl_seconds=60).get("a") == {"x": 1}
@@ -0,0 +1,47 @@
+import time
+
+from app.services.circuit_breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+def test_prueba_perdida_se_concede_de_nuevo():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0.05)
+    breaker.failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    # La prueba no informa (p. ej. su tarea se canceló): no hay otra mientras tanto
+    assert not breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+
+
+def test_transiciones_cerrado_abierto_semiabierto():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+    breaker.failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # La prueba falla: vuelve a abrirse sin esperar a otros dos fallos
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+    # Tras cerrarse el contador de fallos vuelve a empezar
+    breaker.failure()
+    assert breaker.state == CLOSED
@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.services import gemini_analyzer
+from app.services.circuit_breaker import CircuitBreaker, CLOSED, OPEN
+from app.services.exceptions import AnalysisError, CircuitOpenError
+from app.services.gemini_analyzer import GeminiAnalyzer, _Intento
+
+RESPUESTA = json.dumps({"candidates": [{"content": {"parts": [{"text": '{"summary": "ok"}'}]}}]}).encode()
+
+
+class _Goteo(BaseHTTPRequestHandler):
+    """Responde con el primer byte y después un byte cada `pausa` segundos."""
+    protocol_version = "HTTP/1.1"
+    pausa = 0.2
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPUESTA)))
+        self.end_headers()
+        try:
+            for i in range(len(RESPUESTA)):
+                self.wfile.write(RESPUESTA[i:i + 1])
+                self.wfile.flush()
+                time.sleep(self.pausa)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor_lento(monkeypatch):
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Goteo)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    monkeypatch.setattr(gemini_analyzer, "GEMINI_API_URL", f"http://127.0.0.1:{servidor.server_port}")
+    yield
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("gemini-test", failure_threshold=1, reset_seconds=60)
+    monkeypatch.setattr(gemini_analyzer, "gemini_breaker", breaker)
+    return breaker
+
+
+@pytest.fixture
+def plazos(monkeypatch):
+    monkeypatch.setattr(gemini_analyzer, "GEMINI_CALL_DEADLINE_SECONDS", 1.0)
+    monkeypatch.setattr(gemini_analyzer, "GEMINI_HEDGE_SECONDS", 0.1)
+    monkeypatch.setattr(gemini_analyzer, "GEMINI_MAX_ATTEMPTS", 2)
+
+
+def test_llamar_corta_el_cuerpo_al_vencer_el_plazo_total(servidor_lento, breaker):
+    inicio = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        GeminiAnalyzer()._llamar("prompt", 0.5)
+
+    # Cada byte llega antes del timeout de lectura, pero el plazo es total
+    assert time.monotonic() - inicio < 2
+    assert breaker.state == OPEN
+
+
+def test_llamar_abortado_libera_el_hilo_sin_contar_fallo(servidor_lento, breaker):
+    intento = _Intento()
+    threading.Timer(0.3, intento.cancelar).start()
+
+    inicio = time.monotonic()
+    with pytest.raises(AnalysisError, match="cancelado"):
+        GeminiAnalyzer()._llamar("prompt", 30, intento)
+
+    assert time.monotonic() - inicio < 2
+    assert breaker.state == CLOSED
+
+
+def _lenta(abortados: list):
+    def ejecutar(timeout: float, intento: _Intento) -> dict:
+        while not intento.cancelado:
+            time.sleep(0.01)
+        abortados.append(intento)
+        raise AnalysisError("cancelado")
+    return ejecutar
+
+
+def test_duplicado_gana_y_aborta_el_intento_lento(plazos):
+    abortados = []
+    llamadas = []
+    lenta = _lenta(abortados)
+
+    def tarea(timeout: float, intento: _Intento) -> dict:
+        llamadas.append(timeout)
+        if len(llamadas) == 1:
+            return lenta(timeout, intento)
+        return {"summary": "duplicado"}
+
+    inicio = time.monotonic()
+    resultados = GeminiAnalyzer()._ejecutar_con_cobertura({"overview": tarea})
+
+    assert resultados == {"overview": {"summary": "duplicado"}}
+    assert time.monotonic() - inicio < 0.8
+    # El duplicado recibe lo que queda de plazo, no el plazo entero
+    assert llamadas[1] <= llamadas[0]
+    time.sleep(0.1)
+    assert len(abortados) == 1
+
+
+def test_plazo_vencido_deja_error_y_aborta_los_intentos(plazos):
+    abortados = []
+
+    inicio = time.monotonic()
+    resultados = GeminiAnalyzer()._ejecutar_con_cobertura({
+        "overview": _lenta(abortados),
+        "findings": lambda timeout, intento: {"vulnerabilities": []},
+    })
+
+    assert 0.9 <= time.monotonic() - inicio < 1.5
+    assert resultados["findings"] == {"vulnerabilities": []}
+    assert isinstance(resultados["overview"], AnalysisError)
+    time.sleep(0.1)
+    # Intento original y duplicado, los dos abortados al vencer el plazo
+    assert len(abortados) == 2
+
+
+def test_circuito_abierto_no_se_reintenta(plazos):
+    llamadas = []
+
+    def tarea(timeout: float, intento: _Intento) -> dict:
+        llamadas.append(timeout)
+        raise CircuitOpenError("Circuito de Gemini abierto")
+
+    resultados = GeminiAnalyzer()._ejecutar_con_cobertura({"overview": tarea})
+
+    assert isinstance(resultados["overview"], CircuitOpenError)
+    assert len(llamadas) == 1
+
+
+def test_fallo_se_reintenta_hasta_el_maximo(plazos):
+    llamadas = []
+
+    def tarea(timeout: float, intento: _Intento) -> dict:
+        llamadas.append(timeout)
+        raise ValueError("no es JSON")
+
+    resultados = GeminiAnalyzer()._ejecutar_con_cobertura({"overview": tarea})
+
+    assert isinstance(resultados["overview"], ValueError)
+    assert len(llamadas) == 2
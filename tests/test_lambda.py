@@ -0,0 +1,111 @@
+import importlib
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import boto3
+import pytest
+from moto import mock_aws
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda")
+BUCKET = "reports-test"
+TABLE = "companies-test"
+
+
+@pytest.fixture
+def lambda_env(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", TABLE)
+    monkeypatch.syspath_prepend(LAMBDA_DIR)
+    with mock_aws():
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        boto3.client("dynamodb").create_table(
+            TableName=TABLE,
+            KeySchema=[
+                {"AttributeName": "domain", "KeyType": "HASH"},
+                {"AttributeName": "email", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "domain", "AttributeType": "S"},
+                {"AttributeName": "email", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        cola = boto3.client("sqs").create_queue(QueueName="scans")["QueueUrl"]
+        monkeypatch.setenv("SQS_URL", cola)
+        sys.modules.pop("lambda_function", None)
+        yield importlib.import_module("lambda_function")
+        sys.modules.pop("lambda_function", None)
+
+
+def _recibir_todos(url: str) -> list[dict]:
+    sqs, cuerpos = boto3.client("sqs"), []
+    while True:
+        mensajes = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10).get("Messages", [])
+        if not mensajes:
+            return cuerpos
+        for m in mensajes:
+            cuerpos.append(json.loads(m["Body"]))
+            sqs.delete_message(QueueUrl=url, ReceiptHandle=m["ReceiptHandle"])
+
+
+def _evento(*emails: str) -> dict:
+    return {"Records": [{"body": json.dumps({"email": e})} for e in emails]}
+
+
+def test_ultimo_reporte_por_fecha_y_no_por_email(lambda_env):
+    ahora = datetime.utcnow()
+    reporte = ahora - timedelta(hours=2)
+    boto3.client("s3").put_object(
+        Bucket=BUCKET,
+        Key="reports/acme.com/latest.json",
+        Body=json.dumps({"key": "reports/acme.com/OSCP_acme.com_x.pdf", "timestamp": reporte.isoformat()}),
+    )
+    tabla = boto3.resource("dynamodb").Table(TABLE)
+    # "zz@" es el último email alfabético pero su envío es anterior al reporte
+    tabla.put_item(Item={"domain": "acme.com", "email": "zz@acme.com",
+                         "timestamp": (ahora - timedelta(days=3)).isoformat()})
+    tabla.put_item(Item={"domain": "acme.com", "email": "ana@acme.com",
+                         "timestamp": (reporte + timedelta(minutes=1)).isoformat()})
+
+    info = lambda_env.last_report("acme.com")
+    assert info["timestamp"] == reporte
+    assert info["emails"] == ["ana@acme.com"]
+
+    codigo, cuerpo = lambda_env.handle_signup({"email": "bob@acme.com"}, None)
+    assert codigo == 200
+    assert cuerpo["status"] == "report_sent"
+    assert cuerpo["emails_sent"] == ["ana@acme.com"]
+
+
+def test_sin_reporte_encola(lambda_env):
+    respuesta = lambda_env.lambda_handler({"body": json.dumps({"email": "bob@nuevo.com"})}, None)
+    assert respuesta["statusCode"] == 200
+    assert _recibir_todos(os.environ["SQS_URL"]) == [{"domain": "nuevo.com", "email": "bob@nuevo.com"}]
+
+
+def test_deduplica_entre_invocaciones(lambda_env):
+    lambda_env.lambda_handler(_evento("a@uno.com", "a@uno.com", "b@dos.com"), None)
+    lambda_env.lambda_handler(_evento("a@uno.com", "c@tres.com"), None)
+    cuerpos = _recibir_todos(os.environ["SQS_URL"])
+    assert sorted(c["email"] for c in cuerpos) == ["a@uno.com", "b@dos.com", "c@tres.com"]
+
+
+def test_envia_en_lotes_de_diez(lambda_env, monkeypatch):
+    lotes = []
+    original = lambda_env.sqs.send_message_batch
+
+    def contar(**kwargs):
+        lotes.append(len(kwargs["Entries"]))
+        return original(**kwargs)
+
+    monkeypatch.setattr(lambda_env.sqs, "send_message_batch", contar)
+    emails = [f"u{i}@d{i}.com" for i in range(23)]
+    respuesta = lambda_env.lambda_handler(_evento(*emails), None)
+    assert respuesta["statusCode"] == 200
+    assert lotes == [10, 10, 3]
+    assert len(_recibir_todos(os.environ["SQS_URL"])) == 23
@@ -0,0 +1,51 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.local_reports import LocalReportRepository, es_local
+
+
+def test_guarda_y_devuelve_el_ultimo(tmp_path):
+    repo = LocalReportRepository(str(tmp_path))
+    ts = datetime(2026, 1, 1, 12, 0, 0)
+    key = repo.save("acme.com", b"%PDF", ts, "quick")
+
+    assert es_local(key)
+    assert repo.latest("acme.com") == {"key": key, "timestamp": ts.isoformat(), "size": 4, "profile": "quick"}
+    assert repo.read(key) == b"%PDF"
+    assert repo.latest("nadie.com") == {}
+
+
+def test_conserva_solo_los_mas_recientes(tmp_path):
+    repo = LocalReportRepository(str(tmp_path), por_dominio=2)
+    inicio = datetime(2026, 1, 1)
+    keys = [repo.save("acme.com", b"%PDF", inicio + timedelta(hours=h), "standard") for h in range(4)]
+
+    pdfs = sorted(f for f in os.listdir(tmp_path / "acme.com") if f.endswith(".pdf"))
+    assert pdfs == [k.rsplit("/", 1)[1] for k in keys[-2:]]
+    assert repo.latest("acme.com")["key"] == keys[-1]
+
+
+def test_indice_a_un_pdf_borrado_no_cuenta(tmp_path):
+    repo = LocalReportRepository(str(tmp_path))
+    key = repo.save("acme.com", b"%PDF", datetime(2026, 1, 1), "standard")
+    os.remove(repo._ruta(key))
+    assert repo.latest("acme.com") == {}
+
+
+@pytest.mark.parametrize("key", ["local/../secreto.pdf", "local/../../etc/passwd", "local//etc/passwd"])
+def test_rechaza_keys_fuera_de_la_raiz(tmp_path, key):
+    repo = LocalReportRepository(str(tmp_path / "reports"))
+    with pytest.raises(ValueError):
+        repo.read(key)
+
+
+@pytest.mark.parametrize("domain", ["..", ".", "", "a/b", "../x"])
+def test_rechaza_dominios_que_escapan(tmp_path, domain):
+    repo = LocalReportRepository(str(tmp_path / "reports"))
+    with pytest.raises(ValueError):
+        repo.save(domain, b"%PDF", datetime(2026, 1, 1), "standard")
+    with pytest.raises(ValueError):
+        repo.latest(domain)
+    assert not (tmp_path / "secreto.pdf").exists()
@@ -0,0 +1,26 @@
+import json
+
+from app.factories import logger_factory
+from app.factories.logger_factory import LoggerFactory
+
+
+def test_excepcion_por_la_cola_conserva_la_traza_en_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger_factory, "LOG_MODE", "queue")
+    monkeypatch.setattr(logger_factory, "LOG_FORMAT", "json")
+    monkeypatch.setattr(logger_factory, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(logger_factory, "LOG_MAX_MESSAGE_CHARS", 40)
+    logger = LoggerFactory.create_logger("test_json_queue")
+
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Fallo al procesar %s", "example.com")
+    logger_factory.stop_logging()
+
+    with open(tmp_path / "test_json_queue.log") as fh:
+        registro = json.loads(fh.readline())
+    assert registro["msg"] == "Fallo al procesar example.com"
+    assert registro["level"] == "ERROR"
+    # La traza va entera en su campo, fuera del mensaje y de su recorte
+    assert registro["exc"].startswith("Traceback (most recent call last):")
+    assert registro["exc"].endswith("ZeroDivisionError: division by zero")
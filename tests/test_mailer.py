@@ -0,0 +1,82 @@
+import smtplib
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from app.services.exceptions import EmailError
+from app.services.mailer import Outbox
+
+
+class FakeServer:
+    def __init__(self, falla: bool, caidos: dict[str, int] | None = None):
+        self.falla = falla
+        # destinatario -> fallos transitorios antes de aceptar el envío
+        self.caidos = caidos or {}
+        self.enviados = []
+
+    def sendmail(self, remitente, destinatario, mensaje):
+        if self.falla:
+            raise smtplib.SMTPRecipientsRefused({destinatario: (550, b"no")})
+        if self.caidos.get(destinatario, 0) > 0:
+            self.caidos[destinatario] -= 1
+            raise smtplib.SMTPServerDisconnected("caído")
+        self.enviados.append(destinatario)
+
+
+class FakePool:
+    def __init__(self, falla: bool = False, caidos: dict[str, int] | None = None):
+        self.server = FakeServer(falla, caidos)
+
+    @contextmanager
+    def connection(self):
+        yield self.server
+
+    def close(self):
+        pass
+
+
+def test_deliver_espera_al_envio():
+    outbox = Outbox(FakePool(), workers=1)
+    try:
+        outbox.deliver("a@x", "b@x", "hola", timeout=5)
+        assert outbox.pool.server.enviados == ["b@x"]
+        assert outbox.sent == 1
+    finally:
+        outbox.stop()
+
+
+def test_deliver_lanza_si_el_envio_falla():
+    outbox = Outbox(FakePool(falla=True), workers=1)
+    try:
+        with pytest.raises(EmailError):
+            outbox.deliver("a@x", "b@x", "hola", timeout=5)
+        assert outbox.failed == 1
+    finally:
+        outbox.stop()
+
+
+def test_reintento_no_bloquea_al_worker():
+    # Un único worker: con el backoff dentro del worker el segundo mensaje
+    # esperaría los 30s del primero
+    outbox = Outbox(FakePool(caidos={"malo@x": 1}), workers=1, backoff_seconds=30)
+    try:
+        outbox.enqueue("a@x", "malo@x", "hola")
+        inicio = time.monotonic()
+        outbox.deliver("a@x", "bueno@x", "hola", timeout=5)
+        assert time.monotonic() - inicio < 2
+        assert outbox.retried == 1
+        assert outbox.pending() == 1
+    finally:
+        outbox.stop(timeout=0)
+    assert outbox.failed == 1
+
+
+def test_reintento_programado_se_envia():
+    outbox = Outbox(FakePool(caidos={"b@x": 2}), workers=1, backoff_seconds=0.05)
+    try:
+        outbox.deliver("a@x", "b@x", "hola", timeout=5)
+        assert outbox.pool.server.enviados == ["b@x"]
+        assert outbox.retried == 2
+    finally:
+        outbox.stop()
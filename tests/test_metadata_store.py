@@ -0,0 +1,49 @@
+from app.services import metadata_store
+from app.services.metadata_store import MetadataStore, MetadataWriter
+
+
+def _registro(n: int) -> dict:
+    return {"domain": "example.com", "email": f"user{n}@example.com", "timestamp": f"2024-01-0{n}T00:00:00"}
+
+
+def test_buffer_lleno_guarda_en_local_sin_tocar_dynamodb(tmp_path, monkeypatch):
+    llamadas = []
+
+    def dynamodb():
+        llamadas.append(1)
+        raise RuntimeError("add() no debe escribir en DynamoDB")
+
+    monkeypatch.setattr(metadata_store, "aws_disponible", lambda: True)
+    monkeypatch.setattr(metadata_store, "get_dynamodb", dynamodb)
+    store = MetadataStore(str(tmp_path / "metadata.sqlite"))
+    writer = MetadataWriter(store, max_size=1)
+    # Sin hilo de escritura el buffer se llena con el primer registro
+    monkeypatch.setattr(writer, "start", lambda: None)
+
+    writer.add(_registro(1))
+    writer.add(_registro(2))
+
+    assert llamadas == []
+    assert writer.pending() == 1
+    assert writer.fallback == 1
+    assert store.by_email("user2@example.com") == [_registro(2)]
+    assert store.latest_for_domain("example.com") == _registro(2)
+
+
+def test_dynamodb_caido_vacia_el_buffer_en_local(tmp_path, monkeypatch):
+    def dynamodb():
+        raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(metadata_store, "aws_disponible", lambda: True)
+    monkeypatch.setattr(metadata_store, "get_dynamodb", dynamodb)
+    store = MetadataStore(str(tmp_path / "metadata.sqlite"))
+    writer = MetadataWriter(store, batch_size=2, flush_seconds=0.05)
+
+    for n in (1, 2, 3):
+        writer.add(_registro(n))
+    writer.stop(5)
+
+    assert len(store) == 3
+    assert writer.fallback == 3
+    assert writer.written == 0
+    assert store.latest_for_domain("example.com") == _registro(3)
@@ -0,0 +1,10 @@
+from prometheus_client import generate_latest
+
+from app.services import metadata_store
+
+
+def test_scrape_no_crea_el_writer_de_metadatos(monkeypatch):
+    monkeypatch.setattr(metadata_store, "_writer", None)
+    salida = generate_latest().decode()
+    assert "hack4me_metadata_pending 0.0" in salida
+    assert metadata_store.current_writer() is None
@@ -0,0 +1,93 @@
+import sys
+
+import app.services.nmap_scanner as nmap_scanner
+import app.services.nmap_stream_scanner as nmap_stream_scanner
+from app.services.nmap_scanner import NmapScanner
+from app.services.nmap_stream_scanner import NmapStreamScanner
+
+# Dos dominios que resuelven a la misma IP (hosting compartido / CDN):
+# nmap emite un <host> por dominio con la misma dirección
+XML_MISMA_IP = """<?xml version="1.0"?>
+<nmaprun>
+<host><address addr="10.0.0.1" addrtype="ipv4"/>
+<hostnames><hostname name="a.example" type="user"/><hostname name="edge.cdn" type="PTR"/></hostnames>
+<ports><port protocol="tcp" portid="443"><state state="open"/><service name="https" product="nginx"/></port></ports>
+</host>
+<host><address addr="10.0.0.1" addrtype="ipv4"/>
+<hostnames><hostname name="b.example" type="user"/><hostname name="edge.cdn" type="PTR"/></hostnames>
+<ports><port protocol="tcp" portid="22"><state state="open"/><service name="ssh" product="OpenSSH"/></port></ports>
+</host>
+</nmaprun>
+"""
+
+
+def _comprobar(resultado: dict):
+    assert resultado["a.example"] == {
+        "10.0.0.1": [{"port": 443, "state": "open", "service": "https", "product": "nginx", "version": ""}]
+    }
+    assert resultado["b.example"] == {
+        "10.0.0.1": [{"port": 22, "state": "open", "service": "ssh", "product": "OpenSSH", "version": ""}]
+    }
+
+
+def test_python_nmap_dos_dominios_misma_ip(monkeypatch):
+    class FakePortScanner:
+        def scan(self, *args, **kwargs):
+            pass
+
+        def get_nmap_last_output(self):
+            return XML_MISMA_IP
+
+    monkeypatch.setattr(nmap_scanner.nmap, "PortScanner", FakePortScanner)
+    _comprobar(NmapScanner().scan_domains(["a.example", "b.example"]))
+
+
+def test_stream_dos_dominios_misma_ip(monkeypatch):
+    comando = [sys.executable, "-c", f"import sys; sys.stdout.write({XML_MISMA_IP!r})"]
+    monkeypatch.setattr(NmapStreamScanner, "_comando", lambda self, targets, ports: comando)
+    _comprobar(NmapStreamScanner().scan_domains(["a.example", "b.example"]))
+
+
+def _xml_grande(hosts: int, puertos: int) -> str:
+    partes = ['<?xml version="1.0"?>\n<nmaprun>\n']
+    for h in range(hosts):
+        partes.append(
+            f'<host><address addr="10.0.{h // 256}.{h % 256}" addrtype="ipv4"/>'
+            f'<hostnames><hostname name="objetivo.example" type="user"/></hostnames><ports>'
+        )
+        # En orden inverso para comprobar que el resultado sale ordenado
+        for p in reversed(range(puertos)):
+            partes.append(
+                f'<port protocol="tcp" portid="{1000 + p}"><state state="open"/>'
+                f'<service name="svc" product="prod" version="1.{p}"/></port>'
+            )
+        partes.append("</ports></host>\n")
+    partes.append("</nmaprun>\n")
+    return "".join(partes)
+
+
+def test_stream_xml_grande_libera_los_hosts(monkeypatch, tmp_path):
+    xml = tmp_path / "nmap.xml"
+    xml.write_text(_xml_grande(2000, 25))
+    comando = [sys.executable, "-c", f"import shutil, sys; shutil.copyfileobj(open({str(xml)!r}), sys.stdout)"]
+    monkeypatch.setattr(NmapStreamScanner, "_comando", lambda self, targets, ports: comando)
+
+    raices = []
+    iterparse = nmap_stream_scanner.ET.iterparse
+
+    def espiar(*args, **kwargs):
+        for event, elem in iterparse(*args, **kwargs):
+            if not raices:
+                raices.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(nmap_stream_scanner.ET, "iterparse", espiar)
+    resultado = NmapStreamScanner().scan_domains(["objetivo.example"])
+
+    hosts = resultado["objetivo.example"]
+    assert len(hosts) == 2000
+    puertos = hosts["10.0.7.207"]
+    assert [p["port"] for p in puertos] == list(range(1000, 1025))
+    assert puertos[3] == {"port": 1003, "state": "open", "service": "svc", "product": "prod", "version": "1.3"}
+    # Ningún <host> procesado queda colgando de <nmaprun>
+    assert len(raices[0]) == 0
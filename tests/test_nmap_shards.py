@@ -0,0 +1,43 @@
+from app.services.nmap_scanner import NmapScanner, _expandir_puertos, dividir_puertos
+
+
+def test_dividir_puertos_en_fragmentos_contiguos():
+    assert dividir_puertos("1-10", 3) == ["1-4", "5-7", "8-10"]
+    assert dividir_puertos("22,80,443,8000-8003", 2) == ["22,80,443,8000", "8001-8003"]
+
+
+def test_dividir_puertos_cubre_el_rango_sin_solapes():
+    fragmentos = dividir_puertos("1-1024", 7)
+    assert len(fragmentos) == 7
+    puertos = [p for f in fragmentos for p in _expandir_puertos(f)]
+    assert puertos == list(range(1, 1025))
+
+
+def test_dividir_puertos_casos_que_no_se_dividen():
+    assert dividir_puertos("1-1024", 1) == ["1-1024"]
+    assert dividir_puertos(None, 4) == [None]
+    assert dividir_puertos("80", 4) == ["80"]
+    # Especificaciones con protocolo no se interpretan
+    assert dividir_puertos("T:80,U:53", 4) == ["T:80,U:53"]
+    # Nunca más fragmentos que puertos
+    assert dividir_puertos("80,443", 8) == ["80", "443"]
+
+
+def test_scan_fragmentado_combina_los_resultados(monkeypatch):
+    def fragmento(self, targets, ports, on_port=None):
+        inicio, fin = (int(p) for p in ports.split("-"))
+        resultado = {t: {"10.0.0.1": [
+            {"port": p, "state": "open", "service": "", "product": "", "version": ""}
+            for p in (fin, inicio)
+        ]} for t in targets}
+        if ports == "5-6":
+            resultado["b.example"] = {"error": "timeout"}
+        return resultado
+
+    monkeypatch.setattr(NmapScanner, "_scan_targets", fragmento)
+    resultado = NmapScanner(ports="1-6", shards=3, parallelism=3).scan_domains(["a.example", "b.example"])
+
+    assert [p["port"] for p in resultado["a.example"]["10.0.0.1"]] == [1, 2, 3, 4, 5, 6]
+    assert "error" not in resultado["a.example"]
+    assert [p["port"] for p in resultado["b.example"]["10.0.0.1"]] == [1, 2, 3, 4]
+    assert resultado["b.example"]["error"] == "timeout"
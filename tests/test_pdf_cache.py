@@ -0,0 +1,68 @@
+import os
+import threading
+
+from botocore.exceptions import ClientError
+
+import app.services.pdf_cache as pdf_cache
+from app.services.pdf_cache import PdfDiskCache
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class FakeS3:
+    def __init__(self):
+        self.llamadas = []
+
+    def get_object(self, **params):
+        self.llamadas.append(params)
+        if "IfNoneMatch" in params:
+            raise ClientError({"Error": {"Code": "304"}}, "GetObject")
+        return {"Body": FakeBody(b"%PDF nuevo"), "ETag": '"e2"'}
+
+
+def test_304_con_copia_desalojada_descarga_de_nuevo(tmp_path, monkeypatch):
+    s3 = FakeS3()
+    monkeypatch.setattr(pdf_cache, "get_s3", lambda: s3)
+    cache = PdfDiskCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("r.pdf", b"%PDF viejo", '"e1"')
+    cache._validados.clear()
+
+    # El PDF desaparece entre la consulta del ETag y la lectura tras el 304
+    _, pdf_path, _ = cache._rutas("r.pdf")
+    os.remove(pdf_path)
+
+    assert cache.get("r.pdf") == b"%PDF nuevo"
+    assert [("IfNoneMatch" in p) for p in s3.llamadas] == [True, False]
+
+
+def test_put_concurrente_de_la_misma_key(tmp_path):
+    cache = PdfDiskCache(str(tmp_path), max_bytes=1 << 24)
+    cuerpos = {f'"e{i}"': bytes([i]) * 200_000 for i in range(8)}
+
+    errores = []
+
+    def escribir(etag: str):
+        try:
+            for _ in range(5):
+                cache.put("r.pdf", cuerpos[etag], etag)
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=escribir, args=(etag,)) for etag in cuerpos]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    _, pdf_path, _ = cache._rutas("r.pdf")
+    with open(pdf_path, "rb") as fh:
+        assert fh.read() in cuerpos.values()
+    assert cache._etag_local("r.pdf") in cuerpos
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
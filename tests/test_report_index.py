@@ -0,0 +1,82 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import app.services.report_service as report_service
+from app.services.cache import TTLCache
+
+
+class ContadorS3:
+    """Cliente S3 de moto que cuenta las lecturas del índice."""
+
+    def __init__(self, s3):
+        self._s3 = s3
+        self.lecturas_indice = 0
+
+    def get_object(self, **kwargs):
+        if kwargs["Key"].endswith("latest.json"):
+            self.lecturas_indice += 1
+        return self._s3.get_object(**kwargs)
+
+    def __getattr__(self, nombre):
+        return getattr(self._s3, nombre)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    with mock_aws():
+        cliente = boto3.client("s3", region_name="us-east-1")
+        cliente.create_bucket(Bucket=report_service.BUCKET_NAME)
+        contador = ContadorS3(cliente)
+        monkeypatch.setattr(report_service, "get_s3", lambda: contador)
+        monkeypatch.setattr(report_service, "aws_disponible", lambda: True)
+        monkeypatch.setattr(report_service, "_indice_cache", TTLCache(ttl_seconds=300))
+        yield contador
+
+
+def _pdf_historico(s3, domain: str, ts: datetime):
+    key = f"reports/{domain}/OSCP_{domain}_{ts.strftime('%Y%m%d%H%M%S')}.pdf"
+    s3.put_object(Bucket=report_service.BUCKET_NAME, Key=key, Body=b"%PDF")
+    return key
+
+
+def test_reconstruye_el_indice_desde_los_pdfs_historicos(s3):
+    ahora = datetime.utcnow().replace(microsecond=0)
+    _pdf_historico(s3, "acme.com", ahora - timedelta(days=3))
+    reciente = _pdf_historico(s3, "acme.com", ahora - timedelta(hours=1))
+    _pdf_historico(s3, "otro.com", ahora)
+
+    assert report_service.obtener_ultimo_reporte("acme.com")["key"] == reciente
+    indice = json.loads(
+        s3.get_object(Bucket=report_service.BUCKET_NAME, Key="reports/acme.com/latest.json")["Body"].read()
+    )
+    assert indice["key"] == reciente
+    assert indice["timestamp"] == (ahora - timedelta(hours=1)).isoformat()
+
+
+def test_sin_reportes_devuelve_vacio(s3):
+    assert report_service.obtener_ultimo_reporte("nadie.com") == {}
+    assert report_service.buscar_reporte_s3("nadie.com") is None
+
+
+def test_la_cache_ttl_evita_leer_el_indice(s3, monkeypatch):
+    key = report_service.subir_pdf_memoria_a_s3("acme.com", b"%PDF nuevo", "quick")
+    report_service._indice_cache.clear()
+
+    for _ in range(3):
+        assert report_service.buscar_reporte_s3("acme.com", profile="quick") == key
+    assert s3.lecturas_indice == 1
+    # Un perfil más profundo que el del reporte no lo reutiliza
+    assert report_service.buscar_reporte_s3("acme.com", profile="deep") is None
+
+    monkeypatch.setattr(report_service, "_indice_cache", TTLCache(ttl_seconds=0.01))
+    report_service.obtener_ultimo_reporte("acme.com")
+    time.sleep(0.02)
+    report_service.obtener_ultimo_reporte("acme.com")
+    assert s3.lecturas_indice == 3
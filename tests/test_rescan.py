@@ -0,0 +1,72 @@
+from app.services.nmap_scanner import NmapScanner
+from app.services.port_history import calcular_cambios
+
+
+def _p(port: int, product: str = "", version: str = "", state: str = "open", service: str = "svc") -> dict:
+    return {"port": port, "state": state, "service": service, "product": product, "version": version}
+
+
+ANTERIOR = {"10.0.0.1": [_p(22, "OpenSSH", "8.0"), _p(80, "nginx", "1.0")]}
+
+
+def test_calcular_cambios():
+    actual = {
+        "10.0.0.1": [_p(22, "OpenSSH", "9.0"), _p(53, "dnsmasq")],
+        "10.0.0.2": [_p(443, "nginx")],
+        "error": "ignorado",
+    }
+    cambios = calcular_cambios(ANTERIOR, actual)
+    assert cambios["opened"] == [
+        {"host": "10.0.0.1", **_p(53, "dnsmasq")},
+        {"host": "10.0.0.2", **_p(443, "nginx")},
+    ]
+    assert cambios["closed"] == [{"host": "10.0.0.1", **_p(80, "nginx", "1.0")}]
+    assert cambios["changed"] == [{
+        "host": "10.0.0.1",
+        "port": 22,
+        "before": {"service": "svc", "product": "OpenSSH", "version": "8.0"},
+        "after": {"service": "svc", "product": "OpenSSH", "version": "9.0"},
+    }]
+    assert calcular_cambios(ANTERIOR, ANTERIOR) == {"opened": [], "closed": [], "changed": []}
+
+
+def _fake_scan(respuestas: dict, llamadas: list):
+    def scan_domain(self, domain, on_port=None):
+        llamadas.append((self.ports, "-sV" in self.arguments))
+        return respuestas[self.ports]
+    return scan_domain
+
+
+def test_reescaneo_incremental_por_fases(monkeypatch):
+    llamadas = []
+    respuestas = {
+        "22,80": {"10.0.0.1": [_p(22, "OpenSSH", "9.0"), _p(80, state="closed")]},
+        "1-21,23-79,81-100": {"10.0.0.1": [_p(53)]},
+        "53": {"10.0.0.1": [_p(53, "dnsmasq", "2.9")]},
+    }
+    monkeypatch.setattr(NmapScanner, "scan_domain", _fake_scan(respuestas, llamadas))
+
+    resultado = NmapScanner(ports="1-100").rescan_domain("x.example", ANTERIOR)
+
+    # -sV sobre los conocidos, barrido sin -sV del resto y -sV sobre los nuevos
+    assert llamadas == [("22,80", True), ("1-21,23-79,81-100", False), ("53", True)]
+    assert resultado["10.0.0.1"] == [_p(22, "OpenSSH", "9.0"), _p(53, "dnsmasq", "2.9")]
+    assert [c["port"] for c in resultado["changes"]["opened"]] == [53]
+    assert [c["port"] for c in resultado["changes"]["closed"]] == [80]
+    assert [c["port"] for c in resultado["changes"]["changed"]] == [22]
+
+
+def test_reescaneo_con_error_recurre_al_escaneo_completo(monkeypatch):
+    llamadas = []
+    completo = {"10.0.0.1": [_p(22, "OpenSSH", "9.0")]}
+    respuestas = {
+        "22,80": {"10.0.0.1": [_p(22, "OpenSSH", "9.0")]},
+        "1-21,23-79,81-100": {"error": "nmap superó el presupuesto"},
+        "1-100": completo,
+    }
+    monkeypatch.setattr(NmapScanner, "scan_domain", _fake_scan(respuestas, llamadas))
+
+    resultado = NmapScanner(ports="1-100").rescan_domain("x.example", ANTERIOR)
+
+    assert llamadas[-1] == ("1-100", True)
+    assert resultado == completo
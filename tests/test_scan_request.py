@@ -0,0 +1,14 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.scan_request import ScanBatchRequest
+
+
+def test_lote_con_perfil_comun():
+    lote = ScanBatchRequest(items=[{"domain": "a.example", "email": "u@a.example"}], profile="quick")
+    assert lote.profile == "quick"
+
+
+def test_lote_rechaza_perfil_por_elemento():
+    with pytest.raises(ValidationError):
+        ScanBatchRequest(items=[{"domain": "a.example", "email": "u@a.example", "profile": "deep"}])
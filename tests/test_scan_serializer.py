@@ -0,0 +1,61 @@
+from app.services.scan_serializer import estimar_tokens, serializar_escaneo
+
+
+def _puerto(port: int, product: str = "", version: str = "", state: str = "open") -> dict:
+    return {"port": port, "state": state, "service": "svc", "product": product, "version": version}
+
+
+# Orden de conservación esperado: puertos prioritarios, con versión, con producto, por número
+ESCANEO = {
+    "10.0.0.1": [
+        _puerto(8888),
+        _puerto(9999, "nginx", "1.2"),
+        _puerto(31337, "custom"),
+        _puerto(22),
+        _puerto(7000, "redis", "7.0"),
+        _puerto(9000, state="closed"),
+    ],
+}
+ORDEN = [22, 7000, 9999, 31337, 8888]
+
+
+def _incluidos(texto: str) -> list[int]:
+    return [int(l.split()[0]) for l in texto.splitlines() if l.startswith(" ") and l.split()[0].isdigit()]
+
+
+def test_el_recorte_respeta_la_prioridad():
+    vistos = set()
+    for budget in range(0, 80):
+        texto, stats = serializar_escaneo(ESCANEO, budget)
+        incluidos = _incluidos(texto)
+        # Siempre un prefijo del orden de prioridad
+        assert sorted(incluidos) == sorted(ORDEN[:len(incluidos)])
+        assert stats["included_ports"] == len(incluidos)
+        assert stats["omitted_ports"] == len(ORDEN) - len(incluidos)
+        if stats["omitted_ports"]:
+            assert texto.splitlines()[-1] == f"... {stats['omitted_ports']} lower-priority open ports omitted"
+        if incluidos:
+            assert estimar_tokens(texto) <= budget
+        vistos.add(len(incluidos))
+    # El barrido de presupuestos pasa por todos los recortes posibles
+    assert vistos == set(range(len(ORDEN) + 1))
+
+
+def test_sin_recorte_agrupa_hosts_y_descarta_cerrados():
+    escaneo = {
+        "10.0.0.2": [_puerto(443, "nginx", "1.2"), _puerto(443, "nginx", "1.2")],
+        "10.0.0.1": [_puerto(443, "nginx", "1.2"), _puerto(8080, state="closed")],
+        "10.0.0.3": [],
+        "error": "timeout en 10.0.0.4",
+    }
+    texto, stats = serializar_escaneo(escaneo, 10_000)
+    assert texto.splitlines() == [
+        "host 10.0.0.1, 10.0.0.2",
+        " 443 svc nginx 1.2",
+        "host 10.0.0.3",
+        " no open ports",
+        "error: timeout en 10.0.0.4",
+    ]
+    assert stats["hosts"] == 3
+    assert stats["open_ports"] == 1
+    assert stats["omitted_ports"] == 0
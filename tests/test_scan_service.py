@@ -0,0 +1,17 @@
+import app.services.scan_service as scan_service
+from app.services.metrics import ERRORS
+
+
+def test_analisis_fallido_cuenta_como_error(monkeypatch):
+    class FakeCreator:
+        def analyze(self, domain, scan_result):
+            return {"analysis_error": "timeout", "summary": "Error: timeout"}
+
+    monkeypatch.setattr(scan_service, "GeminiAnalyzerCreator", FakeCreator)
+    monkeypatch.setattr(scan_service, "generar_pdf_en_memoria", lambda **kw: b"%PDF")
+    monkeypatch.setattr(scan_service, "subir_pdf_memoria_a_s3", lambda *a: "local/x.example/r.pdf")
+
+    errores = ERRORS.labels("analysis", "AnalysisError")
+    antes = errores._value.get()
+    scan_service._generar_reporte("x.example", None, scan_result={"1.2.3.4": []})
+    assert errores._value.get() == antes + 1
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def _en_paralelo(n: int, objetivo) -> list[threading.Thread]:
+    hilos = [threading.Thread(target=objetivo) for _ in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    return hilos
+
+
+def test_llamadas_concurrentes_comparten_una_ejecucion():
+    sf = SingleFlight()
+    liberar, unidos = threading.Event(), threading.Semaphore(0)
+    ejecuciones, resultados = [], []
+
+    def fn():
+        ejecuciones.append(1)
+        liberar.wait(5)
+        return "reporte"
+
+    hilos = _en_paralelo(5, lambda: resultados.append(sf.do("x.example", fn, on_join=unidos.release)))
+    # Los cuatro que llegan tarde se adjuntan antes de que termine el primero
+    for _ in range(4):
+        assert unidos.acquire(timeout=5)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert ejecuciones == [1]
+    assert sorted(resultados, key=lambda r: r[1]) == [("reporte", False)] + [("reporte", True)] * 4
+    assert sf.coalesced == 4
+    assert sf.in_flight() == 0
+
+
+def test_claves_distintas_no_se_agrupan():
+    sf = SingleFlight()
+    assert sf.do("a", lambda: 1) == (1, False)
+    assert sf.do("b", lambda: 2) == (2, False)
+    assert sf.coalesced == 0
+
+
+def test_la_excepcion_llega_a_todos_los_que_esperan():
+    sf = SingleFlight()
+    liberar, unidos = threading.Event(), threading.Semaphore(0)
+    errores = []
+
+    def fn():
+        liberar.wait(5)
+        raise ValueError("nmap caído")
+
+    def llamar():
+        try:
+            sf.do("x.example", fn, on_join=unidos.release)
+        except ValueError as e:
+            errores.append(e)
+
+    hilos = _en_paralelo(3, llamar)
+    for _ in range(2):
+        assert unidos.acquire(timeout=5)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(errores) == 3 and all(str(e) == "nmap caído" for e in errores)
+    # Tras el fallo la clave queda libre y la siguiente llamada vuelve a ejecutar
+    assert sf.do("x.example", lambda: "ok") == ("ok", False)
+
+
+def test_excepcion_sin_concurrencia():
+    def fn():
+        raise RuntimeError("boom")
+
+    sf = SingleFlight()
+    with pytest.raises(RuntimeError):
+        sf.do("x", fn)
+    assert sf.in_flight() == 0
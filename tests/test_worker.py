@@ -0,0 +1,28 @@
+import json
+
+import app.worker as worker
+from app.services.exceptions import EmailError
+
+
+def _mensaje() -> dict:
+    return {
+        "MessageId": "m1",
+        "ReceiptHandle": "h1",
+        "Body": json.dumps({"domain": "x.example", "email": "u@x.example"}),
+    }
+
+
+def test_no_se_borra_si_el_email_no_se_envia(monkeypatch):
+    def pipeline(domain, email, profile, wait_email):
+        assert wait_email
+        raise EmailError("smtp caído")
+
+    monkeypatch.setattr(worker, "run_scan_pipeline", pipeline)
+    monkeypatch.setattr(worker.SQSWorker, "_liberar", lambda self, h, borrar, retraso=0: liberados.append(borrar))
+    liberados: list[bool] = []
+
+    sqs = worker.SQSWorker("cola", concurrency=1)
+    sqs._huecos.acquire()
+    sqs._procesar_mensaje(_mensaje())
+    assert liberados == [False]
+    assert sqs.metrics.failed == 1